@@ -0,0 +1,135 @@
+# Module to run many C programs in one process, keeping the lexer, parser and parsed programs warm
+# Jobs are read as JSON lines, from stdin or from the connections to a Unix socket, and each
+# one is answered with a JSON line holding the output the program printed.
+# Usage: python batch.py [socket path]
+#
+# Job:    {"id": 1, "path": "examples/fibonacci.c", "engine": "bytecode"}
+#         {"id": 2, "source": "int main(int n) { return n; }", "arguments": [7]}
+#         "path" or "source" is required, "engine", "stack_size", "memoize", "tokenizer"
+#         and "memory_size" are passed on to the Interpreter, "arguments" to main()
+# Result: {"id": 1, "status": 0, "output": "...", "error": null, "time": 0.0012}
+#         status is what the program would have exited the interpreter with
+
+import os, sys
+import io
+import stat
+import json
+import time
+import contextlib
+import socketserver
+
+from interpreter import *
+
+# Interpreter options a job can set
+JOB_OPTIONS = ['engine', 'stack_size', 'memoize', 'tokenizer', 'memory_size']
+# Parsed and compiled programs kept in memory, in front of the AST cache on disk
+PROGRAM_CACHE_SIZE = 256
+
+class Batch:
+    """ Runs jobs one at a time. Programs share the parser state, so jobs never run at once. """
+    def __init__(self, cache_size_: int = PROGRAM_CACHE_SIZE, ast_cache_: int = AST_CACHE_SIZE):
+        self.programs = TieredCache(cache_size_, DiskCache(AST_CACHE_DIR, ast_cache_)) if ast_cache_ else None
+        self.jobs = 0
+        # Built before the first job rather than during it
+        make_lexer()
+        make_parser()
+
+    def run(self, job: dict) -> dict:
+        start = time.perf_counter()
+        output = io.StringIO()
+        status = 0
+        error = None
+        with contextlib.redirect_stdout(output):
+            try:
+                self.interpret(job)
+            except ParseError as e:
+                # Reported in the output as well, the way main() prints it
+                error = f"{type(e).__name__}: {e}"
+                status = 1
+            except SystemExit as e:
+                # exit(None) is a success
+                status = 0 if e.code is None else e.code if type(e.code) == int else 1
+            except PROGRAM_ERRORS as e:
+                # Reported the way main() reports it
+                print(e)
+                status = 1
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                status = 1
+        self.jobs += 1
+        return {
+            'id': job.get('id'),
+            'status': status,
+            'output': output.getvalue(),
+            'error': error,
+            'time': time.perf_counter() - start
+        }
+
+    def interpret(self, job: dict):
+        """ What main() does for one file """
+        if 'path' not in job and 'source' not in job:
+            err = f"Job {job.get('id')} has neither a path nor a source"
+            raise Exception(err)
+        options = {key: job[key] for key in JOB_OPTIONS if key in job}
+        arguments = job.get('arguments', [])
+        if type(arguments) != list:
+            err = f"Job {job.get('id')} has arguments that are not a list"
+            raise Exception(err)
+        state.functions.clear()
+        state.global_variables.clear()
+        interpreter = Interpreter(job.get('path', "<source>"), ast_cache=0, source=job.get('source'), **options)
+        interpreter.ast_cache = self.programs
+        interpreter.tokenize()
+        interpreter.generate_ast()
+        interpreter.interpret(arguments)
+
+    def serve(self, lines, write):
+        """ Answers every job in lines, a JSON object per line """
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+                if type(job) != dict:
+                    err = f"expected a JSON object, got {type(job).__name__}"
+                    raise ValueError(err)
+            except ValueError as e:
+                # json.JSONDecodeError is a ValueError
+                result = {'id': None, 'status': 1, 'output': "", 'error': f"Invalid job: {e}", 'time': 0}
+            else:
+                result = self.run(job)
+            write(json.dumps(result) + "\n")
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        def write(text: str):
+            self.wfile.write(text.encode())
+            self.wfile.flush()
+        self.server.batch.serve((line.decode() for line in self.rfile), write)
+
+
+def serve_socket(path: str, batch: Batch):
+    """ Answers the jobs sent over each connection to the Unix socket at path, one connection at a time """
+    if os.path.exists(path):
+        # Left behind by an earlier server, anything else is not ours to remove
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            err = f"{path} exists and is not a socket"
+            raise Exception(err)
+        os.remove(path)
+    with socketserver.UnixStreamServer(path, JobHandler) as server:
+        server.batch = batch
+        server.serve_forever()
+
+def main(socket_path: str = None):
+    batch = Batch()
+    if socket_path:
+        serve_socket(socket_path, batch)
+    else:
+        def write(text: str):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        batch.serve(sys.stdin, write)
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
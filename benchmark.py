@@ -0,0 +1,573 @@
+# Benchmarks for the interpreter
+# Usage: python benchmark.py [file.c ...]
+
+import os, sys
+import io
+import time
+import tracemalloc
+import json
+import tempfile
+import shutil
+import subprocess
+import contextlib
+import random
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from interpreter import *
+from workloads import *
+
+def load(fpath: str, optimize: bool = True) -> Interpreter:
+    """ Parses a file once so only execution is timed """
+    state.functions.clear()
+    state.global_variables.clear()
+    interpreter = Interpreter(fpath, ast_cache=0)
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        interpreter.tokenize()
+        interpreter.generate_ast(optimize=optimize)
+    return interpreter
+
+def time_interpret(interpreter: Interpreter, engine: str, repeat: int = 3) -> tuple[float, str]:
+    """ Returns the best wall time of interpret() and the captured output """
+    interpreter.engine = engine
+    best = None
+    for _ in range(repeat):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            start = time.perf_counter()
+            interpreter.interpret()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output.getvalue()
+
+def bench_engines(files: list[str], engines: list[str] = ENGINES, repeat: int = 5):
+    for fpath in files:
+        interpreter = load(fpath)
+        print(f"{os.path.basename(fpath)}:")
+        baseline, reference = time_interpret(interpreter, engines[0], repeat)
+        print(f"\t{engines[0]:>10}: {baseline * 1000:10.2f} ms")
+        for engine in engines[1:]:
+            elapsed, output = time_interpret(interpreter, engine, repeat)
+            match = "" if output == reference else " (output differs)"
+            print(f"\t{engine:>10}: {elapsed * 1000:10.2f} ms  x{baseline / elapsed:.1f}{match}")
+
+def measure_memory(interpreter: Interpreter, engine: str) -> tuple[int, int]:
+    """ Returns the peak traced memory of interpret() and the blocks still live afterwards """
+    interpreter.engine = engine
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        interpreter.interpret()
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+    return peak, blocks
+
+def bench_memory(files: list[str], engines: list[str] = ENGINES):
+    for fpath in files:
+        interpreter = load(fpath)
+        print(f"{os.path.basename(fpath)} (memory):")
+        for engine in engines:
+            peak, blocks = measure_memory(interpreter, engine)
+            print(f"\t{engine:>10}: {peak / 1024:10.1f} KiB peak  {blocks:8} live blocks")
+
+def bench_optimizer(files: list[str], engines: list[str] = ENGINES, repeat: int = 3):
+    """ Times each engine on the program as parsed and after constant folding """
+    for fpath in files:
+        before = count_nodes(list(load(fpath, optimize=False).state.functions.values()))
+        interpreter = load(fpath, optimize=False)
+        timings = {engine: time_interpret(interpreter, engine, repeat) for engine in engines}
+        interpreter = load(fpath)
+        after = count_nodes(list(interpreter.state.functions.values()))
+        print(f"{os.path.basename(fpath)} (optimizer, {before - after} of {before} nodes removed):")
+        for engine in engines:
+            baseline, reference = timings[engine]
+            elapsed, output = time_interpret(interpreter, engine, repeat)
+            match = "" if output == reference else " (output differs)"
+            print(f"\t{engine:>10}: {baseline * 1000:10.2f} ms -> {elapsed * 1000:10.2f} ms  x{baseline / elapsed:.1f}{match}")
+
+def bench_reuse(files: list[str], engines: list[str] = [TREE, BYTECODE], threads: int = 8):
+    """ Runs one frozen program from several threads at once, checking every run
+    prints the same trace as a sequential run and leaves the program unchanged.
+    Closure and python engines are left out, they set the process wide recursion limit.
+    """
+    for fpath in files:
+        interpreter = load(fpath)
+        print(f"{os.path.basename(fpath)} ({threads} threads, one program):")
+        for engine in engines:
+            _, reference = time_interpret(interpreter, engine, 1)
+            snapshot = repr(interpreter.state.functions) + repr(interpreter.program.functions)
+            forks = [interpreter.fork() for _ in range(threads)]
+            output = ThreadOutput()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(output), ThreadPoolExecutor(threads) as pool:
+                results = list(pool.map(output.capture, [f.interpret for f in forks]))
+            elapsed = time.perf_counter() - start
+            same = sum(result == reference for result in results)
+            unchanged = snapshot == repr(interpreter.state.functions) + repr(interpreter.program.functions)
+            print(f"\t{engine:>10}: {elapsed * 1000:10.2f} ms  {same}/{threads} identical"
+                  + ("" if unchanged else " (program modified)"))
+
+def bench_memoization(files: list[str], sizes: list[int] = [16, 256, 4096], repeat: int = 3):
+    """ Times the tree walker with pure function calls memoized at each cache size """
+    for fpath in files:
+        interpreter = load(fpath)
+        print(f"{os.path.basename(fpath)} (memoization):")
+        interpreter.memoize = 0
+        baseline, reference = time_interpret(interpreter, TREE, repeat)
+        print(f"\t{'off':>10}: {baseline * 1000:10.2f} ms")
+        for size in sizes:
+            interpreter.memoize = size
+            elapsed, output = time_interpret(interpreter, TREE, repeat)
+            match = "" if output == reference else " (output differs)"
+            print(f"\t{size:>10}: {elapsed * 1000:10.2f} ms  x{baseline / elapsed:.1f}  {interpreter.call_cache}{match}")
+        interpreter.memoize = 0
+
+STARTUP = """
+import sys, time, json, io, contextlib
+start = time.perf_counter()
+import tables
+from interpreter import *
+imported = time.perf_counter()
+if sys.argv[2]:
+    tables.TABLE_DIR = sys.argv[2]
+with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+    lexer = make_lexer()
+    built_lexer = time.perf_counter()
+    parser = make_parser()
+    built_parser = time.perf_counter()
+    interpreter = Interpreter(sys.argv[1])
+    interpreter.tokenize()
+    interpreter.generate_ast()
+    parsed = time.perf_counter()
+print(json.dumps([imported - start, built_lexer - imported, built_parser - built_lexer, parsed - built_parser]))
+"""
+
+def bench_startup(fpath: str, repeat: int = 5):
+    """ Times a fresh process building the lexer and parser and parsing fpath, with
+    the table cache empty (cold) and filled by an earlier run (cached)
+    """
+    def run(table_dir: str) -> list[float]:
+        result = subprocess.run([sys.executable, "-c", STARTUP, fpath, table_dir],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return json.loads(result.stdout)
+
+    print(f"{os.path.basename(fpath)} (startup):")
+    for label in ["cold", "cached"]:
+        timings = []
+        for _ in range(repeat):
+            if label == "cold":
+                with tempfile.TemporaryDirectory() as table_dir:
+                    timings.append(run(table_dir))
+            else:
+                timings.append(run(""))
+        # Best of each stage
+        imported, lexer, parser, parse = (min(stage) * 1000 for stage in zip(*timings))
+        print(f"\t{label:>10}: import {imported:8.2f} ms  lexer {lexer:6.2f} ms  "
+              f"parser {parser:6.2f} ms  parse {parse:6.2f} ms")
+
+def bench_ast_cache(files: list[str], repeat: int = 5):
+    """ Times parsing each file against loading it from the disk cache """
+    with tempfile.TemporaryDirectory() as directory:
+        def parse(fpath: str, cached: bool) -> float:
+            state.functions.clear()
+            state.global_variables.clear()
+            interpreter = Interpreter(fpath, ast_cache=0)
+            if cached:
+                interpreter.ast_cache = DiskCache(directory, AST_CACHE_SIZE)
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                interpreter.tokenize()
+                interpreter.generate_ast()
+                return time.perf_counter() - start
+
+        for fpath in files:
+            parsed = min(parse(fpath, False) for _ in range(repeat))
+            parse(fpath, True)
+            loaded = min(parse(fpath, True) for _ in range(repeat))
+            size = sum(entry.stat().st_size for entry in os.scandir(directory))
+            for entry in os.scandir(directory):
+                os.remove(entry.path)
+            print(f"{os.path.basename(fpath)} (AST cache, {size / 1024:.1f} KiB entry):")
+            print(f"\t{'parse':>10}: {parsed * 1000:10.2f} ms")
+            print(f"\t{'cached':>10}: {loaded * 1000:10.2f} ms  x{parsed / loaded:.1f}")
+
+def bench_scanner(sizes: list[int] = [1, 4]):
+    """ Tokens per second of the PLY rules and the scanner on large synthesized sources.
+    tests/test_scanner.py checks they produce the same tokens.
+    """
+    for megabytes in sizes:
+        # About 250 bytes per function
+        source = synthesize(megabytes * 1024 * 1024 // 250)
+        print(f"{len(source) / 1024 / 1024:.1f} MB source (lexer):")
+        for label, new_lexer in [(PLY_LEXER, make_lexer), (SCANNER, Scanner)]:
+            lexer_ = new_lexer()
+            lexer_.input(source)
+            count = 0
+            start = time.perf_counter()
+            while lexer_.token():
+                count += 1
+            elapsed = time.perf_counter() - start
+            print(f"\t{label:>10}: {elapsed * 1000:10.2f} ms  {count / elapsed:12,.0f} tokens/s")
+
+STREAMING = """
+import sys, time, json
+from scanner import *
+def peak() -> int:
+    # KiB, ru_maxrss would carry over the peak of the benchmark process
+    with open("/proc/self/status") as f:
+        return int(next(line for line in f if line.startswith("VmHWM:")).split()[1])
+before = peak()
+start = time.perf_counter()
+scanner = Scanner()
+if sys.argv[2] == "whole":
+    with open(sys.argv[1]) as f:
+        scanner.input(f.read())
+else:
+    scanner.input_stream(sys.argv[1])
+count = sum(1 for _ in scanner)
+elapsed = time.perf_counter() - start
+print(json.dumps([count, elapsed, peak() - before]))
+"""
+
+def bench_streaming(files: list[str], chunk_sizes: list[int] = [1, 7, 4096], sizes: list[int] = [4, 16],
+                    cases: int = 1000):
+    """ Checks streamed sources lex the same as whole ones, line numbers included, when
+    chunks end anywhere. Then compares peak memory lexing a whole file and streaming it.
+    """
+    rng = random.Random(1)
+    sources = [open(fpath).read() for fpath in files]
+    for _ in range(cases):
+        sources.append("".join(rng.choices(FRAGMENTS, k=rng.randint(1, 200))))
+    for chunk_size in chunk_sizes:
+        def streamed() -> Scanner:
+            scanner = Scanner()
+            scanner.input = lambda source: scanner.input_stream(io.StringIO(source), chunk_size)
+            return scanner
+        same = sum(token_stream(streamed, source) == token_stream(Scanner, source) for source in sources)
+        print(f"Streaming in chunks of {chunk_size}: {same}/{len(sources)} sources lexed the same")
+
+    for megabytes in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            fpath = os.path.join(directory, "large.c")
+            with open(fpath, 'w') as f:
+                f.write(synthesize(megabytes * 1024 * 1024 // 250))
+            print(f"{os.path.getsize(fpath) / 1024 / 1024:.1f} MB file (streaming):")
+            for label in ["whole", "streamed"]:
+                # Peak memory of a fresh process, over the memory it had before lexing
+                result = subprocess.run([sys.executable, "-c", STREAMING, fpath, label],
+                                        capture_output=True, text=True, check=True,
+                                        cwd=os.path.dirname(os.path.abspath(__file__)))
+                count, elapsed, peak = json.loads(result.stdout)
+                print(f"\t{label:>10}: {count} tokens  {elapsed * 1000:10.2f} ms  "
+                      f"peak +{peak / 1024:8.2f} MiB")
+
+def copy_ast(node, as_dicts: bool):
+    """ Copies an AST as node classes, or as the plain dicts and lists the parser used to build """
+    if isinstance(node, NODE_TYPES):
+        fields = {key: copy_ast(value, as_dicts) for key, value in node.items()}
+        return fields if as_dicts else node_classes[type(node)](fields)
+    if type(node) in LIST_TYPES:
+        return [copy_ast(n, as_dicts) for n in node]
+    return node
+
+def count_containers(node) -> int:
+    """ Counts every node of an AST, including the operand and callee nodes """
+    if isinstance(node, NODE_TYPES):
+        return 1 + sum(count_containers(value) for value in node.values())
+    if type(node) in LIST_TYPES:
+        return sum(count_containers(n) for n in node)
+    return 0
+
+def traced_size(build) -> int:
+    """ Bytes still allocated after build() returns, while its result is alive """
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+def bench_nodes(sizes: list[int] = [10, 100, 1000]):
+    """ Bytes per AST node with node classes and with the dicts they replaced """
+    for nfunctions in sizes:
+        with tempfile.NamedTemporaryFile("w", suffix=".c", delete=False) as f:
+            f.write(synthesize(nfunctions))
+        start = time.perf_counter()
+        interpreter = load(f.name, optimize=False)
+        elapsed = time.perf_counter() - start
+        os.remove(f.name)
+
+        program = list(interpreter.state.functions.values()) + list(interpreter.state.global_variables.values())
+        nodes = count_containers(program)
+        as_nodes = traced_size(lambda: copy_ast(program, False))
+        as_dicts = traced_size(lambda: copy_ast(program, True))
+        print(f"{nfunctions} functions, {nodes} nodes, parsed in {elapsed * 1000:.2f} ms:")
+        print(f"\t{'dicts':>10}: {as_dicts / 1024:10.1f} KiB  {as_dicts / nodes:6.1f} bytes/node")
+        print(f"\t{'nodes':>10}: {as_nodes / 1024:10.1f} KiB  {as_nodes / nodes:6.1f} bytes/node  x{as_dicts / as_nodes:.1f} smaller")
+
+def statements(nstatements: int) -> str:
+    """ C source of about nstatements statements: globals, a long main and long lists """
+    half = nstatements // 2
+    lines = [f"int g{i} = {i};" for i in range(half)]
+    lines.append("int main() {")
+    lines.append(f"    int values[{half // 10 + 1}] = {{{', '.join(str(i) for i in range(half // 10 + 1))}}};")
+    lines.append(f"    printf(\"{' '.join('word' for _ in range(half // 10))}\\n\");")
+    lines += [f"    g{i} = g{i} + values[{i % 10}] * 2;" for i in range(half)]
+    lines.append("    return 0;")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def bench_parse_scaling(sizes: list[int] = [1_000, 10_000, 30_000, 100_000]):
+    """ Parse time per statement, which stays flat when parsing is linear """
+    for nstatements in sizes:
+        with tempfile.NamedTemporaryFile("w", suffix=".c", delete=False) as f:
+            f.write(statements(nstatements))
+        state.functions.clear()
+        state.global_variables.clear()
+        interpreter = Interpreter(f.name, ast_cache=0, tokenizer=SCANNER)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            interpreter.tokenize()
+            interpreter.generate_ast(optimize=False)
+            elapsed = time.perf_counter() - start
+        os.remove(f.name)
+        print(f"{nstatements} statements (parse): {elapsed * 1000:10.2f} ms  "
+              f"{elapsed / nstatements * 1e6:8.2f} us/statement")
+
+def bench_parallel_parse(nfunctions: int = 2000, workers: list[int] = [0, 2, 4, 8]):
+    """ Parse time of a large translation unit split across worker processes """
+    with tempfile.NamedTemporaryFile("w", suffix=".c", delete=False) as f:
+        f.write(synthesize(nfunctions))
+    expected = None
+    for nworkers in workers:
+        state.functions.clear()
+        state.global_variables.clear()
+        interpreter = Interpreter(f.name, ast_cache=0, tokenizer=SCANNER, workers=nworkers)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            interpreter.tokenize()
+            interpreter.generate_ast(optimize=False)
+            elapsed = time.perf_counter() - start
+        # The program must come out the same however it was split
+        program = repr(state.functions) + repr(state.global_variables)
+        expected = expected or program
+        print(f"{nfunctions} functions, {nworkers} workers (parse): {elapsed * 1000:10.2f} ms  "
+              f"{'same' if program == expected else 'DIFFERENT'} program")
+    os.remove(f.name)
+
+def bench_incremental(nfunctions: int = 2000, repeat: int = 3):
+    """ Rerun latency after editing one function, parsing whole and incrementally """
+    directory = tempfile.mkdtemp()
+    fpath = os.path.join(directory, "edited.c")
+    source = synthesize(nfunctions)
+    programs = []
+    for label, options in [("whole", {"ast_cache": 0}), ("incremental", {"incremental": True})]:
+        times = []
+        for i in range(repeat + 1):
+            # A new constant in one function each time, so the whole program is never cached
+            with open(fpath, "w") as f:
+                f.write(source.replace(f"int c = a * 2 + b - {nfunctions // 2};", f"int c = a * 2 + b - {i};"))
+            state.functions.clear()
+            state.global_variables.clear()
+            interpreter = Interpreter(fpath, tokenizer=SCANNER, **options)
+            if interpreter.incremental:
+                interpreter.ast_cache = DiskCache(os.path.join(directory, "ast"), AST_CACHE_SIZE)
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                interpreter.tokenize()
+                interpreter.generate_ast()
+                times.append(time.perf_counter() - start)
+        programs.append(repr(state.functions) + repr(state.global_variables))
+        # The first incremental run fills the cache
+        print(f"{nfunctions} functions, {label} (edit one):    first {times[0] * 1000:10.2f} ms  "
+              f"then {min(times[1:]) * 1000:10.2f} ms")
+    print(f"Both give the {'same' if programs[0] == programs[1] else 'DIFFERENT'} program")
+    shutil.rmtree(directory)
+
+def bench_batch(files: list[str], engines: list[str] = ENGINES, rounds: int = 3):
+    """ Programs per second run as a process each, and as jobs sent to one batch.py process """
+    root = os.path.dirname(os.path.abspath(__file__))
+    jobs = [{'id': n, 'path': fpath, 'engine': engine}
+            for n, (_, fpath, engine) in enumerate((r, f, e) for r in range(rounds) for f in files for e in engines)]
+
+    start = time.perf_counter()
+    for job in jobs:
+        subprocess.run([sys.executable, "interpreter.py", job['path'], job['engine']],
+                       capture_output=True, cwd=root)
+    processes = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "batch.py"], input="".join(json.dumps(job) + "\n" for job in jobs),
+                            capture_output=True, text=True, check=True, cwd=root)
+    batch = time.perf_counter() - start
+    failed = sum(json.loads(line)['error'] is not None for line in result.stdout.splitlines())
+
+    print(f"{len(jobs)} programs (batch):")
+    print(f"\t{'processes':>10}: {len(jobs) / processes:8.2f} programs/s")
+    print(f"\t{'batch':>10}: {len(jobs) / batch:8.2f} programs/s  x{processes / batch:.1f}  {failed} failed")
+
+def bench_arena(size: int = 1_000_000, values: int = 100_000):
+    """ Creating the simulated memory, and storing and loading values through addresses """
+    start = time.perf_counter()
+    tracemalloc.start()
+    memory = Memory(size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    created = time.perf_counter() - start
+    print(f"{size} byte arena: created in {created * 1000:8.2f} ms, {peak / 1024:8.1f} KiB")
+
+    for type_, value in [('char', 7), ('int', -123456), ('float', 0.1)]:
+        start = time.perf_counter()
+        addresses = [memory.malloc(c_types[type_][0]) for _ in range(values)]
+        allocated = time.perf_counter() - start
+        start = time.perf_counter()
+        for address in addresses:
+            memory.store(type_, address, value)
+        loaded = [memory.load(type_, address) for address in addresses]
+        accessed = time.perf_counter() - start
+        # Values read back as C stores them, a float in 4 bytes
+        expected = value if type_ != 'float' else struct.unpack('f', struct.pack('f', value))[0]
+        print(f"\t{type_:>10}: malloc {values / allocated / 1e6:6.2f} M/s  store+load {values / accessed / 1e6:6.2f} M/s  "
+              f"{'correct' if set(loaded) == {expected} else 'WRONG'}")
+        memory.clear()
+
+def bench_arrays(sizes: list[int] = [1_000, 1_000_000]):
+    """ Memory and time of declaring int and float arrays, as typed arrays and as the lists they replace """
+    for size in sizes:
+        for type_, value in [('int', 7), ('float', 0.5)]:
+            # Filled with distinct values, as a program that writes every element leaves them
+            for name, build in [("list", lambda: [value] + [0] * (size - 1)),
+                                ("array", lambda: new_array(type_, [value], size)),
+                                ("list filled", lambda: [value + i for i in range(size)]),
+                                ("array filled", lambda: new_array(type_, [value + i for i in range(size)], size))]:
+                start = time.perf_counter()
+                values = build()
+                declared = time.perf_counter() - start
+                start = time.perf_counter()
+                total = sum(values[i] for i in range(size))
+                read = time.perf_counter() - start
+                print(f"{size:>9} {type_:>5} {name:>12}: declared in {declared * 1000:8.3f} ms  "
+                      f"{traced_size(build) / 1024:10.1f} KiB  read {size / read / 1e6:6.2f} M/s  "
+                      f"{'correct' if total == sum(build()) else 'WRONG'}")
+
+def bench_heap(pairs: int = 1_000_000, live: int = 1000, sizes: list[int] = [8, 24, 64, 200, 1000, 5000]):
+    """ malloc/free pairs on the simulated heap, freeing a random block of a working set of live
+    blocks after each malloc, and the fragmentation the heap is left with
+    """
+    for name, pick in [("same size", lambda: 64), ("mixed sizes", lambda: random.choice(sizes))]:
+        random.seed(0)
+        memory = Memory(64 << 20)
+        requests = [pick() for _ in range(pairs)]
+        victims = [random.randrange(live) for _ in range(pairs)]
+        blocks = [memory.malloc(pick()) for _ in range(live)]
+        malloc, free = memory.malloc, memory.free
+        start = time.perf_counter()
+        for nbytes, victim in zip(requests, victims):
+            free(blocks[victim])
+            blocks[victim] = malloc(nbytes)
+        elapsed = time.perf_counter() - start
+        stats = memory.stats()
+        print(f"{name:>12}: {pairs / elapsed / 1e6:6.2f} M malloc/free pairs/s  "
+              f"heap {stats['heap'] / 1024:8.1f} KiB for {stats['requested'] / 1024:8.1f} KiB live  "
+              f"internal {stats['internal_fragmentation']:6.1%}  external {stats['external_fragmentation']:6.1%}  "
+              f"{'correct' if NULL not in blocks and stats['blocks'] == live else 'WRONG'}")
+
+def dump_per_byte(memory: Memory, out):
+    """ The dump print_memory wrote before, a byte at a time """
+    for index, byte in enumerate(memory):
+        if (index % 8 == 0) and (index):
+            out.write("\t")
+        if (index % 16 == 0) and (index):
+            out.write("\n")
+        out.write(f"{byte} ")
+
+def bench_memory_dump(size: int = 1_000_000, used: int = 300_000):
+    """ Dumping an untouched arena and one with used bytes written, as text and as a binary snapshot """
+    random.seed(0)
+    for name, touched in [("untouched", 0), ("written", used)]:
+        memory = Memory(size)
+        if touched:
+            address = memory.malloc(touched)
+            for offset in range(0, touched, 7):
+                memory.store('char', address + offset, random.randrange(-128, 128))
+        dumps = [
+            ("per byte", lambda out: dump_per_byte(memory, out), io.StringIO),
+            ("pages", lambda out: memory.dump(out), io.StringIO),
+            ("nonzero hex", lambda out: memory.dump(out, hex_=True, nonzero=True), io.StringIO),
+            ("binary", lambda out: memory.snapshot(out), io.BytesIO),
+        ]
+        expected = None
+        for label, dump, make in dumps:
+            out = make()
+            start = time.perf_counter()
+            dump(out)
+            elapsed = time.perf_counter() - start
+            text = out.getvalue()
+            if label == "per byte":
+                expected = text
+            check = f"  {'same as per byte' if text == expected else 'DIFFERENT'}" if label == "pages" else ""
+            print(f"{size} bytes {name:>9}, {label:>11}: {elapsed * 1000:9.2f} ms  {len(text) / 1024:8.1f} KiB{check}")
+
+LAZY_MEMORY = """
+import sys, time, json
+def rss() -> int:
+    # KiB resident now
+    with open("/proc/self/status") as f:
+        return int(next(line for line in f if line.startswith("VmRSS:")).split()[1])
+before = rss()
+start = time.perf_counter()
+from parser import *
+imported = time.perf_counter() - start
+after_import = rss()
+memory = Memory(int(sys.argv[1]))
+address = memory.malloc(int(sys.argv[2]))
+for offset in range(0, int(sys.argv[2]), 4096):
+    memory.store('int', address + offset, 1)
+print(json.dumps([imported, after_import - before, rss() - after_import]))
+"""
+
+def bench_lazy_memory(caps: list[int] = [1_000_000, 1 << 30], used: list[int] = [0, 64 * 1024, 16 << 20]):
+    """ Import time of the parser, which creates the state, and the memory a fresh process
+    takes for arenas of each cap when the program touches used bytes
+    """
+    for cap in caps:
+        for nbytes in used:
+            if nbytes > cap:
+                continue
+            result = subprocess.run([sys.executable, "-c", LAZY_MEMORY, str(cap), str(nbytes)],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)))
+            imported, import_rss, arena_rss = json.loads(result.stdout)
+            print(f"{cap} byte cap, {nbytes} bytes used: import {imported * 1000:8.2f} ms  "
+                  f"+{import_rss / 1024:6.2f} MiB  arena +{arena_rss / 1024:8.2f} MiB")
+
+if __name__ == "__main__":
+    files = sys.argv[1:] or [
+        f"{EXAMPLES}/fibonacci.c",
+        f"{EXAMPLES}/example.c",
+        f"{EXAMPLES}/loop.c",
+        f"{EXAMPLES}/array.c",
+        f"{EXAMPLES}/tail.c",
+        f"{EXAMPLES}/pure.c",
+        f"{EXAMPLES}/constants.c"
+    ]
+    bench_startup(files[0])
+    bench_ast_cache(files)
+    bench_scanner()
+    bench_streaming(files)
+    bench_engines(files)
+    bench_memory(files)
+    bench_arena()
+    bench_arrays()
+    bench_heap()
+    bench_memory_dump()
+    bench_lazy_memory()
+    bench_nodes()
+    bench_parse_scaling()
+    bench_parallel_parse()
+    bench_incremental()
+    bench_batch(files)
+    bench_optimizer(files)
+    bench_reuse(files)
+    bench_memoization(files)
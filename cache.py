@@ -0,0 +1,206 @@
+# Module for the bounded caches used by the interpreter
+
+import os
+import gc
+import mmap
+import pickle
+from collections import OrderedDict
+
+class LRUCache:
+    """ Maps keys to values, evicting the least recently used entry once full """
+    def __init__(self, size_: int):
+        self.size = size_
+        self.entries = OrderedDict()
+
+        # Counters for tuning size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        elif len(self.entries) >= self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.entries[key] = value
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return f"{len(self.entries)}/{self.size} entries, {self.hits} hits, {self.misses} misses, {self.evictions} evictions"
+
+
+class TraceRecorder:
+    """ Output of an interpreter while a memoized call runs, so the trace it prints
+    can be stored with its result and replayed on later hits
+    """
+    def __init__(self, stdout_):
+        self.stdout = stdout_
+        self.chunks = []
+
+    def write(self, text: str):
+        self.chunks.append(text)
+
+    def flush(self):
+        pass
+
+    def position(self) -> int:
+        return len(self.chunks)
+
+    def text(self, start: int) -> str:
+        """ Everything written since position start """
+        return "".join(self.chunks[start:])
+
+    def close(self):
+        """ Passes everything recorded on to the real stdout """
+        self.stdout.write("".join(self.chunks))
+        self.chunks = []
+
+
+def load_pickle(data) -> object:
+    """ pickle.loads with the garbage collector paused. Everything loaded stays alive,
+    so collections triggered while it is being created only slow the load down.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(data)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class DiskCache:
+    """ Pickled values stored as one file per key in directory_, capped at size_ bytes.
+    Entries are evicted least recently used first, going by file modification times.
+    """
+    def __init__(self, directory_: str, size_: int):
+        self.directory = directory_
+        self.size = size_
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def get(self, key: str, default=None):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                value = load_pickle(data)
+            # Marks the entry as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except Exception:
+            # Written by an incompatible version, or empty
+            self.misses += 1
+            self.remove(path)
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value):
+        if self.write(key, value):
+            self.evict()
+
+    def put_many(self, entries: dict):
+        """ put() for every key and value of entries, evicting once at the end """
+        written = [self.write(key, value) for key, value in entries.items()]
+        if any(written):
+            self.evict()
+
+    def write(self, key: str, value) -> bool:
+        """ Stores value without evicting, returns whether it was stored """
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.size:
+            return False
+        path = self.path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Moved into place so readers never see a partly written entry
+            pending = f"{path}.{os.getpid()}"
+            with open(pending, 'wb') as f:
+                f.write(data)
+            os.replace(pending, path)
+        except OSError:
+            # The cache is an optimization, the value was still computed
+            return False
+        return True
+
+    def evict(self):
+        """ Removes the least recently used entries until the cache fits in size """
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".pickle"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.size:
+                break
+            self.remove(path)
+            total -= size
+            self.evictions += 1
+
+    def remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def __str__(self):
+        return f"{self.size} byte cap, {self.hits} hits, {self.misses} misses, {self.evictions} evictions"
+
+
+class TieredCache:
+    """ LRUCache of size_ entries in front of a DiskCache, for a process that loads
+    the same entries again. Values are shared between the gets, so they must be read-only.
+    """
+    def __init__(self, size_: int, disk_: DiskCache):
+        self.memory = LRUCache(size_)
+        self.disk = disk_
+
+    def get(self, key: str, default=None):
+        value = self.memory.get(key)
+        if value is None:
+            value = self.disk.get(key)
+            if value is None:
+                return default
+            self.memory.put(key, value)
+        return value
+
+    def put(self, key: str, value):
+        self.memory.put(key, value)
+        self.disk.put(key, value)
+
+    def put_many(self, entries: dict):
+        for key, value in entries.items():
+            self.memory.put(key, value)
+        self.disk.put_many(entries)
+
+    def __str__(self):
+        return f"memory: {self.memory}, disk: {self.disk}"
@@ -0,0 +1,384 @@
+# Module to compile the parsed program in state into nested Python closures
+# Each expression and statement is converted once, so running it only costs function
+# calls: node types, variable scopes and operand shapes are all resolved up front.
+
+import operator
+
+from compiler import *
+
+# Kinds of compiled operands, used to specialize the closures built around them
+CONST = 'const'
+LOCAL = 'local'
+CODE = 'code'
+
+
+class ClosureFunction:
+    def __init__(self, name_: str, type_: str, nparams_: int):
+        self.name = name_
+        self.type = type_
+        self.nparams = nparams_
+        self.nslots = nparams_
+        # Runs the function body on a frame, returns (value,) on return or None
+        self.body = None
+        self.padding = []
+
+    def invoke(self, args: list):
+        r = self.body(args + self.padding)
+        return r[0] if r is not None else None
+
+
+class ClosureProgram:
+    def __init__(self, memory_: Memory, stack_size_: int):
+        # Memory the program's builtins allocate from
+        self.memory = memory_
+        # Most C calls nested at once, and how many are now
+        self.stack_size = stack_size_
+        self.depth = 0
+        self.functions: dict[str, ClosureFunction] = {}
+        self.global_index = {}
+        self.globals = []
+        # Evaluates global initializers before main() is called
+        self.init = None
+
+    def initialize_globals(self):
+        self.globals[:] = [None] * len(self.global_index)
+        # The frame running the global initializers and then main(), as on the tree walker's stack
+        self.depth = 1
+        self.init([])
+
+    def run_main(self, args: list):
+        return self.functions["main"].invoke(args)
+
+
+def make_binary(fn, left: tuple, right: tuple):
+    """ Builds fn(left, right) specialized on where each operand comes from """
+    lkind, l = left
+    rkind, r = right
+    if lkind == LOCAL and rkind == LOCAL:
+        return lambda f: fn(f[l], f[r])
+    if lkind == LOCAL and rkind == CONST:
+        return lambda f: fn(f[l], r)
+    if lkind == CODE and rkind == CONST:
+        return lambda f: fn(l(f), r)
+    if lkind == CODE and rkind == LOCAL:
+        return lambda f: fn(l(f), f[r])
+    if lkind == LOCAL and rkind == CODE:
+        return lambda f: fn(f[l], r(f))
+    if lkind == CONST and rkind == LOCAL:
+        return lambda f: fn(l, f[r])
+    if lkind == CONST and rkind == CODE:
+        return lambda f: fn(l, r(f))
+    if lkind == CONST and rkind == CONST:
+        return lambda f: fn(l, r)
+    return lambda f: fn(l(f), r(f))
+
+def make_block(statements: list):
+    """ Runs statements in order, stopping at the first one that returns """
+    if not statements:
+        return lambda f: None
+    if len(statements) == 1:
+        return statements[0]
+    statements = tuple(statements)
+    def block(f):
+        for statement in statements:
+            r = statement(f)
+            if r is not None:
+                return r
+    return block
+
+
+class ClosureCompiler:
+    def __init__(self, state_: State, memory_: Memory, stack_size_: int):
+        self.state = state_
+        self.program = ClosureProgram(memory_, stack_size_)
+
+        self.function: ClosureFunction = None
+        # Scope chain of {name: slot}, empty when compiling global initializers
+        self.scopes: list[dict] = []
+
+    def compile(self) -> ClosureProgram:
+        for name in self.state.global_variables:
+            self.program.global_index[name] = len(self.program.global_index)
+        self.program.globals = [None] * len(self.program.global_index)
+
+        # Create every function first so call sites can bind to them directly
+        for name, function in self.state.functions.items():
+            if BODY in function:
+                self.program.functions[name] = ClosureFunction(
+                    name, function[TYPE], len(named_parameters(function[PARAMETERS])))
+
+        self.program.init = self.compile_globals()
+        for name, function in self.state.functions.items():
+            if BODY in function:
+                self.compile_function(self.program.functions[name], function)
+        return self.program
+
+    def compile_globals(self):
+        self.scopes = []
+        statements = []
+        for name, gv in self.state.global_variables.items():
+            if gv[VALUE] is None and not is_array_declaration(gv):
+                # Variable declared but no value assigned
+                continue
+            statements.append(self.compile_declaration(gv | {NAME: name}))
+        return make_block(statements)
+
+    def compile_function(self, function: ClosureFunction, ast: dict):
+        self.function = function
+        self.scopes = [{param[NAME]: slot for slot, param in enumerate(named_parameters(ast[PARAMETERS]))}]
+        function.body = self.compile_block(ast[BODY])
+        function.padding = [None] * (function.nslots - function.nparams)
+
+    def new_slot(self) -> int:
+        self.function.nslots += 1
+        return self.function.nslots - 1
+
+    def resolve(self, name: str) -> tuple[bool, int]:
+        """ Returns (is_local, slot) for a variable name """
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return True, scope[name]
+        if name in self.program.global_index:
+            return False, self.program.global_index[name]
+        err = f"{name} assigned before declaration."
+        raise Exception(err)
+
+    # Statements
+
+    def compile_block(self, statements: list[dict]):
+        self.scopes.append({})
+        block = make_block([self.compile_statement(s) for s in as_statements(statements)])
+        self.scopes.pop()
+        return block
+
+    def compile_statement(self, statement: dict):
+        # Entries of a for loop's update list may not carry an instruction
+        instruction = statement.get(INSTRUCTION, VARIABLE_ASSIGNMENT)
+        if instruction == VARIABLE_DECLARATION:
+            return self.compile_declaration(statement)
+        elif instruction == VARIABLE_ASSIGNMENT:
+            return self.compile_assignment(statement)
+        elif instruction == FOR_LOOP:
+            return self.compile_for_loop(statement)
+        elif instruction == IF:
+            cond = self.compile_condition(statement[COND])
+            body = self.compile_block(statement[BODY])
+            def if_statement(f):
+                if cond(f):
+                    return body(f)
+            return if_statement
+        elif instruction == PRINT:
+            return self.compile_print(statement)
+        elif instruction == RETURN:
+            if statement[VALUE] is None:
+                def return_none(f):
+                    print("return(None)")
+                    return (None,)
+                return return_none
+            value = self.compile_expr(statement[VALUE])
+            def return_value(f):
+                v = value(f)
+                print(f"return({format_value(v)})")
+                return (v,)
+            return return_value
+        elif instruction == FUNCTION_CALL or instruction in binary_operators:
+            # Expression statement, result is discarded
+            expr = self.compile_expr(statement)
+            def expression_statement(f):
+                expr(f)
+            return expression_statement
+        else:
+            err = f"\t{instruction} not ready"
+            raise Exception(err)
+
+    def compile_declaration(self, statement: dict):
+        if is_array_declaration(statement):
+            values = tuple(self.compile_expr(ast) for ast in as_statements(statement[VALUE]))
+            if statement[SIZE] is not None:
+                size = self.compile_expr(statement[SIZE])
+            else:
+                size = lambda f, n=len(values): n
+            def make_array(f, type_=statement[TYPE]):
+                return new_array(type_, [value(f) for value in values], size(f))
+            value = make_array
+        elif statement[VALUE] is not None:
+            value = self.compile_expr(statement[VALUE])
+        else:
+            value = lambda f: None
+
+        if not self.scopes:
+            # Global initializer
+            g = self.program.globals
+            index = self.program.global_index[statement[NAME]]
+            def declare_global(f):
+                g[index] = value(f)
+            return declare_global
+
+        # The value is evaluated before the name enters scope
+        slot = self.new_slot()
+        self.scopes[-1][statement[NAME]] = slot
+        def declare(f):
+            f[slot] = value(f)
+        return declare
+
+    def compile_assignment(self, statement: dict):
+        if statement[VALUE] is None:
+            # Bare name in a variable list, nothing to evaluate
+            return lambda f: None
+        is_local, slot = self.resolve(statement[NAME])
+        value = self.compile_expr(statement[VALUE])
+        g = self.program.globals
+
+        if statement[POINTER]:
+            # When assigning arrays, SIZE holds the index
+            index = self.compile_expr(statement[SIZE])
+            if is_local:
+                def assign_element(f):
+                    v = value(f)
+                    i = index(f)
+                    try:
+                        f[slot][i] = v
+                    except TypeError:
+                        store_element(f[slot], i, v)
+            else:
+                def assign_element(f):
+                    v = value(f)
+                    i = index(f)
+                    try:
+                        g[slot][i] = v
+                    except TypeError:
+                        store_element(g[slot], i, v)
+            return assign_element
+        elif is_local:
+            def assign(f):
+                f[slot] = value(f)
+            return assign
+        else:
+            def assign_global(f):
+                g[slot] = value(f)
+            return assign_global
+
+    def compile_for_loop(self, statement: dict):
+        # Variables declared in the init block are scoped to the loop
+        self.scopes.append({})
+        init = make_block([self.compile_statement(s) for s in as_statements(statement[INIT])])
+        cond = self.compile_condition(statement[COND])
+        body = self.compile_block(statement[BODY])
+        update = make_block([self.compile_statement(s) for s in as_statements(statement[UPDATE])])
+        self.scopes.pop()
+
+        def for_loop(f):
+            init(f)
+            while cond(f):
+                r = body(f)
+                if r is not None:
+                    return r
+                update(f)
+        return for_loop
+
+    def compile_condition(self, cond: dict):
+        """ Like compile_expr, but comparisons produce bools instead of 1 and 0 """
+        if cond.get(INSTRUCTION) in comparisons and not cond.get(NEGATIVE):
+            return make_binary(binary_operators[cond[INSTRUCTION]],
+                               self.compile_operand(cond[VALUE][L]),
+                               self.compile_operand(cond[VALUE][R]))
+        return self.compile_expr(cond)
+
+    def compile_print(self, statement: dict):
+        prefix = print_prefix(statement)
+        arguments = tuple(self.compile_expr(arg) for arg in as_statements(statement[ARGUMENTS]))
+        def printf(f):
+            print(prefix + "".join(", " + format_value(arg(f)) for arg in arguments) + ")")
+        return printf
+
+    # Expressions
+
+    def compile_expr(self, ast: dict):
+        """ Returns a closure that evaluates the expression on a frame """
+        kind, operand = self.compile_operand(ast)
+        if kind == CONST:
+            return lambda f: operand
+        if kind == LOCAL:
+            return lambda f: f[operand]
+        return operand
+
+    def compile_operand(self, ast: dict) -> tuple:
+        """ Compiles an expression to (CONST, value), (LOCAL, slot) or (CODE, closure) """
+        if INSTRUCTION not in ast:
+            # Leaf node, negation is applied at compile time
+            return CONST, -ast[VALUE] if ast.get(NEGATIVE) else ast[VALUE]
+
+        instruction = ast[INSTRUCTION]
+        if instruction == VAR_LOOKUP:
+            is_local, slot = self.resolve(ast[VALUE][NAME])
+            g = self.program.globals
+            if ast[VALUE][INDEX] is not None:
+                index = self.compile_operand(ast[VALUE][INDEX])
+                if is_local:
+                    code = make_binary(operator.getitem, (LOCAL, slot), index)
+                else:
+                    code = make_binary(operator.getitem, (CODE, lambda f: g[slot]), index)
+            elif is_local:
+                if not ast.get(NEGATIVE):
+                    return LOCAL, slot
+                code = lambda f: f[slot]
+            else:
+                code = lambda f: g[slot]
+        elif instruction == FUNCTION_CALL:
+            code = self.compile_call(ast)
+        elif instruction in binary_operators:
+            code = make_binary(binary_operators[instruction],
+                               self.compile_operand(ast[VALUE][L]),
+                               self.compile_operand(ast[VALUE][R]))
+            if instruction in comparisons:
+                compare = code
+                code = lambda f: 1 if compare(f) else 0
+        else:
+            err = f"{instruction} not processed yet"
+            raise Exception(err)
+
+        if ast.get(NEGATIVE):
+            value = code
+            code = lambda f: -value(f)
+        return CODE, code
+
+    def compile_call(self, ast: dict):
+        name = ast[VALUE][NAME]
+        args = tuple(self.compile_expr(arg) for arg in ast[VALUE][ARGUMENTS])
+        if is_builtin(self.state, name):
+            memory = self.program.memory
+            def builtin(f):
+                values = [arg(f) for arg in args]
+                # Print function call to output
+                print(f"{name}(" + ", ".join(format_value(v) for v in values) + ")")
+                return call_builtin(memory, name, values)
+            return builtin
+        if name not in self.program.functions:
+            def undefined(f):
+                err = f"{name} called but never defined."
+                raise Exception(err)
+            return undefined
+
+        function = self.program.functions[name]
+        if function.nparams != len(args):
+            err = f"{name} takes {function.nparams} arguments but {len(args)} were given."
+            raise Exception(err)
+
+        program = self.program
+        def call(f):
+            values = [arg(f) for arg in args]
+            # Print function call to output
+            print(f"{name}(" + ", ".join(format_value(v) for v in values) + ")")
+            if program.depth >= program.stack_size:
+                err = f"Stack overflow: more than {program.stack_size} nested calls when calling {name}()"
+                raise StackOverflow(err)
+            program.depth += 1
+            try:
+                return function.invoke(values)
+            finally:
+                program.depth -= 1
+        return call
+
+
+def compile_closures(state_: State, memory_: Memory, stack_size_: int) -> ClosureProgram:
+    return ClosureCompiler(state_, memory_, stack_size_).compile()
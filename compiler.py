@@ -0,0 +1,573 @@
+# Module to lower the parsed program in state into bytecode for the VM (vm.py)
+
+import array
+import operator
+
+from parser import *
+
+""" Bytecode layout
+Every instruction is a tuple (opcode, a, b, c). Operands are frame slots that
+are resolved once at compile time:
+    - parameters and local variables, one slot per declaration
+    - constants, stored in the frame template so they are copied in on each call
+    - operand stack entries. The stack depth at every instruction is known at
+      compile time, so each stack position is given its own slot and values
+      never move through a runtime stack.
+Global variables live in a separate list and are moved in and out of frame
+slots with LOAD_GLOBAL / STORE_GLOBAL.
+"""
+
+# Opcodes, numbered roughly by how often they run in loop bodies
+OP_ADD = 0              # f[a] = f[b] + f[c]
+OP_SUBTRACT = 1         # f[a] = f[b] - f[c]
+OP_MULTIPLY = 2         # f[a] = f[b] * f[c]
+MOVE = 3                # f[a] = f[b]
+JUMP_IF_LT = 4          # if f[a] < f[b]: goto c
+JUMP_IF_GT = 5
+JUMP_IF_LEQ = 6
+JUMP_IF_GEQ = 7
+JUMP_IF_EQ = 8
+JUMP_IF_NE = 9
+LOAD_ELEM = 10          # f[a] = f[b][f[c]]
+STORE_ELEM = 11         # f[a][f[b]] = f[c], see store_element
+OP_DIVIDE = 12          # f[a] = f[b] / f[c]
+OP_LT = 13              # f[a] = 1 if f[b] < f[c] else 0
+OP_GT = 14
+OP_LEQ = 15
+OP_GEQ = 16
+OP_EQ = 17
+OP_NE = 18
+JUMP = 19               # goto a
+JUMP_IF_TRUE = 20       # if f[a]: goto b
+JUMP_IF_FALSE = 21      # if not f[a]: goto b
+LOAD_GLOBAL = 22        # f[a] = globals[b]
+STORE_GLOBAL = 23       # globals[a] = f[b]
+CALL = 24               # f[a] = function_table[b]([f[s] for s in c])
+PRINTF = 25             # print print_table[a] with [f[s] for s in b]
+RETURN_VALUE = 26       # return f[a]
+RETURN_NONE = 27        # return None, traced if a
+OP_NEGATE = 28          # f[a] = -f[b]
+MAKE_ARRAY = 29         # f[a] = new_array(c[0], [f[s] for s in c[1]], f[b])
+TAIL_CALL = 30          # restart the function with [f[s] for s in c] as arguments, traced return if a
+CALL_BUILTIN = 31       # f[a] = call_builtin(memory, b, [f[s] for s in c])
+
+binary_opcodes = {
+    ADD: OP_ADD,
+    SUBTRACT: OP_SUBTRACT,
+    MULTIPLY: OP_MULTIPLY,
+    DIVIDE: OP_DIVIDE,
+    '<': OP_LT,
+    '>': OP_GT,
+    '<=': OP_LEQ,
+    '>=': OP_GEQ,
+    '==': OP_EQ,
+    '!=': OP_NE
+}
+
+comparisons = ['<', '>', '<=', '>=', '==', '!=']
+
+# Python equivalents of the binary instructions, comparisons return bools
+binary_operators = {
+    ADD: operator.add,
+    SUBTRACT: operator.sub,
+    MULTIPLY: operator.mul,
+    DIVIDE: operator.truediv,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+# Fused compare and branch, used for loop and if conditions
+jump_opcodes = {
+    '<': JUMP_IF_LT,
+    '>': JUMP_IF_GT,
+    '<=': JUMP_IF_LEQ,
+    '>=': JUMP_IF_GEQ,
+    '==': JUMP_IF_EQ,
+    '!=': JUMP_IF_NE
+}
+
+# Branch taken when the comparison does not hold
+inverse_comparisons = {
+    '<': '>=',
+    '>': '<=',
+    '<=': '>',
+    '>=': '<',
+    '==': '!=',
+    '!=': '=='
+}
+
+opnames = {value: name for name, value in list(globals().items())
+           if name.isupper() and type(value) == int}
+
+
+class Bytecode:
+    def __init__(self, name_: str, type_: str, nparams_: int):
+        self.name = name_
+        self.type = type_
+        self.nparams = nparams_
+        # List of (opcode, a, b, c) tuples
+        self.code = []
+        # Initial frame: None for locals and stack slots, values for constants
+        self.template = [None] * nparams_
+
+    def __str__(self):
+        lines = [f"{self.name} ({self.nparams} params, {len(self.template)} slots)"]
+        for pc, (op, a, b, c) in enumerate(self.code):
+            lines.append(f"\t{pc}: {opnames[op]} {a} {b} {c}")
+        return "\n".join(lines)
+
+
+class Program:
+    def __init__(self):
+        # Functions are referenced by index from CALL instructions
+        self.function_table: list[Bytecode | None] = []
+        self.function_index = {}
+        self.function_names = []
+        # Global variables are referenced by index from *_GLOBAL instructions
+        self.global_index = {}
+        # printf calls are referenced by index from PRINTF instructions
+        self.print_table = []
+        # Evaluates global initializers before main() is called
+        self.init: Bytecode = None
+
+
+# Scalar values are plain Python ints and floats whatever type they were declared with, as
+# in the baseline tree walker: int n = 5 / 2; holds 2.5 and every engine traces it that way.
+# Coercing on store would change those traces, so only arrays carry their C type.
+# array.array type codes of C array elements. ints take 64 bits and floats are doubles,
+# the range of int and float values everywhere else in the interpreter. char values are
+# 1 character strings, so char arrays stay lists.
+array_types = {
+    'int': 'q',
+    'float': 'd',
+}
+# Runtime values of C arrays
+ARRAY_TYPES = (list, array.array)
+
+def new_array(type_: str, values: list, size: int) -> array.array | list:
+    """ C array of type_ holding values, padded with 0s to size elements: int a[5] = {0}; """
+    if type_ not in array_types:
+        if size > len(values):
+            values += [0] * (size - len(values))
+        return values
+    if type_ == 'int' and any(type(value) == float for value in values):
+        # Truncated as C converts them, int a[2] = {n / 2};
+        values = [int(value) if type(value) == float else value for value in values]
+    if size <= len(values):
+        return array.array(array_types[type_], values)
+    # Repeated rather than grown, so the buffer is exactly size elements
+    elements = array.array(array_types[type_], [0]) * size
+    elements[:len(values)] = array.array(array_types[type_], values)
+    return elements
+
+def store_element(elements, index: int, value):
+    """ elements[index] = value, once the plain store raised TypeError. Int arrays refuse
+    floats, which are truncated as C converts them. Any other error is raised again.
+    """
+    if type(value) == float and type(elements) == array.array and elements.typecode == array_types['int']:
+        value = int(value)
+    elements[index] = value
+
+def format_value(value) -> str:
+    """ Formats a runtime value the way the tree walker traces it """
+    if type(value) in ARRAY_TYPES:
+        return "[" + ", ".join(str(e) for e in value) + "]"
+    return str(value)
+
+def print_prefix(statement: dict) -> str:
+    """ Builds the constant part of the printf trace: print("<format>" """
+    prefix = "print(\""
+    for string in statement[VALUE]:
+        if type(string) == str:
+            prefix += string
+        else:
+            prefix += string[TYPE]
+    return prefix + "\""
+
+def named_parameters(parameters: list[dict] | None) -> list[dict]:
+    """ Drops unnamed parameters such as the one in main(void) """
+    if not parameters:
+        return []
+    return [param for param in parameters if param[NAME] is not None]
+
+def as_statements(statements) -> list:
+    """ for_init and variable lists can be a single node, a list or None """
+    if statements is None:
+        return []
+    if isinstance(statements, NODE_TYPES):
+        return [statements]
+    return statements
+
+def is_array_declaration(statement: dict) -> bool:
+    return statement[POINTER] and (statement[SIZE] is not None or type(statement[VALUE]) in LIST_TYPES)
+
+def is_self_call(ast: dict | None, function: str) -> bool:
+    """ A call to function whose result is used unchanged, so it can reuse the caller's frame """
+    return ast is not None and ast.get(INSTRUCTION) == FUNCTION_CALL \
+        and ast[VALUE][NAME] == function and not ast.get(NEGATIVE)
+
+def is_builtin(state_: State, name: str) -> bool:
+    """ A C library function from memory.py that the program calls without defining """
+    function = state_.functions.get(name)
+    return name in BUILTINS and (function is None or BODY not in function)
+
+def call_builtin(memory: Memory, name: str, args: list):
+    """ Runs the C library function name on the program's memory. Calls to it are traced
+    as they are made, but nothing is traced as they return.
+    """
+    return BUILTINS[name](memory, *args)
+
+def push_tail_call(frame: Frame, traced: bool):
+    """ Records a self call that reused frame. traced is True for return f(...), which
+    prints a return trace, and False for a call that ends a function. Run length encoded
+    so long tail recursive loops stay constant size.
+    """
+    if not frame.tail_calls:
+        frame.tail_calls = [[traced, 1]]
+    elif frame.tail_calls[-1][0] == traced:
+        frame.tail_calls[-1][1] += 1
+    else:
+        frame.tail_calls.append([traced, 1])
+
+def finish_tail_calls(frame: Frame, value, out=None):
+    """ Prints the return traces of the calls that reused frame to out (sys.stdout by
+    default), innermost first, and returns the value the outermost of them returns
+    """
+    for traced, count in reversed(frame.tail_calls):
+        if traced:
+            line = f"return({format_value(value)})"
+            for _ in range(count):
+                print(line, file=out)
+        else:
+            # Falling off the end of a function returns None without a trace
+            value = None
+    frame.tail_calls = None
+    return value
+
+
+class Compiler:
+    def __init__(self, state_: State):
+        self.state = state_
+        self.program = Program()
+
+        # Per function compile state
+        self.bytecode: Bytecode = None
+        # Scope chain of {name: slot}, empty when compiling global initializers
+        self.scopes: list[dict] = []
+        # {(type, value): slot}
+        self.consts = {}
+        # Slots backing the operand stack, reused once a value is consumed
+        self.stack_slots = []
+        self.depth = 0
+
+    def compile(self) -> Program:
+        for name in self.state.global_variables:
+            self.program.global_index[name] = len(self.program.global_index)
+
+        self.program.init = self.compile_globals()
+        for name, function in self.state.functions.items():
+            if BODY in function:
+                index = self.function_slot(name)
+                self.program.function_table[index] = self.compile_function(name, function)
+        return self.program
+
+    def function_slot(self, name: str) -> int:
+        if name not in self.program.function_index:
+            self.program.function_index[name] = len(self.program.function_table)
+            self.program.function_table.append(None)
+            self.program.function_names.append(name)
+        return self.program.function_index[name]
+
+    def begin(self, name: str, type_: str, parameters: list[dict]):
+        self.bytecode = Bytecode(name, type_, len(parameters))
+        self.scopes = [{param[NAME]: slot for slot, param in enumerate(parameters)}]
+        self.consts = {}
+        self.stack_slots = []
+        self.depth = 0
+
+    def compile_globals(self) -> Bytecode:
+        self.begin("<globals>", None, [])
+        self.scopes = []
+        for name, gv in self.state.global_variables.items():
+            if gv[VALUE] is None and not is_array_declaration(gv):
+                # Variable declared but no value assigned
+                continue
+            self.compile_declaration(gv | {NAME: name})
+        self.emit(RETURN_NONE, 0)
+        return self.bytecode
+
+    def compile_function(self, name: str, function: dict) -> Bytecode:
+        self.begin(name, function[TYPE], named_parameters(function[PARAMETERS]))
+        self.compile_block(function[BODY], tail=True)
+        # Falling off the end of a function returns without a trace
+        self.emit(RETURN_NONE, 0)
+        return self.bytecode
+
+    # Emitters and slot allocation
+
+    def emit(self, op: int, a=0, b=0, c=0) -> int:
+        self.bytecode.code.append((op, a, b, c))
+        return len(self.bytecode.code) - 1
+
+    def patch(self, pc: int, target: int):
+        """ Sets the target of a jump, which is its last operand """
+        op, a, b, c = self.bytecode.code[pc]
+        if op == JUMP:
+            a = target
+        elif op in (JUMP_IF_TRUE, JUMP_IF_FALSE):
+            b = target
+        else:
+            c = target
+        self.bytecode.code[pc] = (op, a, b, c)
+
+    def new_slot(self, value=None) -> int:
+        self.bytecode.template.append(value)
+        return len(self.bytecode.template) - 1
+
+    def const(self, value) -> int:
+        # Keyed by type as well so 1 and 1.0 stay distinct
+        key = (type(value), value)
+        if key not in self.consts:
+            self.consts[key] = self.new_slot(value)
+        return self.consts[key]
+
+    def push(self) -> int:
+        if self.depth == len(self.stack_slots):
+            self.stack_slots.append(self.new_slot())
+        self.depth += 1
+        return self.stack_slots[self.depth - 1]
+
+    def release(self, *slots: int):
+        """ Pops operand stack slots, top first, once their values have been consumed """
+        for slot in slots:
+            if self.depth and slot == self.stack_slots[self.depth - 1]:
+                self.depth -= 1
+
+    def resolve(self, name: str) -> tuple[bool, int]:
+        """ Returns (is_local, slot) for a variable name """
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return True, scope[name]
+        if name in self.program.global_index:
+            return False, self.program.global_index[name]
+        err = f"{name} assigned before declaration."
+        raise Exception(err)
+
+    # Statements
+
+    def compile_block(self, statements: list[dict], tail: bool = False):
+        """ tail is set for a function body, where a trailing self call is a tail call """
+        self.scopes.append({})
+        statements = as_statements(statements)
+        for index, statement in enumerate(statements):
+            if tail and index == len(statements) - 1 and is_self_call(statement, self.bytecode.name):
+                self.compile_tail_call(statement, False)
+            else:
+                self.compile_statement(statement)
+        self.scopes.pop()
+
+    def compile_statement(self, statement: dict):
+        # Entries of a for loop's update list may not carry an instruction
+        instruction = statement.get(INSTRUCTION, VARIABLE_ASSIGNMENT)
+        if instruction == VARIABLE_DECLARATION:
+            self.compile_declaration(statement)
+        elif instruction == VARIABLE_ASSIGNMENT:
+            self.compile_assignment(statement)
+        elif instruction == FOR_LOOP:
+            self.compile_for_loop(statement)
+        elif instruction == IF:
+            jump = self.compile_condition(statement[COND], False)
+            self.compile_block(statement[BODY])
+            self.patch(jump, len(self.bytecode.code))
+        elif instruction == PRINT:
+            self.compile_print(statement)
+        elif instruction == RETURN:
+            if statement[VALUE] is None:
+                self.emit(RETURN_NONE, 1)
+            elif is_self_call(statement[VALUE], self.bytecode.name):
+                self.compile_tail_call(statement[VALUE], True)
+            else:
+                slot = self.compile_expr(statement[VALUE])
+                self.release(slot)
+                self.emit(RETURN_VALUE, slot)
+        elif instruction == FUNCTION_CALL or instruction in binary_opcodes:
+            # Expression statement, result is discarded
+            self.release(self.compile_expr(statement))
+        else:
+            err = f"\t{instruction} not ready"
+            raise Exception(err)
+
+    def compile_tail_call(self, ast: dict, traced: bool):
+        """ Restarts the function in its own frame instead of calling it """
+        args = [self.compile_expr(arg) for arg in ast[VALUE][ARGUMENTS]]
+        if self.bytecode.nparams != len(args):
+            err = f"{self.bytecode.name} takes {self.bytecode.nparams} arguments but {len(args)} were given."
+            raise Exception(err)
+        self.release(*reversed(args))
+        self.emit(TAIL_CALL, 1 if traced else 0, 0, tuple(args))
+
+    def compile_declaration(self, statement: dict):
+        if not self.scopes:
+            # Global initializer
+            dest = self.push()
+        else:
+            # Allocated now but only enters scope after the value is evaluated
+            dest = self.new_slot()
+
+        if is_array_declaration(statement):
+            values = [self.compile_expr(ast) for ast in as_statements(statement[VALUE])]
+            if statement[SIZE] is not None:
+                size = self.compile_expr(statement[SIZE])
+            else:
+                size = self.const(len(values))
+            self.release(size, *reversed(values))
+            self.emit(MAKE_ARRAY, dest, size, (statement[TYPE], tuple(values)))
+        elif statement[VALUE] is not None:
+            self.compile_expr(statement[VALUE], dest)
+        else:
+            self.emit(MOVE, dest, self.const(None))
+
+        if not self.scopes:
+            self.release(dest)
+            self.emit(STORE_GLOBAL, self.program.global_index[statement[NAME]], dest)
+        else:
+            self.scopes[-1][statement[NAME]] = dest
+
+    def compile_assignment(self, statement: dict):
+        if statement[VALUE] is None:
+            # Bare name in a variable list, nothing to evaluate
+            return
+        is_local, slot = self.resolve(statement[NAME])
+        if statement[POINTER]:
+            # When assigning arrays, SIZE holds the index
+            value = self.compile_expr(statement[VALUE])
+            index = self.compile_expr(statement[SIZE])
+            if not is_local:
+                elements = self.push()
+                self.emit(LOAD_GLOBAL, elements, slot)
+                self.release(elements)
+                slot = elements
+            self.release(index, value)
+            self.emit(STORE_ELEM, slot, index, value)
+        elif is_local:
+            # Evaluate straight into the variable's slot
+            self.compile_expr(statement[VALUE], slot)
+        else:
+            value = self.compile_expr(statement[VALUE])
+            self.release(value)
+            self.emit(STORE_GLOBAL, slot, value)
+
+    def compile_for_loop(self, statement: dict):
+        # Variables declared in the init block are scoped to the loop
+        self.scopes.append({})
+        for var in as_statements(statement[INIT]):
+            self.compile_statement(var)
+
+        # The condition is placed after the body so each iteration takes one branch:
+        #   JUMP cond; body: <body> <update>; cond: JUMP_IF_<cond> body
+        jump = self.emit(JUMP)
+        body = len(self.bytecode.code)
+        self.compile_block(statement[BODY])
+        for update in as_statements(statement[UPDATE]):
+            self.compile_statement(update)
+        self.patch(jump, len(self.bytecode.code))
+        self.patch(self.compile_condition(statement[COND], True), body)
+        self.scopes.pop()
+
+    def compile_condition(self, cond: dict, when: bool) -> int:
+        """ Emits a branch taken when cond is truthy (when=True) or falsy, returns its pc """
+        instruction = cond.get(INSTRUCTION)
+        if instruction in jump_opcodes and not cond.get(NEGATIVE):
+            left = self.compile_expr(cond[VALUE][L])
+            right = self.compile_expr(cond[VALUE][R])
+            self.release(right, left)
+            if not when:
+                instruction = inverse_comparisons[instruction]
+            return self.emit(jump_opcodes[instruction], left, right)
+
+        slot = self.compile_expr(cond)
+        self.release(slot)
+        return self.emit(JUMP_IF_TRUE if when else JUMP_IF_FALSE, slot)
+
+    def compile_print(self, statement: dict):
+        arguments = [self.compile_expr(arg) for arg in as_statements(statement[ARGUMENTS])]
+        self.release(*reversed(arguments))
+        self.program.print_table.append(print_prefix(statement))
+        self.emit(PRINTF, len(self.program.print_table) - 1, tuple(arguments))
+
+    # Expressions
+
+    def compile_expr(self, ast: dict, dest: int = None) -> int:
+        """ Emits code for an expression and returns the slot holding its value
+        Args:
+            ast (dict): Expression node
+            dest (int): Slot to evaluate into, otherwise the value is left in
+                        an operand stack slot or read in place from a local
+        """
+        negative = ast.get(NEGATIVE)
+
+        if INSTRUCTION not in ast:
+            # Leaf node, negation is applied at compile time
+            slot = self.const(-ast[VALUE] if negative else ast[VALUE])
+            if dest is not None:
+                self.emit(MOVE, dest, slot)
+                return dest
+            return slot
+
+        instruction = ast[INSTRUCTION]
+        if instruction == VAR_LOOKUP:
+            is_local, slot = self.resolve(ast[VALUE][NAME])
+            if not is_local:
+                elements = self.push()
+                self.emit(LOAD_GLOBAL, elements, slot)
+                slot = elements
+            if ast[VALUE][INDEX] is not None:
+                index = self.compile_expr(ast[VALUE][INDEX])
+                self.release(index, slot)
+                result = self.push() if dest is None or negative else dest
+                self.emit(LOAD_ELEM, result, slot, index)
+            elif dest is not None and not negative:
+                self.release(slot)
+                self.emit(MOVE, dest, slot)
+                result = dest
+            else:
+                # Locals are read in place
+                result = slot
+        elif instruction == FUNCTION_CALL:
+            name = ast[VALUE][NAME]
+            args = [self.compile_expr(arg) for arg in ast[VALUE][ARGUMENTS]]
+            if name in self.state.functions:
+                nparams = len(named_parameters(self.state.functions[name][PARAMETERS]))
+                if nparams != len(args):
+                    err = f"{name} takes {nparams} arguments but {len(args)} were given."
+                    raise Exception(err)
+            self.release(*reversed(args))
+            result = self.push() if dest is None or negative else dest
+            if is_builtin(self.state, name):
+                self.emit(CALL_BUILTIN, result, name, tuple(args))
+            else:
+                self.emit(CALL, result, self.function_slot(name), tuple(args))
+        elif instruction in binary_opcodes:
+            left = self.compile_expr(ast[VALUE][L])
+            right = self.compile_expr(ast[VALUE][R])
+            self.release(right, left)
+            result = self.push() if dest is None or negative else dest
+            self.emit(binary_opcodes[instruction], result, left, right)
+        else:
+            err = f"{instruction} not processed yet"
+            raise Exception(err)
+
+        if negative:
+            self.release(result)
+            target = self.push() if dest is None else dest
+            self.emit(OP_NEGATE, target, result)
+            result = target
+        return result
+
+
+def compile_program(state_: State) -> Program:
+    return Compiler(state_).compile()
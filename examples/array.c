@@ -0,0 +1,14 @@
+#include <stdio.h>
+
+int main() {
+    int values[20000] = {0};
+    int sum = 0;
+    for (int i = 0; i < 20000; i++) {
+        values[i] = i * 3 - 7;
+    }
+    for (int j = 0; j < 20000; j++) {
+        sum = sum + values[j];
+    }
+    printf("%d %d\n", sum, values[19999]);
+    return 0;
+}
@@ -0,0 +1,14 @@
+#include <stdio.h>
+
+int scale = 60 * 60 * 24;
+
+int main() {
+    int sum = 0;
+    float ratio = 0.0;
+    for (int i = 0; i < 50000; i++) {
+        sum = sum + i * 1 + (3 * 4 + 1) - (2 < 3) * 5 + 0;
+        ratio = ratio + -(1.5 * 2) / (4 - 2);
+    }
+    printf("%d %f %d\n", sum, ratio, scale);
+    return 0;
+}
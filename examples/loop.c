@@ -0,0 +1,19 @@
+#include <stdio.h>
+
+int total = 0;
+
+int square(int x) {
+    return x * x;
+}
+
+int main() {
+    int sum = 0;
+    int values[100] = {0};
+    for (int i = 0; i < 100000; i++) {
+        sum = sum + i * 2 - 1;
+        values[99] = sum;
+    }
+    total = sum + square(3);
+    printf("%d %d\n", total, values[99]);
+    return 0;
+}
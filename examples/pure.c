@@ -0,0 +1,22 @@
+#include <stdio.h>
+
+int offset = 7;
+
+int square(int x) {
+    return x * x;
+}
+
+int poly(int x) {
+    return square(x) * 3 + square(x + 1) - offset * x;
+}
+
+int main() {
+    int total = 0;
+    for (int i = 0; i < 200; i++) {
+        for (int j = 0; j < 50; j++) {
+            total = total + poly(j);
+        }
+    }
+    printf("%d\n", total);
+    return 0;
+}
@@ -0,0 +1,30 @@
+#include <stdio.h>
+
+int count(int n, int acc) {
+    if (n < 1) {
+        return acc;
+    }
+    return count(n - 1, acc + n);
+}
+void loop(int n) {
+    if (n < 1) {
+        return;
+    }
+    loop(n - 1);
+}
+int mixed(int n) {
+    if (n < 1) {
+        return 7;
+    }
+    if (n < 3) {
+        return mixed(n - 1);
+    }
+    mixed(n - 1);
+}
+int main() {
+    int s = count(2000, 0);
+    loop(2000);
+    int m = mixed(5);
+    printf("%d %d\n", s, m);
+    return 0;
+}
@@ -0,0 +1,61 @@
+# Module to reparse only the top-level statements of a program that changed since it was last parsed
+# The token stream is split between top-level statements as in parallel.py. Statements are
+# looked up in the AST cache by a hash of their tokens, and only the ones that are not there
+# go through the parser and the optimizer. Their nodes are frozen and cached for the next
+# run, so after an edit only the edited functions are parsed again.
+
+import hashlib
+
+from parallel import *
+from optimizer import Optimizer, count_nodes
+from cache import DiskCache
+
+def split_statements(tokens: list[tuple]) -> list[list[tuple]]:
+    """ The tokens of each top-level statement """
+    parts = []
+    start = 0
+    for end in statement_ends(tokens):
+        if end > start:
+            parts.append(tokens[start:end])
+        start = end
+    return parts
+
+def statement_key(prefix: str, tokens: list[tuple]) -> str:
+    """ Cache key of a statement. Only token types and values are hashed, the parser
+    builds the same nodes for them wherever they are and however they are spaced.
+    """
+    digest = hashlib.sha256(prefix.encode())
+    digest.update(repr([t[:2] for t in tokens]).encode())
+    return digest.hexdigest()
+
+def parse_incremental(lexer, cache: DiskCache, prefix: str, optimize: bool) -> int:
+    """ Parses the lexer's input, reusing the statements found in cache, and records
+    the global statements in state.
+    Args:
+        prefix (str): Hashed into every key, so statements parsed by another grammar
+            or with other options are not reused
+        optimize (bool): Whether to fold the statements that are parsed
+    Returns:
+        int: Number of nodes the optimizer removed from the statements that were parsed
+    """
+    optimizer = Optimizer(state)
+    statements = []
+    parsed = {}
+    removed = 0
+    for part in split_statements(read_tokens(lexer)):
+        key = statement_key(prefix, part)
+        nodes = parsed.get(key)
+        if nodes is None:
+            nodes = cache.get(key)
+        if nodes is None:
+            nodes = parse_tokens(part)
+            if optimize:
+                folded = [optimizer.fold(statement) for statement in nodes]
+                removed += count_nodes(nodes) - count_nodes(folded)
+                nodes = folded
+            nodes = freeze(nodes)
+            parsed[key] = nodes
+        statements.extend(nodes)
+    cache.put_many(parsed)
+    add_global_statements(statements)
+    return removed
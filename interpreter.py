@@ -1,143 +1,282 @@
 import os, sys
-import ply
-import graphviz
-import json
+import copy
+import hashlib
+from collections import deque
 
 import ply.lex as lex
-import ply.yacc as yacc
 
 from lexer import *
 from parser import *
+from vm import *
+from closure import *
+from transpiler import *
+from resolver import *
+from purity import *
+from cache import *
+from optimizer import *
+from tables import *
+from scanner import *
+from parallel import parse_parallel
+from incremental import parse_incremental
+import nodes as ast_nodes
+import optimizer as ast_optimizer
+import compiler as ast_compiler
+import resolver as ast_resolver
+import vm as ast_vm
+
+# Execution engines selectable per Interpreter
+TREE = 'tree' # Walks the parser AST directly (reference implementation)
+BYTECODE = 'bytecode' # Compiles function bodies to bytecode and runs them on vm.py
+CLOSURE = 'closure' # Converts every node into a pre-bound Python closure
+PYTHON = 'python' # Translates functions to Python source and runs them with exec
+ENGINES = [TREE, BYTECODE, CLOSURE, PYTHON]
+
+# Lexers selectable per Interpreter, both produce the same tokens
+PLY_LEXER = 'ply' # PLY master regex and the rules in lexer.py (reference implementation)
+SCANNER = 'scanner' # Hand-written single pass scanner in scanner.py
+LEXERS = [PLY_LEXER, SCANNER]
+
+# Default limit on nested C calls
+STACK_SIZE = 10_000
+# Default cap on the simulated memory in bytes, only the pages the program uses take memory
+MEMORY_SIZE = 1_000_000
+# Python recursion limit while running engines that recurse on the host stack
+HOST_RECURSION_LIMIT = 10_000
+# Errors of the C program rather than of the interpreter, reported without a traceback
+PROGRAM_ERRORS = (StackOverflow, SegmentationFault)
+
+# Bytes of parsed and compiled programs kept on disk, 0 disables the cache
+AST_CACHE_SIZE = 64 * 1024 * 1024
+AST_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ast")
+# Bump when the way cache entries are built changes so stale entries are not reused.
+# Changes to the grammar, nodes, the optimizer, the compiler, the slot resolver or the
+# virtual machine are covered by AST_HASH.
+AST_CACHE_VERSION = 4
+
+def ast_hash() -> str:
+    """ Hash of the grammar and of the modules the cached programs are built and run with """
+    digest = hashlib.sha256(f"{AST_CACHE_VERSION}\n{GRAMMAR_HASH}\n".encode())
+    for module in (ast_nodes, ast_optimizer, ast_compiler, ast_resolver, ast_vm):
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+AST_HASH = ast_hash()
 
 class Interpreter:
-    def __init__(self, fpath: str):
+    def __init__(self, fpath: str, engine: str = TREE, stack_size: int = STACK_SIZE, memoize: int = 0,
+                 ast_cache: int = AST_CACHE_SIZE, tokenizer: str = PLY_LEXER, stream: bool = False,
+                 workers: int = 0, incremental: bool = False, source: str = None,
+                 memory_size: int = MEMORY_SIZE):
+        # With source, fpath only names the program
         self.fpath = os.path.abspath(fpath)
-        with open(self.fpath, 'r') as f:
-            self.filedata = f.read()
+        if stream and tokenizer != SCANNER:
+            err = f"Streaming the source needs the {SCANNER} lexer"
+            raise Exception(err)
+        if stream and source is not None:
+            err = "Only a file can be streamed"
+            raise Exception(err)
+        if source is not None:
+            self.filedata = source
+            self.source_hash = hashlib.sha256(self.filedata.encode()).hexdigest()
+        elif stream:
+            # The scanner reads the file in chunks, so it is never held in memory whole
+            self.filedata = None
+            with open(self.fpath, 'rb') as f:
+                self.source_hash = hashlib.file_digest(f, 'sha256').hexdigest()
+        else:
+            with open(self.fpath, 'r') as f:
+                self.filedata = f.read()
+            self.source_hash = hashlib.sha256(self.filedata.encode()).hexdigest()
+        if engine not in ENGINES:
+            err = f"Unknown engine {engine}, expected one of {ENGINES}"
+            raise Exception(err)
+        self.engine = engine
+        if tokenizer not in LEXERS:
+            err = f"Unknown lexer {tokenizer}, expected one of {LEXERS}"
+            raise Exception(err)
+        self.tokenizer = tokenizer
+        # Processes parsing parts of the program at once, see parallel.py. 0 parses in this process.
+        self.workers = workers
+        if incremental and not ast_cache:
+            err = "Incremental parsing keeps the parsed statements in the AST cache, which is disabled"
+            raise Exception(err)
+        # Whether only the top-level statements missing from the AST cache are parsed, see incremental.py
+        self.incremental = incremental
+        self.stack_size = stack_size
+        # Size of the LRU cache for calls to pure functions, 0 disables memoization
+        self.memoize = memoize
         self.lexer = None
         self.parser = None
+        # Whether generate_ast ran the optimizer over state
+        self.optimized = False
+        # Parsed programs by hash of the source, see generate_ast
+        self.ast_cache = DiskCache(AST_CACHE_DIR, ast_cache) if ast_cache else None
+        self.cache_key = None
+        # Bytecode for the program, compiled on the first run with the bytecode engine
+        self.compiled: Program = None
         self.state = state # from parser.py
+        # Simulated memory of the program, reserved when it first allocates, see memory.py
+        self.memory = Memory(memory_size)
+        # Program with variables resolved to slots, and the frame holding global values
+        self.program: ResolvedProgram = None
+        self.global_frame: Frame = None
+        # Keeps track of order in which function calls were made, one Frame per call
+        self.call_stack = deque()
+
+        # Memoization of pure function calls (tree walker only)
+        self.pure_functions = set()
+        self.call_cache: LRUCache = None
+        # C library functions the program calls without defining them, see memory.py
+        self.builtins = set()
+        # Where the tree walker prints, sys.stdout when None. A TraceRecorder while
+        # memoized calls run, so threads running forks never record each other's output.
+        self.out: TraceRecorder = None
+        self.trace_depth = 0
 
     def tokenize(self, debug=False):
-        self.lexer: lex.Lexer = lex.lex(
-            debug=debug
-        )
-        self.lexer.input(self.filedata)
+        if self.tokenizer == SCANNER:
+            self.lexer: lex.Lexer | Scanner = Scanner()
+        else:
+            # Lexer and parser tables are generated once and cached, see tables.py
+            self.lexer = make_lexer(debug)
+        if self.filedata is None:
+            self.lexer.input_stream(self.fpath)
+        else:
+            self.lexer.input(self.filedata)
     
-    def generate_ast(self, debug=0):
-        self.parser = yacc.yacc(
-            debug=debug
-        )
-        self.parser.parse(self.filedata, self.lexer)
-        return
-
-        print(f"{len(state.global_variables)} Global Variables:")
-        print(json.dumps(state.global_variables, indent=4))
-        print(f"\n\n{len(state.functions)} Functions:")
-        print(json.dumps(state.functions, indent=4))
-
+    def generate_ast(self, debug=0, optimize=True, verbose=False):
+        self.optimized = optimize
+        self.state.verbose = verbose
+        if self.ast_cache is not None:
+            self.cache_key = hashlib.sha256(
+                f"{AST_HASH}\n{optimize}\n{self.source_hash}".encode()
+            ).hexdigest()
+            entry = self.ast_cache.get(self.cache_key)
+            if entry is not None:
+                # Saved already optimized and frozen
+                functions, global_variables, self.compiled = entry
+                self.state.functions.update(functions)
+                self.state.global_variables.update(global_variables)
+                if verbose:
+                    print("Loaded parsed program from cache")
+                return
 
-    def evaluate_ast(self, ast: dict | None, scope: dict | list[dict] = None) -> dict:
+        self.parser = make_parser(debug)
+        if self.incremental:
+            # Statements come back already optimized and frozen
+            removed = parse_incremental(self.lexer, self.ast_cache,
+                                        f"{AST_HASH}\n{optimize}", optimize)
+            # Writing the whole program as well would cost as much as parsing it
+            self.cache_key = None
+        elif self.workers:
+            parse_parallel(self.lexer, self.workers)
+        else:
+            # A streamed source was given to the lexer by tokenize
+            self.parser.parse(self.filedata, self.lexer)
+        if optimize:
+            if not self.incremental:
+                removed = optimize_program(self.state)
+            if verbose:
+                print(f"Optimizer removed {removed} nodes")
+        # Nothing writes to the program after this, so it can be run any number of times
+        for name, function in self.state.functions.items():
+            self.state.functions[name] = freeze(function)
+        for name, gv in self.state.global_variables.items():
+            self.state.global_variables[name] = freeze(gv)
+        self.save_to_cache()
+
+    def save_to_cache(self):
+        if self.cache_key is not None:
+            self.ast_cache.put(self.cache_key, (
+                dict(self.state.functions),
+                dict(self.state.global_variables),
+                self.compiled
+            ))
+
+    def evaluate_ast(self, ast: dict | None, frame: Frame = None):
+        """ Evaluates an expression without function calls to a raw Python value
+        (int, float, str or list). Expressions with calls go through evaluate().
+        """
         # TODO: Implement type checking
         if ast is None:
             return None
-        
-        # Load variables in scope
-        scope_list : list[dict] = []
-        if scope:
-            if type(scope) == dict:
-                scope_list.append(scope)
-            else:
-                for s in scope:
-                    scope_list.append(s)
-
-        if type(ast[VALUE]) == dict:
-            if ast[INSTRUCTION] == FUNCTION_CALL:
-                return self.evaluate_function_call(ast, scope_list)
-            elif ast[INSTRUCTION] == VAR_LOOKUP:
-                return self.evaluate_var_lookup(ast, scope_list)
-            elif ast[INSTRUCTION] in [
-                ADD, SUBTRACT, MULTIPLY, DIVIDE, '<', '>', '<=', '>=', '==', '!='
-            ]:
-                left = self.evaluate_ast(ast[VALUE][L], scope_list)
-                right = self.evaluate_ast(ast[VALUE][R], scope_list)
-
-                if ast[INSTRUCTION] == ADD:
-                    return {
-                        TYPE: type(left[VALUE] + right[VALUE]).__name__,
-                        VALUE: left[VALUE] + right[VALUE]}
-                elif ast[INSTRUCTION] == SUBTRACT:
-                    return {
-                        TYPE: type(left[VALUE] + right[VALUE]).__name__,
-                        VALUE: left[VALUE] - right[VALUE]}
-                elif ast[INSTRUCTION] == MULTIPLY:
-                    return {
-                        TYPE: type(left[VALUE] + right[VALUE]).__name__,
-                        VALUE: left[VALUE] * right[VALUE]}
-                elif ast[INSTRUCTION] == DIVIDE:
-                    if right[VALUE] == 0:
-                        raise ZeroDivisionError
-                    return {
-                        TYPE: type(left[VALUE] / right[VALUE]).__name__,
-                        VALUE: left[VALUE] / right[VALUE]}
-                elif ast[INSTRUCTION] == '<':
-                    return {
-                        TYPE: 'int',
-                        VALUE: 1 if left[VALUE] < right[VALUE] else 0}
-                elif ast[INSTRUCTION] == '>':
-                    return {
-                        TYPE: 'int',
-                        VALUE: 1 if left[VALUE] > right[VALUE] else 0}
-                elif ast[INSTRUCTION] == '<=':
-                    return {
-                        TYPE: 'int',
-                        VALUE: 1 if left[VALUE] <= right[VALUE] else 0}
-                elif ast[INSTRUCTION] == '>=':
-                    return {
-                        TYPE: 'int',
-                        VALUE: 1 if left[VALUE] >= right[VALUE] else 0}
-                elif ast[INSTRUCTION] == '==':
-                    return {
-                        TYPE: 'int',
-                        VALUE: 1 if left[VALUE] == right[VALUE] else 0}
-                elif ast[INSTRUCTION] == '!=':
-                    return {
-                        TYPE: 'int',
-                        VALUE: 1 if left[VALUE] != right[VALUE] else 0}
-            else:
-                err = f"{ast[INSTRUCTION]} not processed yet"
-                raise Exception(err)
-        else:
+
+        if INSTRUCTION not in ast:
             # Leaf node
-            if NEGATIVE not in ast:
-                ast[NEGATIVE] = False
-            elif ast[NEGATIVE]:
-                ast[VALUE] = -ast[VALUE]
-                ast[NEGATIVE] = False
-            return ast
-
-    def interpret(self):
-        print("\n\nStarting interpreter:\n")
+            return -ast[VALUE] if ast.get(NEGATIVE) else ast[VALUE]
 
-        # Initialize and evaluate global variables
-        for var_name, gv in self.state.global_variables.items():
-            # Evaluate AST
-            if gv[VALUE] is None:
-                # Variable declared but no value assigned
-                continue
-
-            arr_eval = []
-            if gv[POINTER]:
-                if gv[VALUE] is not None:
-                    for ast in gv[VALUE]:
-                        arr_eval.append(self.evaluate_ast(ast))
-            elif type(gv[VALUE]) == list:
-                for ast in gv[VALUE]:
-                    arr_eval.append(self.evaluate_ast(ast))
-            elif type(gv[VALUE]) == dict:
-                arr_eval.append(self.evaluate_ast(gv[VALUE]))
+        instruction = ast[INSTRUCTION]
+        if instruction == VAR_LOOKUP:
+            value = self.evaluate_var_lookup(ast, frame)
+        elif instruction in [
+            ADD, SUBTRACT, MULTIPLY, DIVIDE, '<', '>', '<=', '>=', '==', '!='
+        ]:
+            left = self.evaluate_ast(ast[VALUE][L], frame)
+            right = self.evaluate_ast(ast[VALUE][R], frame)
+
+            if instruction == ADD:
+                value = left + right
+            elif instruction == SUBTRACT:
+                value = left - right
+            elif instruction == MULTIPLY:
+                value = left * right
+            elif instruction == DIVIDE:
+                if right == 0:
+                    raise ZeroDivisionError
+                value = left / right
+            elif instruction == '<':
+                value = 1 if left < right else 0
+            elif instruction == '>':
+                value = 1 if left > right else 0
+            elif instruction == '<=':
+                value = 1 if left <= right else 0
+            elif instruction == '>=':
+                value = 1 if left >= right else 0
+            elif instruction == '==':
+                value = 1 if left == right else 0
             else:
-                raise Exception("Something is wrong")
+                value = 1 if left != right else 0
+        else:
+            err = f"{instruction} not processed yet"
+            raise Exception(err)
+
+        if ast.get(NEGATIVE):
+            return -value
+        return value
+
+    def interpret(self, arguments: list = ()):
+        """ Runs the program, passing arguments to the parameters of main() """
+        print("\n\nStarting interpreter:\n")
+        self.call_stack = deque()
+        # Every run starts from empty memory, so runs of a program give the same results
+        self.memory.clear()
+
+        if self.engine == BYTECODE:
+            if self.compiled is None:
+                self.compiled = compile_program(self.state)
+                # Stores the bytecode with the parsed program
+                self.save_to_cache()
+            vm = VirtualMachine(self.compiled, self.call_stack, self.stack_size, self.memory)
+            return self.interpret_compiled(vm, arguments)
+        elif self.engine == CLOSURE:
+            return self.interpret_compiled(compile_closures(self.state, self.memory, self.stack_size), arguments)
+        elif self.engine == PYTHON:
+            options = "optimized" if self.optimized else ""
+            return self.interpret_compiled(transpile(self.state, self.memory, self.stack_size, self.source_hash, options), arguments)
+
+        # Variables are resolved to frame slots once, so lookups never search by name
+        if self.program is None:
+            self.program = resolve_program(self.state)
+            self.pure_functions = find_pure_functions(self.program)
+            self.builtins = {name for name in BUILTINS if is_builtin(self.state, name)}
+        self.call_cache = LRUCache(self.memoize) if self.memoize else None
+
+        # Initialize and evaluate global variables. Runtime values live in
+        # global_frame so the parsed program is never written to.
+        self.global_frame = Frame("<globals>", [None] * self.program.nglobals)
+        self.global_frame.resume = self.run_block(self.program.global_variables, self.global_frame)
+        self.run(self.global_frame)
 
         if "main" not in state.functions:
             print("Main function does not exist.")
@@ -145,205 +284,360 @@ class Interpreter:
         
         # Start interpretation from main()
         print("Starting main:\n")
-        main_variables = {}
-        for statement in self.state.functions['main']['body']:
-            self.handle_statement(statement, main_variables)
+        return self.run(self.new_frame("main", self.main_arguments(arguments)))
+
+    def main_arguments(self, arguments: list) -> list:
+        """ Values of the parameters of main(), arguments followed by None for the rest """
+        nparams = len(named_parameters(self.state.functions["main"][PARAMETERS]))
+        if len(arguments) > nparams:
+            err = f"main() takes {nparams} parameters but {len(arguments)} arguments were given"
+            raise Exception(err)
+        for argument in arguments:
+            if type(argument) not in (int, float):
+                err = f"Argument {argument!r} to main() is not an int or a float"
+                raise Exception(err)
+        return list(arguments) + [None] * (nparams - len(arguments))
+
+    def fork(self) -> "Interpreter":
+        """ Returns an interpreter sharing this one's frozen program, to run it
+        again alongside this one (for example from another thread)
+        """
+        interpreter = copy.copy(self)
+        # Its own memory, so the two programs never see each other's allocations
+        interpreter.memory = Memory(self.memory.size)
+        interpreter.global_frame = None
+        interpreter.call_stack = deque()
+        interpreter.call_cache = None
+        interpreter.out = None
+        interpreter.trace_depth = 0
+        return interpreter
+
+    def interpret_compiled(self, program: VirtualMachine | ClosureProgram | PythonProgram, arguments: list):
+        program.initialize_globals()
+
+        if "main" not in self.state.functions:
+            print("Main function does not exist.")
+            return
+
+        print("Starting main:\n")
+        args = self.main_arguments(arguments)
+        # Closures and generated Python run C calls on the Python stack
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, HOST_RECURSION_LIMIT))
+        try:
+            return program.run_main(args)
+        except RecursionError:
+            err = "Stack overflow: C calls nested deeper than the Python recursion limit"
+            raise StackOverflow(err)
+        finally:
+            sys.setrecursionlimit(limit)
+
+    # Calls run on the explicit frame stack in self.call_stack. Code that contains a
+    # call is a generator that yields (function name, arguments) and is resumed with
+    # the return value, so C recursion never recurses in Python.
+
+    def new_frame(self, f_name: str, args: list) -> Frame:
+        if f_name not in self.program.functions:
+            err = f"{f_name} called but never defined."
+            raise Exception(err)
+        if len(self.call_stack) >= self.stack_size:
+            err = f"Stack overflow: more than {self.stack_size} nested calls when calling {f_name}()"
+            raise StackOverflow(err)
+        function = self.program.functions[f_name]
+
+        # Parameters take the first slots of the frame
+        frame = Frame(f_name, [None] * function[NSLOTS])
+        frame.slots[:len(args)] = args
+        frame.resume = self.run_block(function[BODY], frame)
+        return frame
+
+    def run(self, frame: Frame):
+        """ Runs frame and every call it makes to completion, returns its return value """
+        stack = self.call_stack
+        base = len(stack)
+        stack.append(frame)
+        r_val = None
+        try:
+            while len(stack) > base:
+                try:
+                    f_name, args = stack[-1].resume.send(r_val)
+                except StopIteration as r:
+                    done = stack.pop()
+                    r_val = r.value
+                    if done.memo is not None:
+                        self.finish_memoized_call(done, r_val)
+                    continue
+                r_val = None
+
+                if f_name in self.builtins:
+                    r_val = call_builtin(self.memory, f_name, args)
+                    continue
+                if self.call_cache is not None and f_name in self.pure_functions \
+                        and not any(type(arg) in ARRAY_TYPES for arg in args):
+                    # Types are part of the key so 1 and 1.0 stay distinct
+                    key = (f_name, *args, *map(type, args))
+                    cached = self.call_cache.get(key)
+                    if cached is not None:
+                        # Replay the trace the call printed the first time
+                        r_val, trace = cached
+                        print(trace, end="", file=self.out)
+                        continue
+                    callee = self.new_frame(f_name, args)
+                    callee.memo = (key, self.start_trace())
+                    stack.append(callee)
+                else:
+                    stack.append(self.new_frame(f_name, args))
+        finally:
+            if self.out is not None:
+                # Stopped by an error inside a memoized call
+                self.stop_trace()
+        return r_val
+
+    def start_trace(self) -> int:
+        """ Starts recording output for a memoized call, returns where its trace starts """
+        if self.out is None:
+            self.out = TraceRecorder(sys.stdout)
+        self.trace_depth += 1
+        return self.out.position()
+
+    def stop_trace(self):
+        self.out.close()
+        self.out = None
+        self.trace_depth = 0
+
+    def finish_memoized_call(self, frame: Frame, r_val):
+        key, start = frame.memo
+        if type(r_val) != list:
+            # Lists are mutable and would be shared between callers
+            self.call_cache.put(key, (r_val, self.out.text(start)))
+        self.trace_depth -= 1
+        if self.trace_depth == 0:
+            self.stop_trace()
+
+    def run_block(self, statements: list[dict], frame: Frame):
+        # Evaluate statements in function. Statements return None unless a
+        # return statement ran, "return" meaning a return without a value and
+        # "tail_call" that the frame was reset to run the function again.
+        while True:
+            for s in statements:
+                if s[CALLS]:
+                    r_val = yield from self.execute(s, frame)
+                else:
+                    r_val = self.handle_statement(s, frame)
+                if r_val is not None:
+                    break
+            else:
+                r_val = None
+            if r_val != "tail_call":
+                break
+
+        if r_val == "return":
+            r_val = None
+        if frame.tail_calls:
+            r_val = finish_tail_calls(frame, r_val, self.out)
+        return r_val
+
+    def tail_call(self, ast: dict, frame: Frame, traced: bool):
+        """ Self call in tail position, resets the parameters instead of pushing a frame """
+        args = []
+        for arg in ast[VALUE][ARGUMENTS]:
+            args.append((yield from self.evaluate(arg, frame)))
+        # Print function call to output
+        print(f"{ast[VALUE][NAME]}(" + ", ".join(format_value(v) for v in args) + ")", file=self.out)
+        frame.slots[:len(args)] = args
+        push_tail_call(frame, traced)
+        return "tail_call"
+
+    def execute(self, statement: dict, frame: Frame):
+        """ handle_statement for statements that contain calls """
+        if not statement[CALLS]:
+            return self.handle_statement(statement, frame)
 
-    def handle_statement(self, statement: dict, scope: dict | list[dict]):
         if statement[INSTRUCTION] == VARIABLE_DECLARATION:
-            self.evaluate_variable_declaration(statement, scope)
+            if is_array_declaration(statement):
+                v = []
+                for ast in statement[VALUE]:
+                    v.append((yield from self.evaluate(ast, frame)))
+                size = (yield from self.evaluate(statement[SIZE], frame)) if statement[SIZE] else 0
+                v = new_array(statement[TYPE], v, size)
+            else:
+                v = yield from self.evaluate(statement[VALUE], frame)
+            slots = self.global_frame.slots if statement[GLOBAL] else frame.slots
+            slots[statement[SLOT]] = v
         elif statement[INSTRUCTION] == VARIABLE_ASSIGNMENT:
-            self.evaluate_variable_assignment(statement, scope)
+            v = yield from self.evaluate(statement[VALUE], frame)
+            slots = self.global_frame.slots if statement[GLOBAL] else frame.slots
+            if statement[POINTER]:
+                # When assigning arrays, treat SIZE as index
+                index = yield from self.evaluate(statement[SIZE], frame)
+                try:
+                    slots[statement[SLOT]][index] = v
+                except TypeError:
+                    store_element(slots[statement[SLOT]], index, v)
+            else:
+                slots[statement[SLOT]] = v
         elif statement[INSTRUCTION] == FOR_LOOP:
-            # Initialize local variables
-            local_fl_vars = {}
-            local_fl_vars.update(scope)
             for var in statement[INIT]:
-                # If variable is declared inside for loop, the scope is only to that for loop
-                if var[INSTRUCTION] == VARIABLE_DECLARATION:
-                    self.evaluate_variable_declaration(var, local_fl_vars)
-                elif var[INSTRUCTION] == VARIABLE_ASSIGNMENT:
-                    self.evaluate_variable_assignment(var, [scope, local_fl_vars])
+                yield from self.execute(var, frame)
+            while (yield from self.evaluate(statement[COND], frame)):
+                for f_statement in statement[BODY]:
+                    if (r := (yield from self.execute(f_statement, frame))) is not None:
+                        return r
+                for f_update_statement in statement[UPDATE]:
+                    yield from self.execute(f_update_statement, frame)
+        elif statement[INSTRUCTION] == IF:
+            if (yield from self.evaluate(statement[COND], frame)):
+                for b_statement in statement[BODY]:
+                    if (r := (yield from self.execute(b_statement, frame))) is not None:
+                        return r
+        elif statement[INSTRUCTION] == PRINT:
+            values = []
+            for arg in statement[ARGUMENTS]:
+                values.append((yield from self.evaluate(arg, frame)))
+            print(print_prefix(statement) + "".join(", " + format_value(v) for v in values) + ")", file=self.out)
+        elif statement[INSTRUCTION] == RETURN:
+            if statement[TAIL]:
+                return (yield from self.tail_call(statement[VALUE], frame, True))
+            r_val = yield from self.evaluate(statement[VALUE], frame)
+            if r_val is not None:
+                print(f"return({format_value(r_val)})", file=self.out)
+                return r_val
+            print("return(None)", file=self.out)
+            return "return"
+        elif statement.get(TAIL):
+            return (yield from self.tail_call(statement, frame, False))
+        else:
+            # Expression statement, result is discarded
+            yield from self.evaluate(statement, frame)
+
+    def evaluate(self, ast: dict | None, frame: Frame):
+        """ evaluate_ast for expressions that contain calls """
+        if ast is None or not ast.get(CALLS):
+            return self.evaluate_ast(ast, frame)
+
+        instruction = ast[INSTRUCTION]
+        if instruction == FUNCTION_CALL:
+            args = []
+            for arg in ast[VALUE][ARGUMENTS]:
+                args.append((yield from self.evaluate(arg, frame)))
+            # Print function call to output
+            print(f"{ast[VALUE][NAME]}(" + ", ".join(format_value(v) for v in args) + ")", file=self.out)
+            value = yield ast[VALUE][NAME], args
+        elif instruction == VAR_LOOKUP:
+            index = yield from self.evaluate(ast[VALUE][INDEX], frame)
+            slots = self.global_frame.slots if ast[GLOBAL] else frame.slots
+            value = slots[ast[SLOT]][index]
+        else:
+            left = yield from self.evaluate(ast[VALUE][L], frame)
+            right = yield from self.evaluate(ast[VALUE][R], frame)
+            value = binary_operators[instruction](left, right)
+            if instruction in comparisons:
+                value = 1 if value else 0
+
+        if ast.get(NEGATIVE):
+            return -value
+        return value
+
+    def handle_statement(self, statement: dict, frame: Frame):
+        if statement[INSTRUCTION] == VARIABLE_DECLARATION:
+            self.evaluate_variable_declaration(statement, frame)
+        elif statement[INSTRUCTION] == VARIABLE_ASSIGNMENT:
+            self.evaluate_variable_assignment(statement, frame)
+        elif statement[INSTRUCTION] == FOR_LOOP:
+            # Variables declared in the init block have their own slots,
+            # so the loop shares the function's frame
+            for var in statement[INIT]:
+                self.handle_statement(var, frame)
 
             # Evaluate condition statement
-            while self.evaluate_ast(statement[COND], [scope, local_fl_vars])[VALUE]:
+            while self.evaluate_ast(statement[COND], frame):
                 # Evaluate for loop body until condition is met
                 for f_statement in statement[BODY]:
-                    self.handle_statement(f_statement, [scope, local_fl_vars])
+                    if (r := self.handle_statement(f_statement, frame)) is not None:
+                        return r
 
                 # Evaluate update block at end of for loop
                 for f_update_statement in statement[UPDATE]:
-                    self.handle_statement(f_update_statement, [scope, local_fl_vars])
+                    self.handle_statement(f_update_statement, frame)
       
         elif statement[INSTRUCTION] == IF:
-            cond = self.evaluate_ast(statement[COND], scope)
-            if cond[VALUE]:
+            cond = self.evaluate_ast(statement[COND], frame)
+            if cond:
                 # Run body statements if conditions are met
                 for b_statement in statement[BODY]:
-                    if r := self.handle_statement(b_statement, scope):
+                    if (r := self.handle_statement(b_statement, frame)) is not None:
                         return r
         elif statement[INSTRUCTION] == PRINT:
-            self.evaluate_print(statement, scope)
+            self.evaluate_print(statement, frame)
         elif statement[INSTRUCTION] in [
             ADD, SUBTRACT, MULTIPLY, DIVIDE, '<', '>', '<=', '>=', '==', '!='
         ]:  
-            statement = self.evaluate_ast(statement, scope)
-        elif statement[INSTRUCTION] == FUNCTION_CALL:
-            return self.evaluate_function_call(statement, scope)
+            statement = self.evaluate_ast(statement, frame)
         elif statement[INSTRUCTION] == RETURN:
-            r_val = self.evaluate_ast(statement[VALUE], scope)
-            if r_val:
-                print(f"return({r_val[VALUE]})")
+            r_val = self.evaluate_ast(statement[VALUE], frame)
+            if r_val is not None:
+                print(f"return({format_value(r_val)})", file=self.out)
                 return r_val
             else:
-                print("return(None)")
+                print("return(None)", file=self.out)
                 return "return"
         else:
             err = f"\t{statement[INSTRUCTION]} not ready"
             raise Exception(err)
     
-    def evaluate_var_lookup(self, statement: dict, scope : dict | list[dict] = None):
-        if type(scope) == dict:
-            scope_list = [scope]
-        else:
-            scope_list = scope
-
-        for s in scope_list:
-            if statement[VALUE][NAME] in s:
-                if statement[VALUE][INDEX] is not None:
-                    return s[statement[VALUE][NAME]][VALUE][self.evaluate_ast(statement[VALUE][INDEX], scope)[VALUE]]
-                return s[statement[VALUE][NAME]][VALUE]
-        if statement[VALUE][NAME] in self.state.global_variables:
-            if statement[VALUE][INDEX] is not None:
-                return self.state.global_variables[statement[VALUE][NAME]][VALUE][self.evaluate_ast(statement[VALUE][INDEX], scope)[VALUE]]
-            return self.state.global_variables[statement[VALUE][NAME]][VALUE]
-        else:
-            err = f"{statement[VALUE][NAME]} assigned before declaration."
-            raise Exception(err)
-
-    def evaluate_variable_declaration(self, statement: dict, scope: dict = None):
-
-        if statement[POINTER]:
-            size = self.evaluate_ast(statement[SIZE], scope)
-            if statement[SIZE]:
-                # Processes shortcuts: int a[5] = {0};
-                if size[VALUE] > len(statement[VALUE]):
-                    # Initializes an array of 0s
-                    v = [{
-                        TYPE: 'int',
-                        VALUE: 0,
-                        NEGATIVE: False
-                    } for i in range(size[VALUE])]
-                    for i in range(len(statement[VALUE])):
-                        v[i] = self.evaluate_ast(statement[VALUE][i], scope)
-                else:
-                    v = [self.evaluate_ast(ast, scope) for ast in statement[VALUE]]
-            scope[statement[NAME]] = {
-                TYPE: statement[TYPE],
-                POINTER: True,
-                SIZE: size if size else {
-                    TYPE: 'int',
-                    VALUE: len(v),
-                    NEGATIVE: False
-                },
-                VALUE: v
-            }
-        else:
-            # Non pointer variable declarations
-            scope[statement[NAME]] = {
-                TYPE: statement[TYPE],
-                POINTER: False,
-                VALUE: self.evaluate_ast(statement[VALUE], scope)
-            }
-
-    def evaluate_variable_assignment(self, statement: dict, scope : dict | list[dict] = None):
-        if type(scope) == dict:
-            scope_list = [scope]
+    def evaluate_var_lookup(self, statement: dict, frame: Frame):
+        slots = self.global_frame.slots if statement[GLOBAL] else frame.slots
+        if statement[VALUE][INDEX] is not None:
+            return slots[statement[SLOT]][self.evaluate_ast(statement[VALUE][INDEX], frame)]
+        return slots[statement[SLOT]]
+
+    def evaluate_variable_declaration(self, statement: dict, frame: Frame | None):
+        if is_array_declaration(statement):
+            v = [self.evaluate_ast(ast, frame) for ast in statement[VALUE]]
+            size = self.evaluate_ast(statement[SIZE], frame) if statement[SIZE] else 0
+            v = new_array(statement[TYPE], v, size)
         else:
-            scope_list = scope
+            v = self.evaluate_ast(statement[VALUE], frame)
 
-        v = self.evaluate_ast(statement[VALUE], scope)
+        slots = self.global_frame.slots if statement[GLOBAL] else frame.slots
+        slots[statement[SLOT]] = v
 
-        for s in scope_list:
-            if statement[NAME] in s:
-                if s[statement[NAME]][POINTER]:
-                    # When assigning arrays, treat SIZE as index
-                    # Evaluate index
-                    index = self.evaluate_ast(statement[SIZE], scope)
+    def evaluate_variable_assignment(self, statement: dict, frame: Frame):
+        if statement[VALUE] is None:
+            # Bare name in a variable list, nothing to evaluate
+            return
+        v = self.evaluate_ast(statement[VALUE], frame)
 
-                    # Assign value at array index
-                    s[statement[NAME]][VALUE][index[VALUE]] = v
-                else:
-                    s[statement[NAME]][VALUE] = v
-                break
+        slots = self.global_frame.slots if statement[GLOBAL] else frame.slots
+        if statement[POINTER]:
+            # When assigning arrays, treat SIZE as index
+            index = self.evaluate_ast(statement[SIZE], frame)
+            try:
+                slots[statement[SLOT]][index] = v
+            except TypeError:
+                store_element(slots[statement[SLOT]], index, v)
         else:
-            if statement[NAME] in self.state.global_variables:
-                self.state.global_variables[statement[NAME]][VALUE] = v
-            else:
-                err = f"{statement[NAME]} assigned before declaration."
-                raise Exception(err)
-    
-    def evaluate_function_call(self, statement: dict, scope: dict | list[dict]) -> dict:
-        f_name = statement[VALUE][NAME]
-        # Print function call to output
-        print(f"{f_name}(", end="")
-        # Initialize local variables from arguments
-        var_list = []
-        for i, arg in enumerate(statement[VALUE][ARGUMENTS]):
-            evaluated = self.evaluate_ast(arg, scope)
-            var_list.append(evaluated)
-            if type(evaluated) == dict:
-                print(f"{evaluated[VALUE]}", end="")
-                if i < len(statement[VALUE][ARGUMENTS]) - 1:
-                    print(", ", end="")
-            else:
-                print("[", end="")
-                for j, e in enumerate(evaluated):
-                    print(f"{e[VALUE]}", end="")
-                    if j < len(evaluated) - 1:
-                        print(", ", end="")
-                print("]", end="")
-                if i < len(statement[VALUE][ARGUMENTS]) - 1:
-                    print(", ", end="")
-        print(")")
-
-        function_scope = {param[NAME]: {
-            TYPE: param[TYPE],
-            POINTER: param[POINTER],
-            VALUE: var_list[index]
-        } for index, param in enumerate(self.state.functions[f_name][PARAMETERS])}
-
-        # Evaluate statements in function
-        for s in self.state.functions[statement[VALUE][NAME]]['body']:
-            r_val = self.handle_statement(s, function_scope)
-            if r_val == "return":
-                return
-            if s[INSTRUCTION] == RETURN:
-                return r_val
-        
+            slots[statement[SLOT]] = v
 
-    def evaluate_print(self, statement: dict, scope: dict | list[dict]):
-        print(f"print(\"", end="")
+    def evaluate_print(self, statement: dict, frame: Frame):
+        print("print(\"", end="", file=self.out)
         for string in statement[VALUE]:
             if type(string) == str:
-                print(string, end="")
+                print(string, end="", file=self.out)
             else:
-                print(string[TYPE], end="")
+                print(string[TYPE], end="", file=self.out)
         
         if statement[ARGUMENTS]:
-            print("\", ", end="")
+            print("\", ", end="", file=self.out)
             for index, arg in enumerate(statement[ARGUMENTS]):
-                val = self.evaluate_ast(arg, scope)
-            
-                # Search variable from arg
-                print(f"{val[VALUE]}", end="")
+                val = self.evaluate_ast(arg, frame)
+                print(format_value(val), end="", file=self.out)
 
                 if index < len(statement[ARGUMENTS]) - 1:
-                    print(", ", end="")
+                    print(", ", end="", file=self.out)
         else:
-            print("\"", end="")
-        print(")")
-
+            print("\"", end="", file=self.out)
+        print(")", file=self.out)
                 
 
     def generate_asm(self):
@@ -356,40 +650,47 @@ class Interpreter:
                 break
             print(f"{token.type} {token.value} {token.lineno}")
 
-    def print_memory(self, file: str = None):
-        """Prints state of internal memory when called"""
-        if not file:
-            for index, byte in enumerate(self.state.memory):
-                if (index % 8 == 0) and (index):
-                    print("\t", end="")
-                if (index % 16 == 0) and (index):
-                    print("")
-                print(byte, end=" ")
+    def print_memory(self, file: str = None, start: int = 0, end: int = None, hex_: bool = False,
+                     nonzero: bool = False, binary: bool = False):
+        """Prints state of internal memory when called
+        Args:
+            file (str): Written instead of stdout
+            start, end (int): Range of addresses to print, the whole memory by default
+            hex_ (bool): Bytes in hex rather than decimal
+            nonzero (bool): Leaves out pages that are all zeros
+            binary (bool): Writes the raw bytes to file
+        """
+        memory = self.memory
+        if binary:
+            if not file:
+                err = "A binary memory snapshot needs a file"
+                raise Exception(err)
+            with open(file, 'wb') as f:
+                memory.snapshot(f, start, end)
+        elif not file:
+            memory.dump(sys.stdout, start, end, hex_, nonzero)
         else:
             with open(file, 'w') as f:
-                for index, byte in enumerate(self.state.memory):
-                    if (index % 8 == 0) and (index):
-                        f.write("\t")
-                    if (index % 16 == 0) and (index):
-                        f.write("\n")
-                    f.write(f"{byte} ")
-
-
+                memory.dump(f, start, end, hex_, nonzero)
 
-def main(fpath: str) -> None:
-    print(sys.getrecursionlimit())
-    sys.setrecursionlimit(10000)
 
-    interpreter = Interpreter(fpath)
+def main(fpath: str, engine: str = TREE, stack_size: int = STACK_SIZE, memoize: int = 0,
+         verbose: bool = False) -> None:
+    interpreter = Interpreter(fpath, engine, stack_size, memoize)
     interpreter.tokenize()
     # interpreter.print_tokens()
-    interpreter.print_memory(file="mem.txt")
-    interpreter.generate_ast(debug=True)
-    interpreter.interpret()
+    interpreter.generate_ast(verbose=verbose)
+    try:
+        interpreter.interpret()
+    except PROGRAM_ERRORS as e:
+        print(e)
+        sys.exit(1)
 
 if __name__ == "__main__":
     argc = len(sys.argv)
-    if (argc == 2):
+    if (argc == 3):
+        main(fpath=sys.argv[1], engine=sys.argv[2])
+    elif (argc == 2):
         main(fpath=sys.argv[1])
     else:
         main(fpath=f"{os.path.dirname(__file__)}/examples/fibonacci.c")
@@ -1,5 +1,7 @@
 import decimal
 
+from state import ParseError
+
 # TODO: Add support for tokenizing double and single quote string literals
 # TODO: Clean up ordering and organize by category
 
@@ -8,10 +10,14 @@ import decimal
 # TODO: Figure out how to treat char array (string literals)
 
 
-## State variables
-read_string = 0
-read_comment = 0
-prev_token = None
+## State variables, kept on each lexer so lexers can be used side by side
+def init_state(lexer):
+    """ Sets up the state the rules keep on lexer, before it reads any input.
+    Clones of lexer get their own copy of it.
+    """
+    lexer.read_string = 0
+    lexer.read_comment = 0
+    lexer.prev_token = None
 
 ignore = [
     'SPACE',
@@ -154,11 +160,10 @@ tokens = list(reserved.values()) \
 
 def _typecheck(t):
     # Must call this function when processing token
-    global prev_token
     if t.type in ignore:
         return None
     else:
-        prev_token = t.type
+        t.lexer.prev_token = t.type
         return t
     
 def t_SINGLE_LINE_COMMENT(t):
@@ -167,38 +172,37 @@ def t_SINGLE_LINE_COMMENT(t):
 
 def t_COMMENT_START(t):
     r'\/\*'
-    global read_comment
 
-    if not read_comment:
-        read_comment = 1
+    if not t.lexer.read_comment:
+        t.lexer.read_comment = 1
     return _typecheck(t)
 
 def t_COMMENT_END(t):
     r'\*\/'
-    global read_comment
 
-    if read_comment:
-        read_comment = 0
+    if t.lexer.read_comment:
+        t.lexer.read_comment = 0
     return _typecheck(t)
 
 def t_SEMICOLON(t):
     r';'
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
     return _typecheck(t)
 
 def t_FORMAT(t):
     r'\%[0 #+-]?[0-9*]*\.?\d*[hl]{0,2}[jztL]?[diuoxXeEfgGaAcpsSn%]'
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
     elif t.value in string_formatter:
         t.type = string_formatter[t.value]
     else:
-        print(f"String formatter {t.value} not supported.")
-        exit(1)
+        err = f"String formatter {t.value} not supported."
+        print(err)
+        raise ParseError(err)
     return _typecheck(t)
 
 def t_comparison_operators(t):
@@ -206,12 +210,13 @@ def t_comparison_operators(t):
     # ==, <, >, <=, >=, !=
 
     if t.value not in comparison_operators:
-        print(f"{t.value} operator not in comparison_operators but matched regex.")
-        exit(1)
+        err = f"{t.value} operator not in comparison_operators but matched regex."
+        print(err)
+        raise ParseError(err)
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
     else:
         t.type = comparison_operators[t.value]
@@ -223,12 +228,13 @@ def t_logical_operators(t):
     # &&, ||, !
 
     if t.value not in logical_operators:
-        print(f"{t.value} operator not in logical_operators but matched regex.")
-        exit(1)
+        err = f"{t.value} operator not in logical_operators but matched regex."
+        print(err)
+        raise ParseError(err)
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
     else:
         t.type = logical_operators[t.value]
@@ -239,21 +245,22 @@ def t_arithmetic_operators(t):
     # +, -, ++, --, *, /
 
     if t.value not in arithmetic_operators:
-        print(f"{t.value} operator not in arithmetic_operators but matched regex.")
-        exit(1)
+        err = f"{t.value} operator not in arithmetic_operators but matched regex."
+        print(err)
+        raise ParseError(err)
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
     elif t.value == '-':
-        if (prev_token in operators.values()) \
-            or (prev_token in left_brackets.values()):
+        if (t.lexer.prev_token in operators.values()) \
+            or (t.lexer.prev_token in left_brackets.values()):
             t.type = 'NEGATIVE'
         else:
             t.type = 'MINUS'
     elif t.value == '*':
-        if prev_token in return_types.values():
+        if t.lexer.prev_token in return_types.values():
             t.type = 'POINTER'
         else:
             t.type = 'MULTIPLY'
@@ -266,15 +273,16 @@ def t_bitwise_operators(t):
     # <<, >>, &, |, ^, ~
 
     if t.value not in bitwise_operators:
-        print(f"{t.value} operator not in bitwise_operators but matched regex.")
-        exit(1)
+        err = f"{t.value} operator not in bitwise_operators but matched regex."
+        print(err)
+        raise ParseError(err)
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
     elif t.value == '&':
-        if prev_token in types:
+        if t.lexer.prev_token in types:
             t.type = 'ADDRESS'
         else:
             t.type = 'BITWISE_AND'
@@ -287,12 +295,13 @@ def t_assignment_operators(t):
     # =, +=, -=, *=, /=, %=, <<=, >>=
 
     if t.value not in assignment_operators:
-        print(f"{t.value} operator not in assignment_operators but matched regex.")
-        exit(1)
+        err = f"{t.value} operator not in assignment_operators but matched regex."
+        print(err)
+        raise ParseError(err)
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
     else:
         t.type = assignment_operators[t.value]
@@ -302,9 +311,9 @@ def t_assignment_operators(t):
 def t_COMMA(t):
     r','
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
     return _typecheck(t)
 
@@ -312,12 +321,13 @@ def t_brackets(t):
     r'(\(|\)|\[|\]|\{|\})'
 
     if t.value not in brackets:
-        print(f"{t.value} invalid match in t_brackets")
-        exit(1)
+        err = f"{t.value} invalid match in t_brackets"
+        print(err)
+        raise ParseError(err)
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
     else:
         t.type = brackets[t.value]
@@ -326,18 +336,18 @@ def t_brackets(t):
 def t_NEWLINE_LITERAL(t):
     r'\\n'
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
     return _typecheck(t)
 
 def t_SPACE(t):
     r'[ ]+'
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
     else:
         t.type = 'SPACE'
@@ -350,14 +360,15 @@ def t_INCLUDE(t):
 def t_ID(t):
     r'[a-zA-Z_][a-zA-Z_0-9]*'
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
-    elif prev_token == 'SINGLE_QUOTE':
+    elif t.lexer.prev_token == 'SINGLE_QUOTE':
         if len(t.value) != 1:
-            print(f"ERROR: {t.value} following single quote")
-            exit(1)
+            err = f"ERROR: {t.value} following single quote"
+            print(err)
+            raise ParseError(err)
         t.type = 'CHAR'
     elif t.value in return_types:
         t.type = return_types[t.value]
@@ -371,11 +382,11 @@ def t_NUMBER(t):
     r'(([\+\-]*\d*\.*\d+[eE])?([\+\-]*\d*\.*\d+))'
     # r'\d+'
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
-    elif prev_token == 'SINGLE_QUOTE':
+    elif t.lexer.prev_token == 'SINGLE_QUOTE':
         t.type = 'CHAR'
     else:
         if '.' in t.value:
@@ -388,35 +399,35 @@ def t_NUMBER(t):
 
 def t_STAR(t):
     r'\*'
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
+    elif t.lexer.read_string:
         t.type = 'STRING'
-    elif prev_token == 'ID':
+    elif t.lexer.prev_token == 'ID':
         t.type = 'MULTIPLY'
-    elif prev_token == 'TYPE':
+    elif t.lexer.prev_token == 'TYPE':
         t.type = 'POINTER'
     else:
-        print("Invalid use of *")
-        exit(1)
+        err = "Invalid use of *"
+        print(err)
+        raise ParseError(err)
     return _typecheck(t)
 
 def t_DOUBLE_QUOTE(t):
     r'\"'
-    global read_comment, read_string
     
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
-    elif read_string:
-        read_string = 0
+    elif t.lexer.read_string:
+        t.lexer.read_string = 0
     else:
-        read_string = 1
+        t.lexer.read_string = 1
     return _typecheck(t)
 
 def t_SINGLE_QUOTE(t):
     r'\''
 
-    if read_comment:
+    if t.lexer.read_comment:
         t.type = 'COMMENT'
     return _typecheck(t)
     
@@ -433,5 +444,6 @@ def t_eof(t):
     return None
 
 def t_error(t):
-    print(f"Illegal character '{t.value[0]} at line {t.lexer.lineno}'")
-    exit(1)
+    err = f"Illegal character '{t.value[0]} at line {t.lexer.lineno}'"
+    print(err)
+    raise ParseError(err)
@@ -0,0 +1,298 @@
+# Module for the simulated memory of the C program
+# Memory is one arena. Addresses are byte offsets into it, and values are read and written
+# through memoryview casts of the arena in the size of their C type, so an int takes 4 bytes
+# at an address aligned to 4. The arena is an anonymous mmap reserved on the first
+# allocation, and the system only backs the pages the program touches with memory.
+# The heap, handed out by malloc() and friends, grows down from the end of the arena. Freed
+# blocks go on a free list per size class and are reused by the next allocation of that class.
+# Variables and arrays of the program are not placed in the arena. They stay in the slots of
+# their frame and in Python lists and arrays, because an int in 4 bytes or a float in 4 bytes
+# would wrap and round values the interpreters print today. The arena holds only what malloc()
+# and friends return.
+
+import os
+import mmap
+import itertools
+
+# C type: (size in bytes, memoryview format)
+c_types = {
+    'char': (1, 'b'),
+    'int': (4, 'i'),
+    'float': (4, 'f'),
+}
+# Largest size in c_types, the arena is a multiple of it
+MAX_ALIGN = max(size for size, _ in c_types.values())
+# Alignment and smallest size of heap blocks, as 64 bit C libraries hand them out
+HEAP_ALIGN = 8
+# Blocks up to this size are rounded to HEAP_ALIGN, larger ones to a power of 2
+SMALL_BLOCK = 512
+# Address malloc() returns when it fails, never handed out by the heap
+NULL = 0
+
+class SegmentationFault(Exception):
+    """ A load or store outside the allocated memory, or not aligned to its type,
+    or a free() of a block that is not allocated
+    """
+    pass
+
+def size_class(nbytes: int) -> int:
+    """ Size of the heap block that holds nbytes """
+    if nbytes <= SMALL_BLOCK:
+        return max(nbytes + HEAP_ALIGN - 1, HEAP_ALIGN) // HEAP_ALIGN * HEAP_ALIGN
+    return 1 << (nbytes - 1).bit_length()
+
+# size_class() of every small block size, looked up on each malloc() and free()
+small_classes = [size_class(nbytes) for nbytes in range(SMALL_BLOCK + 1)]
+
+# Bytes per row of a memory dump, in two groups of 8
+DUMP_ROW = 16
+# Text of each byte in a hex dump
+hex_bytes = [f"{byte:02x}" for byte in range(256)]
+# {bytes: format string laying out that many bytes as rows}
+dump_layouts = {}
+# {(bytes, hex): text of that many zero bytes}
+zero_dumps = {}
+
+def dump_layout(nbytes: int) -> str:
+    """ Format string for nbytes from the start of a row, with a tab after each group of 8 and a newline after each row """
+    if nbytes not in dump_layouts:
+        parts = []
+        for index in range(nbytes):
+            if index % 8 == 0 and index:
+                parts.append("\t")
+            if index % DUMP_ROW == 0 and index:
+                parts.append("\n")
+            parts.append("{} ")
+        dump_layouts[nbytes] = "".join(parts)
+    return dump_layouts[nbytes]
+
+class Memory:
+    """ Arena of at most size_ bytes, with a heap growing down from the top """
+    def __init__(self, size_: int):
+        # Rounded so every typed view covers the whole arena
+        self.size = size_ - size_ % MAX_ALIGN
+        # Reserved by the first allocation
+        self.data: mmap.mmap = None
+        # {memoryview format: the arena as items of that format}
+        self.views = {}
+        self.empty()
+
+    def empty(self):
+        """ Sets the heap back to nothing allocated """
+        # Lowest byte of the heap, blocks are cut from below it
+        self.heap = self.size - self.size % HEAP_ALIGN
+        # {address: bytes requested} of the heap blocks in use
+        self.blocks = {}
+        # {size class: addresses of freed blocks}
+        self.free_lists = {}
+        # Heap statistics, see stats()
+        self.allocated = 0
+        self.requested = 0
+        self.mallocs = 0
+        self.frees = 0
+        self.peak_heap = 0
+
+    def reserve(self):
+        # Private, so clear() can hand pages back to the system and have them read as zeros
+        self.data = mmap.mmap(-1, max(self.size, MAX_ALIGN), flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS)
+        self.views = {fmt: memoryview(self.data).cast(fmt) for _, fmt in c_types.values()}
+
+    def malloc(self, nbytes: int) -> int:
+        """ Address of a heap block of at least nbytes, or NULL when the arena is full """
+        if nbytes < 0:
+            return NULL
+        size = small_classes[nbytes] if nbytes <= SMALL_BLOCK else size_class(nbytes)
+        free = self.free_lists.get(size)
+        if free:
+            address = free.pop()
+        else:
+            address = self.heap - size
+            if address < HEAP_ALIGN:
+                return NULL
+            if self.data is None:
+                self.reserve()
+            self.heap = address
+            self.peak_heap = max(self.peak_heap, self.size - address)
+        self.blocks[address] = nbytes
+        self.allocated += size
+        self.requested += nbytes
+        self.mallocs += 1
+        return address
+
+    def calloc(self, count: int, size: int) -> int:
+        """ malloc() of count values of size bytes, set to 0 """
+        nbytes = count * size
+        address = self.malloc(nbytes)
+        if address != NULL:
+            # Freed blocks keep what was written to them
+            self.data[address:address + nbytes] = bytes(nbytes)
+        return address
+
+    def realloc(self, address: int, nbytes: int) -> int:
+        """ Resizes the block at address, moving it when it no longer fits its size class.
+        Returns the new address, or NULL with the block left as it was.
+        """
+        if address == NULL:
+            return self.malloc(nbytes)
+        if nbytes == 0:
+            self.free(address)
+            return NULL
+        old = self.blocks.get(address)
+        if old is None:
+            err = f"realloc(): invalid pointer {address}"
+            raise SegmentationFault(err)
+        if size_class(old) == size_class(nbytes):
+            self.blocks[address] = nbytes
+            self.requested += nbytes - old
+            return address
+        moved = self.malloc(nbytes)
+        if moved != NULL:
+            kept = min(old, nbytes)
+            self.data[moved:moved + kept] = self.data[address:address + kept]
+            self.free(address)
+        return moved
+
+    def free(self, address: int):
+        """ Returns the block at address to the free list of its size class """
+        if address == NULL:
+            return
+        nbytes = self.blocks.pop(address, None)
+        if nbytes is None:
+            # Never allocated, or freed twice
+            err = f"free(): invalid pointer {address}"
+            raise SegmentationFault(err)
+        size = small_classes[nbytes] if nbytes <= SMALL_BLOCK else size_class(nbytes)
+        free = self.free_lists.get(size)
+        if free is None:
+            free = self.free_lists[size] = []
+        free.append(address)
+        self.allocated -= size
+        self.requested -= nbytes
+        self.frees += 1
+
+    def stats(self) -> dict:
+        """ Use of the heap. Internal fragmentation is the share of the blocks in
+        use that was not requested, external fragmentation the share of the heap on free lists.
+        """
+        heap = self.size - self.heap
+        return {
+            'heap': heap,
+            'peak_heap': self.peak_heap,
+            'blocks': len(self.blocks),
+            'allocated': self.allocated,
+            'requested': self.requested,
+            'free': heap - self.allocated,
+            'mallocs': self.mallocs,
+            'frees': self.frees,
+            'internal_fragmentation': 1 - self.requested / self.allocated if self.allocated else 0,
+            'external_fragmentation': (heap - self.allocated) / heap if heap else 0,
+        }
+
+    def allocated_range(self, address: int, nbytes: int) -> bool:
+        """ Whether the nbytes from address are in the heap """
+        return address >= self.heap and address + nbytes <= self.size
+
+    def index(self, type_: str, address: int) -> int:
+        """ Index of the value at address in the view of type_ """
+        size, _ = c_types[type_]
+        if address % size or not self.allocated_range(address, size):
+            err = f"Segmentation fault: {type_} at address {address}"
+            raise SegmentationFault(err)
+        return address // size
+
+    def load(self, type_: str, address: int) -> int | float:
+        """ *address, read as type_ """
+        return self.views[c_types[type_][1]][self.index(type_, address)]
+
+    def store(self, type_: str, address: int, value: int | float):
+        """ *address = value, written as type_ """
+        self.views[c_types[type_][1]][self.index(type_, address)] = value
+
+    def view(self, type_: str, address: int, count: int) -> memoryview:
+        """ The count values of type_ from address on, read and written in place """
+        size, fmt = c_types[type_]
+        start = self.index(type_, address)
+        if not self.allocated_range(address, size * count):
+            err = f"Segmentation fault: {count} {type_} at address {address}"
+            raise SegmentationFault(err)
+        return self.views[fmt][start:start + count]
+
+    def clear(self):
+        """ Frees everything, for the next program """
+        if self.data is not None:
+            # The used pages at the top of the arena
+            start, end = self.heap // mmap.PAGESIZE * mmap.PAGESIZE, self.size - self.size % HEAP_ALIGN
+            if end > start:
+                if hasattr(mmap, 'MADV_DONTNEED'):
+                    # Private anonymous pages read back as zeros, and stop taking memory
+                    self.data.madvise(mmap.MADV_DONTNEED, start, min(end, len(self.data)) - start)
+                else:
+                    self.data[start:end] = bytes(end - start)
+        self.empty()
+
+    def dump(self, out, start: int = 0, end: int = None, hex_: bool = False, nonzero: bool = False):
+        """ Writes the bytes from start to end to the text file out in decimal or hex, formatted a page at a time.
+        With nonzero, pages that are all zeros are left out. A dump of anything but the whole
+        arena starts each run of pages with a line holding the address of its first byte.
+        """
+        end = self.size if end is None else min(end, self.size)
+        # Rows start at multiples of DUMP_ROW
+        start = max(start, 0) // DUMP_ROW * DUMP_ROW
+        whole = start == 0 and end == self.size and not nonzero
+        data = memoryview(self.data) if self.data is not None else None
+        page = mmap.PAGESIZE
+        zeros = bytes(page)
+        # End of the last page written
+        written = None
+        for first in range(start // page * page, end, page):
+            low, high = max(first, start), min(first + page, end)
+            nbytes = high - low
+            chunk = data[low:high] if data is not None else zeros[:nbytes]
+            zero = chunk == (zeros if nbytes == page else zeros[:nbytes])
+            if nonzero and zero:
+                continue
+            if written == low:
+                out.write("\t\n")
+            elif not whole:
+                out.write(("\n" if written is not None else "") + f"{low:#010x}:\n")
+            if zero:
+                key = (nbytes, hex_)
+                if key not in zero_dumps:
+                    zero_dumps[key] = dump_layout(nbytes).format(*(["00"] * nbytes if hex_ else zeros[:nbytes]))
+                out.write(zero_dumps[key])
+            else:
+                out.write(dump_layout(nbytes).format(*(map(hex_bytes.__getitem__, chunk) if hex_ else chunk)))
+            written = high
+        if written is not None and not whole:
+            out.write("\n")
+
+    def snapshot(self, out, start: int = 0, end: int = None):
+        """ Writes the bytes from start to end to the binary file out, in one write """
+        end = self.size if end is None else min(end, self.size)
+        start = min(max(start, 0), end)
+        if self.data is None:
+            # Nothing was written. Only the last zero is written, files read as zeros up to it.
+            if end > start:
+                out.seek(end - start - 1, os.SEEK_CUR)
+                out.write(bytes(1))
+            return
+        out.write(memoryview(self.data)[start:end])
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        """ Every byte of the arena, as an int """
+        if self.data is None:
+            return itertools.repeat(0, self.size)
+        return iter(memoryview(self.data)[:self.size])
+
+
+# C library functions called on the program's Memory, by name. Sizes and addresses
+# are converted to int as C converts them, / gives floats: malloc(n / 2)
+BUILTINS = {
+    'malloc': lambda memory, nbytes: memory.malloc(int(nbytes)),
+    'calloc': lambda memory, count, size: memory.calloc(int(count), int(size)),
+    'realloc': lambda memory, address, nbytes: memory.realloc(int(address), int(nbytes)),
+    'free': lambda memory, address: memory.free(int(address)),
+}
@@ -0,0 +1,212 @@
+# Module to define the node classes of the AST built by parser.py
+# Nodes keep their fields in __slots__ named after the AST keys below, so they take
+# a fraction of the memory of a dict. They can still be read like the dicts they
+# replace (node[VALUE], node.get(NEGATIVE), NAME in node), a field that was never
+# set counts as a missing key.
+
+from types import MappingProxyType
+
+# AST Dict Keys
+INSTRUCTION = 'instruction'
+NAME = 'name'
+VALUE = 'value'
+TYPE = 'type'
+SIZE = 'size'
+POINTER = 'pointer'
+INDEX = 'index'
+ARGUMENTS = 'arguments' # Input to function call
+PARAMETERS = 'parameters' # Input definitions of function
+BODY = 'body' # Instructions of a function
+NEGATIVE = 'negative' # Indicates that evaluation result needs to be multiplied by -1
+
+INIT = 'init'
+COND = 'cond'
+UPDATE = 'update'
+
+L = 'left'
+R = 'right'
+
+# Value of a field that was never set
+MISSING = object()
+
+
+class Node:
+    __slots__ = ()
+    # Keys the node can hold, the same as __slots__
+    fields = ()
+
+    def __init__(self, fields_: dict = None):
+        if fields_:
+            for key, value in fields_.items():
+                setattr(self, key, value)
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.fields and hasattr(self, key)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __or__(self, other: dict):
+        """ Merges like dict |. The result is a node of the same class when every
+        key of other is one of its fields, and a dict otherwise.
+        """
+        if all(key in self.fields for key in other):
+            node = node_classes[type(self)]()
+            for key, value in self.items():
+                setattr(node, key, value)
+            for key, value in other.items():
+                setattr(node, key, value)
+            return node
+        return dict(self.items()) | other
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in self.fields else default
+
+    def keys(self) -> list[str]:
+        return [key for key in self.fields if hasattr(self, key)]
+
+    def values(self) -> list:
+        return [value for key in self.fields if (value := getattr(self, key, MISSING)) is not MISSING]
+
+    def items(self) -> list[tuple]:
+        return [(key, value) for key in self.fields if (value := getattr(self, key, MISSING)) is not MISSING]
+
+    def __repr__(self):
+        # Prints the same as the dict it replaces
+        return repr(dict(self.items()))
+
+    def __reduce__(self):
+        if not isinstance(self, FrozenNode):
+            # Rebuilt by pickle itself, setting the slots from the state
+            return type(self), (), (None, dict(self.items()))
+        # Frozen classes are made at import time, so nodes are pickled by their writable class
+        return load_node, (node_classes[type(self)], self.items(), True)
+
+
+# Expressions
+
+class Literal(Node):
+    """ int, float or char constant """
+    __slots__ = fields = (TYPE, VALUE, NEGATIVE)
+
+class Operation(Node):
+    """ Arithmetic or comparison, VALUE holds the Operands """
+    __slots__ = fields = (INSTRUCTION, VALUE, NEGATIVE)
+
+class Operands(Node):
+    __slots__ = fields = (L, R)
+
+class VarLookup(Node):
+    """ Variable or array element read, VALUE holds the Reference """
+    __slots__ = fields = (INSTRUCTION, VALUE, NEGATIVE)
+
+class Reference(Node):
+    __slots__ = fields = (NAME, INDEX)
+
+class Call(Node):
+    """ Function call, VALUE holds the Callee """
+    __slots__ = fields = (INSTRUCTION, VALUE, NEGATIVE)
+
+class Callee(Node):
+    __slots__ = fields = (NAME, ARGUMENTS)
+
+# Statements
+
+class Variable(Node):
+    """ Declaration or assignment of one variable. Also used for ++ and -- in
+    expressions, and for the entries of state.global_variables.
+    """
+    __slots__ = fields = (INSTRUCTION, NAME, TYPE, VALUE, SIZE, POINTER, NEGATIVE)
+
+class Print(Node):
+    """ printf, VALUE holds the format as strings and Format nodes """
+    __slots__ = fields = (INSTRUCTION, VALUE, ARGUMENTS)
+
+class Format(Node):
+    """ Format specifier such as %d """
+    __slots__ = fields = (TYPE,)
+
+class ForLoop(Node):
+    __slots__ = fields = (INSTRUCTION, INIT, COND, UPDATE, BODY)
+
+class If(Node):
+    __slots__ = fields = (INSTRUCTION, COND, BODY)
+
+class Return(Node):
+    __slots__ = fields = (INSTRUCTION, VALUE)
+
+# Declarations
+
+class Parameter(Node):
+    __slots__ = fields = (TYPE, NAME, POINTER)
+
+class Function(Node):
+    """ Function declaration or definition, declarations have no BODY """
+    __slots__ = fields = (INSTRUCTION, NAME, TYPE, PARAMETERS, BODY)
+
+
+class FrozenNode:
+    """ Base of the read only copies of the node classes made by freeze() """
+    __slots__ = ()
+
+    def __setattr__(self, key: str, value):
+        err = f"{type(self).__name__} nodes are read-only"
+        raise TypeError(err)
+
+    def __setitem__(self, key: str, value):
+        self.__setattr__(key, value)
+
+    def __delattr__(self, key: str):
+        self.__setattr__(key, None)
+
+# {node class: read only version}, and {any node class: writable version}
+frozen_classes = {
+    cls: type(cls.__name__, (FrozenNode, cls), {'__slots__': ()})
+    for cls in Node.__subclasses__()
+}
+node_classes = {cls: cls for cls in frozen_classes} \
+    | {frozen: cls for cls, frozen in frozen_classes.items()}
+
+def load_node(cls: type, items: list[tuple], frozen: bool) -> Node:
+    """ Rebuilds a pickled node """
+    node = object.__new__(frozen_classes[cls] if frozen else cls)
+    for key, value in items:
+        object.__setattr__(node, key, value)
+    return node
+
+# AST containers, before and after freeze()
+NODE_TYPES = (Node, dict, MappingProxyType)
+LIST_TYPES = (list, tuple)
+
+
+def freeze(node, as_dicts: bool = False):
+    """ Returns a read-only copy of an AST. Nodes become their frozen class, dicts
+    become mapping proxies and lists tuples. With as_dicts, nodes become mapping
+    proxies too, which are faster to read.
+    Frozen programs are never written to, so they can be run again or shared between interpreters.
+    """
+    if isinstance(node, FrozenNode) and not as_dicts:
+        # Everything below a frozen node is frozen already
+        return node
+    if isinstance(node, Node) and not as_dicts:
+        frozen = object.__new__(frozen_classes[node_classes[type(node)]])
+        for key, value in node.items():
+            object.__setattr__(frozen, key, freeze(value))
+        return frozen
+    if isinstance(node, NODE_TYPES):
+        return MappingProxyType({key: freeze(value, as_dicts) for key, value in node.items()})
+    if type(node) in LIST_TYPES:
+        return tuple(freeze(n, as_dicts) for n in node)
+    return node
@@ -0,0 +1,131 @@
+# Module to simplify the parsed program in state before it is run
+# Folds constant subexpressions and applies algebraic identities. New nodes are built
+# for everything that changes, the nodes made by the parser are never modified.
+
+from compiler import *
+
+def is_literal(ast) -> bool:
+    """ Numeric leaf node. char literals are left alone. """
+    return isinstance(ast, NODE_TYPES) and INSTRUCTION not in ast and type(ast.get(VALUE)) in (int, float)
+
+def is_int_literal(ast, value: int) -> bool:
+    return is_literal(ast) and type(ast[VALUE]) == int and ast[VALUE] == value
+
+def literal(value: int | float) -> Literal:
+    return Literal({
+        TYPE: 'int' if type(value) == int else 'float',
+        VALUE: value,
+        NEGATIVE: False
+    })
+
+def negate(ast: dict) -> dict:
+    if is_literal(ast):
+        return literal(-ast[VALUE])
+    return ast | {NEGATIVE: not ast.get(NEGATIVE)}
+
+def is_int_expr(ast: dict) -> bool:
+    """ Expressions known to produce an int without side effects.
+    Variables are excluded: / is true division, so int variables can hold floats.
+    """
+    if is_literal(ast):
+        return type(ast[VALUE]) == int
+    instruction = ast.get(INSTRUCTION)
+    if instruction in comparisons:
+        return is_side_effect_free(ast)
+    if instruction in (ADD, SUBTRACT, MULTIPLY):
+        return is_int_expr(ast[VALUE][L]) and is_int_expr(ast[VALUE][R])
+    return False
+
+def is_side_effect_free(ast: dict) -> bool:
+    if INSTRUCTION not in ast:
+        return True
+    instruction = ast[INSTRUCTION]
+    if instruction == VAR_LOOKUP:
+        return ast[VALUE][INDEX] is None or is_side_effect_free(ast[VALUE][INDEX])
+    if instruction in binary_operators:
+        return is_side_effect_free(ast[VALUE][L]) and is_side_effect_free(ast[VALUE][R])
+    # Calls may print, and ++/-- assign
+    return False
+
+def count_nodes(node) -> int:
+    """ Counts statement, expression and literal nodes """
+    if type(node) in LIST_TYPES:
+        return sum(count_nodes(n) for n in node)
+    if not isinstance(node, NODE_TYPES):
+        return 0
+    count = 1 if INSTRUCTION in node or (TYPE in node and VALUE in node) else 0
+    return count + sum(count_nodes(value) for value in node.values())
+
+
+class Optimizer:
+    def __init__(self, state_: State):
+        self.state = state_
+
+    def optimize(self) -> int:
+        """ Replaces every function and global in state with its folded version
+        Returns:
+            int: Number of nodes removed
+        """
+        before = count_nodes(list(self.state.functions.values())) \
+            + count_nodes(list(self.state.global_variables.values()))
+        for name, function in self.state.functions.items():
+            self.state.functions[name] = self.fold(function)
+        for name, gv in self.state.global_variables.items():
+            self.state.global_variables[name] = self.fold(gv)
+        after = count_nodes(list(self.state.functions.values())) \
+            + count_nodes(list(self.state.global_variables.values()))
+        return before - after
+
+    def fold(self, node):
+        """ Folds every expression below node, bottom up """
+        if type(node) in LIST_TYPES:
+            return [self.fold(n) for n in node]
+        if not isinstance(node, NODE_TYPES):
+            return node
+
+        if is_literal(node):
+            # Pre-applies the NEGATIVE flag
+            return literal(-node[VALUE] if node.get(NEGATIVE) else node[VALUE])
+
+        folded = node | {key: self.fold(value) for key, value in node.items()
+                         if isinstance(value, NODE_TYPES + LIST_TYPES)}
+        if folded.get(INSTRUCTION) in binary_operators:
+            return self.fold_binary(folded)
+        return folded
+
+    def fold_binary(self, ast: dict) -> dict:
+        instruction = ast[INSTRUCTION]
+        left = ast[VALUE][L]
+        right = ast[VALUE][R]
+        negative = ast.get(NEGATIVE)
+
+        if is_literal(left) and is_literal(right):
+            if instruction == DIVIDE and right[VALUE] == 0:
+                # Left for the division by zero error at run time
+                return ast
+            value = binary_operators[instruction](left[VALUE], right[VALUE])
+            if instruction in comparisons:
+                value = 1 if value else 0
+            return literal(-value if negative else value)
+
+        # x * 1 is exact for ints and floats
+        if instruction == MULTIPLY and is_int_literal(right, 1):
+            result = left
+        elif instruction == MULTIPLY and is_int_literal(left, 1):
+            result = right
+        # x + 0 and x * 0 are only exact when x is an int, -0.0 + 0 is 0.0 and 1.5 * 0 is 0.0
+        elif instruction in (ADD, SUBTRACT) and is_int_literal(right, 0) and is_int_expr(left):
+            result = left
+        elif instruction == ADD and is_int_literal(left, 0) and is_int_expr(right):
+            result = right
+        elif instruction == MULTIPLY and (is_int_literal(left, 0) or is_int_literal(right, 0)) \
+                and is_int_expr(left) and is_int_expr(right):
+            return literal(0)
+        else:
+            return ast
+
+        return negate(result) if negative else result
+
+
+def optimize_program(state_: State) -> int:
+    return Optimizer(state_).optimize()
@@ -0,0 +1,92 @@
+# Module to parse a program across a pool of processes
+# The token stream is split between top-level statements (function definitions end at the
+# R_CURLY that closes their body), the parts are parsed in worker processes with the same
+# grammar, and the statements they return are recorded in state in source order, as
+# p_program does for a program parsed whole.
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from parser import *
+from scanner import Token
+from tables import make_parser
+from cache import load_pickle
+
+# Fewest tokens worth sending to a worker, smaller programs are parsed in process
+MIN_CHUNK_TOKENS = 20_000
+# Parts per worker, so a worker given short functions does not sit idle at the end
+CHUNKS_PER_WORKER = 4
+
+class TokenList:
+    """ Hands a list of (type, value, lineno, lexpos) tuples to the parser as tokens """
+    def __init__(self, tokens_: list[tuple]):
+        self.tokens = iter(tokens_)
+
+    def token(self) -> Token | None:
+        t = next(self.tokens, None)
+        return None if t is None else Token(*t)
+
+def read_tokens(lexer) -> list[tuple]:
+    """ Every token of the lexer's input, as tuples that are cheap to send to a worker """
+    return [(t.type, t.value, t.lineno, t.lexpos) for t in iter(lexer.token, None)]
+
+def statement_ends(tokens: list[tuple]) -> list[int]:
+    """ Indices just past the end of each top-level statement """
+    ends = []
+    depth = 0
+    for index, (type_, _, _, _) in enumerate(tokens):
+        if type_ == 'L_CURLY':
+            depth += 1
+        elif type_ == 'R_CURLY':
+            depth -= 1
+            # The body of a function definition, and not an initializer followed by ; or ,
+            if depth == 0 and (index + 1 == len(tokens) or tokens[index + 1][0] not in ('SEMICOLON', 'COMMA')):
+                ends.append(index + 1)
+        elif type_ == 'SEMICOLON' and depth == 0:
+            ends.append(index + 1)
+    if not ends or ends[-1] != len(tokens):
+        # Unfinished last statement, left for the parser to report
+        ends.append(len(tokens))
+    return ends
+
+def split_tokens(tokens: list[tuple], nchunks: int) -> list[list[tuple]]:
+    """ Splits tokens between top-level statements into at most nchunks parts of similar size """
+    chunks = []
+    start = 0
+    for end in statement_ends(tokens):
+        if end - start >= len(tokens) / nchunks or end == len(tokens):
+            chunks.append(tokens[start:end])
+            start = end
+    return chunks
+
+def parse_tokens(tokens: list[tuple]) -> list:
+    """ Parses tokens as a program and returns its global statements without recording them """
+    state.record_globals = False
+    try:
+        return make_parser().parse(None, TokenList(tokens)) or []
+    finally:
+        state.record_globals = True
+
+def parse_chunk(tokens: list[tuple]) -> bytes:
+    """ parse_tokens run in a worker. The statements are sent back pickled, so the
+    caller can load them with the garbage collector paused.
+    """
+    return pickle.dumps(parse_tokens(tokens), protocol=pickle.HIGHEST_PROTOCOL)
+
+def parse_parallel(lexer, workers: int) -> list:
+    """ Parses the lexer's input in up to workers processes and records the
+    global statements in state. Returns them in source order.
+    """
+    tokens = read_tokens(lexer)
+    nchunks = min(workers * CHUNKS_PER_WORKER, len(tokens) // MIN_CHUNK_TOKENS)
+    if nchunks < 2:
+        statements = parse_tokens(tokens)
+    else:
+        # Built before the workers start, so forked workers inherit it
+        make_parser()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            statements = []
+            for part in pool.map(parse_chunk, split_tokens(tokens, nchunks)):
+                statements.extend(load_pickle(part))
+    add_global_statements(statements)
+    return statements
@@ -1,22 +1,11 @@
 from state import *
+from nodes import *
+from lexer import tokens
 
 # TODO: Add const variables
 # TODO: Differentiate between prefix and postfix increment/decrement
 # TODO: Consistent handling for unary increment/decrement operators
 
-# AST Dict Keys
-INSTRUCTION = 'instruction'
-NAME = 'name'
-VALUE = 'value'
-TYPE = 'type'
-SIZE = 'size'
-POINTER = 'pointer'
-INDEX = 'index'
-ARGUMENTS = 'arguments' # Input to function call
-PARAMETERS = 'parameters' # Input definitions of function
-BODY = 'body' # Instructions of a function
-NEGATIVE = 'negative' # Indicates that evaluation result needs to be multiplied by -1
-
 # Types of instructions
 NOTHING = 'nothing'
 PRINT = 'print'
@@ -34,15 +23,9 @@ ADD = 'add'
 SUBTRACT = 'subtract'
 
 FOR_LOOP = 'for_loop'
-INIT = 'init'
-COND = 'cond'
-UPDATE = 'update'
 
 IF = 'if_statement'
 
-L = 'left'
-R = 'right'
-
 """ Instruction handling
 VAR_LOOKUP:
     {
@@ -65,62 +48,77 @@ def p_program(p):
     """program : global_statements"""
     p[0] = p[1]
 
-    print(f"{len(p[1])} global statements")
-    for index, statement in enumerate(p[1]):
-        print(f"\t{index}: {statement}")
-        f = statement[NAME]
-        t = statement[TYPE] if TYPE in statement else None
-        v = statement[VALUE] if VALUE in statement else None
-        p = statement[PARAMETERS] if PARAMETERS in statement else None
-        b = statement[BODY] if BODY in statement else None
-        i = statement[INSTRUCTION]
-        size = statement[SIZE] if SIZE in statement else None
-
-        if i == VARIABLE_DECLARATION:
-            state.global_variables[f] = {
-                TYPE: t,
-                VALUE: v,
-                SIZE: size,
-                POINTER: statement[POINTER]
-            }
-        elif i == VARIABLE_ASSIGNMENT:
-            if f not in state.global_variables:
-                print(f"Global variable {f} assigned before declaration.")
-                exit(1)
-            if v[TYPE] != state.global_variables[f][TYPE]:
-                print(f"Incorrect type assignment ({v[TYPE]}) for variable {f} ({state.global_variables[f][TYPE]})")
-                exit(1)
-            state.global_variables[f][VALUE] = v
-        elif i == FUNCTION_DECLARATION:
-            # Functions do not need to be declared if defined before calling
-            state.functions[f] = {
-                TYPE: t,
-                PARAMETERS: p,
-            }
-        elif i == FUNCTION_DEFINITION:
-            if f in state.functions:
-                if t != state.functions[f][TYPE]:
-                    print(f"{f}: Type of declaration ({state.functions[f][TYPE]}) and definition ({t}) does not match.")
-                    exit(1)
-            state.functions[f] = {
-                TYPE: t,
-                PARAMETERS: p,
-                BODY: b
-            }
+    if state.record_globals:
+        add_global_statements(p[1])
+
+def add_global_statements(statements: list):
+    """ Records the global statements of a program in state, in order """
+    if state.verbose:
+        print(f"{len(statements)} global statements")
+    for index, statement in enumerate(statements):
+        if state.verbose:
+            print(f"\t{index}: {statement}")
+        add_global_statement(statement)
+
+def add_global_statement(statement):
+    """ Records a global declaration, assignment or function in state """
+    f = statement[NAME]
+    t = statement[TYPE] if TYPE in statement else None
+    v = statement[VALUE] if VALUE in statement else None
+    p = statement[PARAMETERS] if PARAMETERS in statement else None
+    b = statement[BODY] if BODY in statement else None
+    i = statement[INSTRUCTION]
+    size = statement[SIZE] if SIZE in statement else None
+
+    if i == VARIABLE_DECLARATION:
+        state.global_variables[f] = Variable({
+            TYPE: t,
+            VALUE: v,
+            SIZE: size,
+            POINTER: statement[POINTER]
+        })
+    elif i == VARIABLE_ASSIGNMENT:
+        if f not in state.global_variables:
+            err = f"Global variable {f} assigned before declaration."
+            print(err)
+            raise ParseError(err)
+        if v[TYPE] != state.global_variables[f][TYPE]:
+            err = f"Incorrect type assignment ({v[TYPE]}) for variable {f} ({state.global_variables[f][TYPE]})"
+            print(err)
+            raise ParseError(err)
+        state.global_variables[f][VALUE] = v
+    elif i == FUNCTION_DECLARATION:
+        # Functions do not need to be declared if defined before calling
+        state.functions[f] = Function({
+            TYPE: t,
+            PARAMETERS: p,
+        })
+    elif i == FUNCTION_DEFINITION:
+        if f in state.functions:
+            if t != state.functions[f][TYPE]:
+                err = f"{f}: Type of declaration ({state.functions[f][TYPE]}) and definition ({t}) does not match."
+                print(err)
+                raise ParseError(err)
+        state.functions[f] = Function({
+            TYPE: t,
+            PARAMETERS: p,
+            BODY: b
+        })
 
 
 # Statements that occur outside of functions
+# Lists are left recursive, so each item is appended to the list built so far
 def p_global_statements(p):
-    """global_statements : global_statement global_statements
+    """global_statements : global_statements global_statement
                          | empty"""
     if len(p) == 2:
         p[0] = []
     else:
-        if type(p[1]) == list:
-            p[0] = p[1] + p[2]
+        p[0] = p[1]
+        if type(p[2]) == list:
+            p[0].extend(p[2])
         else:
-            p[0] = [p[1]] + p[2]
-    
+            p[0].append(p[2])
 
 def p_global_statement(p):
     """global_statement : variable_declaration SEMICOLON
@@ -140,15 +138,16 @@ def p_global_statement(p):
 
 # Statements that occur inside functions
 def p_function_statements(p):
-    """function_statements : function_statement function_statements
+    """function_statements : function_statements function_statement
                            | empty"""
     if len(p) == 2:
         p[0] = []
     else:
-        if type(p[1]) == list:
-            p[0] = p[1] + p[2]
+        p[0] = p[1]
+        if type(p[2]) == list:
+            p[0].extend(p[2])
         else:
-            p[0] = [p[1]] + p[2]
+            p[0].append(p[2])
 
 def p_function_statement(p):
     """function_statement : variable_declaration SEMICOLON
@@ -164,123 +163,52 @@ def p_function_statement(p):
 def p_variable_declaration(p):
     """variable_declaration : type variable_list"""
 
-    if type(p[2]) == list:
-        p[0] = [
-            var_info | {
-                INSTRUCTION: VARIABLE_DECLARATION,
-                TYPE: p[1]
-            } for var_info in p[2]
-        ]
-    else:
-        p[0] = [p[2] | {
-            INSTRUCTION: VARIABLE_DECLARATION,
-        TYPE: p[1]
-        }]
+    # Nodes from variable_list are new, so they are filled in rather than copied
+    p[0] = p[2]
+    for var_info in p[0]:
+        var_info[INSTRUCTION] = VARIABLE_DECLARATION
+        var_info[TYPE] = p[1]
 
 def p_variable_list(p):
-    """variable_list : ID
-                     | ID ASSIGN expr
-                     | ID COMMA variable_list
-                     | ID ASSIGN expr COMMA variable_list
-                     | pointer_declarator
-                     | pointer_declarator ASSIGN pointer_initializer
-                     | pointer_declarator COMMA variable_list
-                     | pointer_declarator ASSIGN pointer_initializer COMMA variable_list
-                     | ID INCREMENT
-                     | ID DECREMENT
-                     | ID INCREMENT COMMA variable_list
-                     | ID DECREMENT COMMA variable_list
-                     | pointer_declarator INCREMENT
-                     | pointer_declarator DECREMENT
-                     | pointer_declarator INCREMENT COMMA variable_list
-                     | pointer_declarator DECREMENT COMMA variable_list"""
-    # Line 4n: declare
-    # Line 4n+1: assign
-    # Line 4n+2: declare, variable_list
-    # Line 4n+3: assign, variable_list
+    """variable_list : variable_list COMMA variable
+                     | variable"""
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[0] = p[1]
+        p[0].append(p[3])
+
+def p_variable(p):
+    """variable : ID
+                | ID ASSIGN expr
+                | ID INCREMENT
+                | ID DECREMENT
+                | pointer_declarator
+                | pointer_declarator ASSIGN pointer_initializer
+                | pointer_declarator INCREMENT
+                | pointer_declarator DECREMENT"""
     # TODO: possible simplification for ID and pointer_declarator
-    # TODO: Add cases to handle rules:
-        # pointer_declarator INCREMENT
-        # pointer_declarator DECREMENT
-        # pointer_declarator INCREMENT COMMA variable_list
-        # pointer_declarator DECREMENT COMMA variable_list
-
 
     if type(p[1]) == str:
         # Non pointer
         if len(p) == 2:
             # ID
-            p[0] = [{
+            p[0] = Variable({
                 NAME: p[1],
                 VALUE: None,
                 POINTER: False
-            }]
-        elif len(p) == 3:
-            # ID INCREMENT
-            # ID DECREMENT
-            p[0] = [{
-                INSTRUCTION: VARIABLE_ASSIGNMENT,
-                NAME: p[1],
-                VALUE: {
-                    INSTRUCTION: ADD if p[2] == '++' else SUBTRACT,
-                    VALUE: {
-                        L: {
-                            INSTRUCTION: VAR_LOOKUP,
-                            VALUE: {
-                                NAME: p[1],
-                                INDEX: None
-                            }
-                        },
-                        R: {TYPE: 'int', VALUE: 1}
-                    }
-                },
-                POINTER: False
-            }]
-        elif len(p) == 4:
-            if p[2] == ',':
-                # ID COMMA variables
-                p[0] = [{
-                    NAME: p[1],
-                    VALUE: None,
-                    POINTER: False
-                }] + p[3]
-            else:
-                # ID ASSIGN expr
-                p[0] = [{
-                    NAME: p[1],
-                    VALUE: p[3],
-                    POINTER: False
-                }]
-        elif len(p) == 5:
-            # ID INCREMENT COMMA variable_list
-            # ID DECREMENT COMMA variable_list
-            p[0] = [{
-                INSTRUCTION: VARIABLE_ASSIGNMENT,
-                NAME: p[1],
-                VALUE: {
-                    INSTRUCTION: ADD if p[2] == '++' else SUBTRACT,
-                    VALUE: {
-                        VALUE: {
-                            L: {
-                                INSTRUCTION: VAR_LOOKUP,
-                                VALUE: {
-                                    NAME: p[1],
-                                    INDEX: None
-                                }
-                            },
-                            R: {TYPE: 'int', VALUE: 1}
-                        }
-                    }
-                },
-                POINTER: False
-            }] + p[4]
-        else:
-            # ID ASSIGN expr COMMA variable_list
-            p[0] = [{
+            })
+        elif p[2] == '=':
+            # ID ASSIGN expr
+            p[0] = Variable({
                 NAME: p[1],
                 VALUE: p[3],
                 POINTER: False
-            }] + p[5]
+            })
+        else:
+            # ID INCREMENT
+            # ID DECREMENT
+            p[0] = increment(p[1], p[2])
     else:
         # Pointer
         if len(p) == 2:
@@ -289,49 +217,54 @@ def p_variable_list(p):
                 VALUE: None,
                 POINTER: True
             }
-        elif len(p) == 4:
-            if p[2] == ',':
-                # pointer_declarator COMMA variable_list
-                p[0] = [
-                    p[1] | {
-                        VALUE: None,
-                        POINTER: True
-                    }
-                ] + p[3]
-            else:
-                # pointer_declarator ASSIGN pointer_initializer
-                p[0] = [
-                    p[1] | {
-                        VALUE: p[3],
-                        POINTER: True
-                    }
-                ]
+        elif p[2] == '=':
+            # pointer_declarator ASSIGN pointer_initializer
+            p[0] = p[1] | {
+                VALUE: p[3],
+                POINTER: True
+            }
         else:
-            # pointer_declarator ASSIGN pointer_initializer COMMA variable_list
-            p[0] = [
-                p[1] | {
-                    VALUE: p[3],
-                    POINTER: True
-                }
-            ] + p[5]
+            # TODO: Handle pointer_declarator INCREMENT and pointer_declarator DECREMENT
+            err = f"{p[2]} on {p[1][NAME]}[] is not supported"
+            raise Exception(err)
+
+def increment(name: str, operator: str) -> Variable:
+    """ name++ or name-- as the assignment name = name + 1 """
+    return Variable({
+        INSTRUCTION: VARIABLE_ASSIGNMENT,
+        NAME: name,
+        VALUE: Operation({
+            INSTRUCTION: ADD if operator == '++' else SUBTRACT,
+            VALUE: Operands({
+                L: VarLookup({
+                    INSTRUCTION: VAR_LOOKUP,
+                    VALUE: Reference({
+                        NAME: name,
+                        INDEX: None
+                    })
+                }),
+                R: Literal({TYPE: 'int', VALUE: 1})
+            })
+        }),
+        POINTER: False
+    })
 
 def p_variable_assignment(p):
     """variable_assignment : variable_list"""
 
-    # for index, var_info in enumerate(p[1]):
-    p[0] = [var_info | {
-        INSTRUCTION: VARIABLE_ASSIGNMENT
-    } for var_info in p[1]]
+    for var_info in p[1]:
+        var_info[INSTRUCTION] = VARIABLE_ASSIGNMENT
+    p[0] = p[1]
 
 
 def p_pointer_declarator(p):
     """pointer_declarator : POINTER ID
                           | ID array_size"""
 
-    p[0] = {
+    p[0] = Variable({
         NAME: p[2] if p[1] == '*' else p[1],
         SIZE: None if p[1] == '*' else p[2]
-    }
+    })
 
 def p_pointer_initializer(p):
     """pointer_initializer : L_CURLY expr_list R_CURLY
@@ -346,21 +279,13 @@ def p_array_size(p):
     p[0] = p[2] if len(p) == 4 else None
 
 def p_expr_list(p):
-    """expr_list : expr expr_list_prime"""
-    if p[2]:
-        p[0] = [p[1]] + p[2]
-    else:
+    """expr_list : expr_list COMMA expr
+                 | expr"""
+    if len(p) == 2:
         p[0] = [p[1]]
-
-def p_expr_list_prime(p):
-    """expr_list_prime : COMMA expr expr_list_prime
-                       | empty"""
-
-    if p[1]:
-        if p[3]:
-            p[0] = [p[2]] + p[3]
-        else:
-            p[0]= [p[2]]
+    else:
+        p[0] = p[1]
+        p[0].append(p[3])
 
 
 def p_expr(p):
@@ -389,13 +314,13 @@ def p_expr_prime(p):
         if p[3] is not None:
             p[3][VALUE][L] = p[2]
             rnode = p[3]
-        p[0] = {
+        p[0] = Operation({
             INSTRUCTION: p[1],
-            VALUE: {
+            VALUE: Operands({
                 L: None,
                 R: rnode
-            }
-        }
+            })
+        })
     else:
         p[0] = None
 
@@ -421,13 +346,13 @@ def p_comp_prime(p):
         if p[3] is not None:
             p[3][VALUE][L] = p[2]
             rnode = p[3]
-        p[0] = {
+        p[0] = Operation({
             INSTRUCTION: ADD if p[1] == '+' else SUBTRACT,
-            VALUE: {
+            VALUE: Operands({
                 L: None,
                 R: rnode
-            }
-        }
+            })
+        })
     else:
         p[0] = None
 
@@ -450,13 +375,13 @@ def p_term_prime(p):
         if p[3] is not None:
             p[3][VALUE][L] = p[2]
             rnode = p[3]
-        p[0] = {
+        p[0] = Operation({
             INSTRUCTION: MULTIPLY if p[1] == '*' else DIVIDE,
-            VALUE: {
+            VALUE: Operands({
                 L: None,
                 R: rnode
-            }
-        }      
+            })
+        })
     else:
         p[0] = None
 
@@ -481,44 +406,25 @@ def p_factor(p):
         elif type(p[1]) == str:
             if len(p) == 2:
                 # ID
-                p[0] = {
+                p[0] = VarLookup({
                     INSTRUCTION: VAR_LOOKUP,
-                    VALUE: {
+                    VALUE: Reference({
                         NAME: p[1],
                         INDEX: None
-                    }
-                }
+                    })
+                })
             elif len(p) == 3:
                 # ++, --
-                p[0] = {
-                    INSTRUCTION: VARIABLE_ASSIGNMENT,
-                    NAME: p[1],
-                    POINTER: False,
-                    VALUE: {
-                        INSTRUCTION: ADD if p[2] == '++' else SUBTRACT,
-                        VALUE: {
-                            L: {
-                                INSTRUCTION: VAR_LOOKUP,
-                                VALUE: {
-                                    NAME: p[1],
-                                    INDEX: None
-                                }},
-                            R: {
-                                TYPE: 'int',
-                                VALUE: 1
-                            }
-                        }
-                    }
-                }
+                p[0] = increment(p[1], p[2])
             else:
                 # ID L_SQUARE expr R_SQUARE
-                p[0] = {
+                p[0] = VarLookup({
                     INSTRUCTION: VAR_LOOKUP,
-                    VALUE: {
+                    VALUE: Reference({
                         NAME: p[1],
                         INDEX: p[3]
-                    }
-                }
+                    })
+                })
         else:
             # literal
             # function_call
@@ -533,16 +439,16 @@ def p_literal(p):
                | FLOAT
                | SINGLE_QUOTE CHAR SINGLE_QUOTE"""
     if len(p) == 2:
-        p[0] = {
+        p[0] = Literal({
             TYPE: 'int' if type(p[1]) == int else 'float',
             VALUE: p[1],
-        }
+        })
     else:
         if len(p[2]) == 1:
-            p[0] = {
+            p[0] = Literal({
                 TYPE: 'char',
                 VALUE: p[2]
-            }
+            })
         else:
             # Reserved for string literals
             pass
@@ -550,25 +456,18 @@ def p_literal(p):
 def p_function_call(p):
     """function_call : ID L_ROUND arguments R_ROUND"""
 
-    p[0] = {
+    p[0] = Call({
         INSTRUCTION: FUNCTION_CALL,
-        VALUE: {
+        VALUE: Callee({
             NAME: p[1],
             ARGUMENTS: p[3]
-        }
-    }
+        })
+    })
 
 def p_arguments(p):
-    """arguments : expr
-                 | expr COMMA arguments
+    """arguments : expr_list
                  | empty"""
-    if len(p) == 2:
-        if p[1] is None:
-            p[0] = []
-        else:
-            p[0] = [p[1]]
-    else:
-        p[0] = [p[1]] + p[3]
+    p[0] = [] if p[1] is None else p[1]
 
 
 
@@ -577,45 +476,47 @@ def p_arguments(p):
 def p_function_declaration(p):
     """function_declaration : function_prototype"""
 
-    p[0] = {
+    p[0] = Function({
         INSTRUCTION: FUNCTION_DECLARATION,
         NAME: p[1][NAME],
         TYPE: p[1][TYPE],
         PARAMETERS: p[1][PARAMETERS]
-    }
+    })
 
 def p_function_definition(p):
     """function_definition : function_prototype L_CURLY function_statements R_CURLY"""
 
-    p[0] = {
+    p[0] = Function({
         INSTRUCTION: FUNCTION_DEFINITION,
         NAME: p[1][NAME],
         TYPE: p[1][TYPE],
         PARAMETERS: p[1][PARAMETERS],
         BODY: p[3]
-    }
+    })
 
 def p_function_prototype(p):
     """function_prototype : type ID L_ROUND parameters R_ROUND"""
 
-    p[0] = {
+    p[0] = Function({
         TYPE: p[1],
         NAME: p[2],
         PARAMETERS: p[4]
-    }
+    })
 
 def p_parameters(p):
-    """parameters : parameter COMMA parameters
-                  | parameter
+    """parameters : parameter_list
                   | empty"""
     # arguments but without the function_call
+    p[0] = p[1]
+
+def p_parameter_list(p):
+    """parameter_list : parameter_list COMMA parameter
+                      | parameter"""
     if len(p) == 2:
-        if p[1] is None:
-            p[0] = None
-        else:
-            p[0] = [p[1]]
+        p[0] = [p[1]]
     else:
-        p[0] = [p[1]] + p[3]
+        p[0] = p[1]
+        p[0].append(p[3])
 
 def p_parameter(p):
     """parameter : type ID
@@ -637,11 +538,11 @@ def p_parameter(p):
         name = p[3]
         pointer = True
 
-    p[0] = {
+    p[0] = Parameter({
         TYPE: p[1],
         NAME: name,
         POINTER: pointer
-    }
+    })
 
 def p_printf(p):
     """printf : PRINTF L_ROUND DOUBLE_QUOTE printf_string DOUBLE_QUOTE printf_args R_ROUND"""
@@ -658,43 +559,28 @@ def p_printf(p):
     if len(str_stack) > 0:
         new_printf_string.append(str_stack)
 
-    p[0] = {
+    p[0] = Print({
         INSTRUCTION: PRINT,
         VALUE: new_printf_string,
         ARGUMENTS: p[6]
-    }
+    })
 
 def p_printf_string(p):
-    """printf_string : STRING
-                     | string_format
-                     | STRING printf_string_prime
-                     | string_format printf_string_prime
+    """printf_string : printf_string STRING
+                     | printf_string string_format
                      | empty"""
-    if p[1] is None:
+    if len(p) == 2:
         p[0] = []
     else:
-        if len(p) == 3:
-            if p[2] is not None:
-                p[0] = [p[1]] + p[2]
-            else:
-                p[0] = [p[1]]
-        else:
-            p[0] = [p[1]]
-
-def p_printf_string_prime(p):
-    """printf_string_prime : STRING printf_string
-                           | string_format printf_string"""
-    if p[2] is not None:
-        p[0] = [p[1]] + p[2]
-    else:
-        p[0] = [p[1]]
+        p[0] = p[1]
+        p[0].append(p[2])
 
 def p_string_format(p):
     """string_format : SIGNED_DEC_INT
                      | LOWER_DEC_FLOAT"""
-    p[0] = {
+    p[0] = Format({
         TYPE: p[1]
-    }
+    })
 
 def p_printf_args(p):
     """printf_args : COMMA arguments
@@ -704,32 +590,31 @@ def p_printf_args(p):
 
 def p_for_loop(p):
     """for_loop : FOR L_ROUND for_init SEMICOLON for_cond SEMICOLON for_update R_ROUND L_CURLY function_statements R_CURLY"""
-    p[0] = {
+    p[0] = ForLoop({
         INSTRUCTION: FOR_LOOP,
         INIT: p[3],
         COND: p[5],
         UPDATE: p[7],
         BODY: p[10]
-    }
+    })
 
 def p_for_init(p):
-    """for_init : for_init_statement for_init_prime
+    """for_init : for_init_list
                 | empty"""
-    if p[2] is not None:
-        p[0] = p[1] + p[2]
+    p[0] = p[1]
+
+def p_for_init_list(p):
+    """for_init_list : for_init_list COMMA for_init_statement
+                     | for_init_statement"""
+    # Declarations come as lists of variables
+    if len(p) == 2:
+        p[0] = p[1] if type(p[1]) == list else [p[1]]
     else:
         p[0] = p[1]
-    
-def p_for_init_prime(p):
-    """for_init_prime : COMMA for_init_statement for_init_prime
-                      | empty"""
-    if p[1] is not None:
-        if p[3] is not None:
-            p[0] = [p[2]] + p[3]
+        if type(p[3]) == list:
+            p[0].extend(p[3])
         else:
-            p[0] = [p[2]]
-    else:
-        p[0] = None
+            p[0].append(p[3])
 
 def p_for_init_statement(p):
     """for_init_statement : variable_declaration
@@ -748,21 +633,21 @@ def p_for_update(p):
 
 def p_if_statement(p):
     """if_statement : IF L_ROUND expr R_ROUND L_CURLY function_statements R_CURLY"""
-    p[0] = {
+    p[0] = If({
         INSTRUCTION: IF,
         COND: p[3],
         BODY: p[6]
-    }
+    })
 
 
 def p_return(p):
     """return : RETURN expr
               | RETURN"""
 
-    p[0] = {
+    p[0] = Return({
         INSTRUCTION: RETURN,
         VALUE: p[2] if len(p) == 3 else None
-    }
+    })
 
 def p_type(p):
     """type : TYPE_VOID
@@ -778,7 +663,8 @@ def p_empty(p):
 
 def p_error(p):
     if p:
-        print(f"Syntax error at ({p.value}, {p.type}), line {p.lineno}")
+        err = f"Syntax error at ({p.value}, {p.type}), line {p.lineno}"
     else:
-        print("Syntax error at EOF")
-    exit(1)
\ No newline at end of file
+        err = "Syntax error at EOF"
+    print(err)
+    raise ParseError(err)
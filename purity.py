@@ -0,0 +1,58 @@
+# Module to find C functions whose result depends only on their arguments
+# Calls to these functions can be memoized by argument values.
+
+from resolver import *
+
+def walk(node):
+    """ Yields every statement and expression node in a resolved AST """
+    if type(node) in LIST_TYPES:
+        for n in node:
+            yield from walk(n)
+    elif isinstance(node, NODE_TYPES):
+        if INSTRUCTION in node:
+            yield node
+        for value in node.values():
+            if isinstance(value, NODE_TYPES + LIST_TYPES):
+                yield from walk(value)
+
+
+def find_pure_functions(program: ResolvedProgram) -> set[str]:
+    """ Returns the names of functions that are pure: no printf, no global writes,
+    no pointer parameters, only reads globals that no function writes, and only
+    calls other pure functions
+    """
+    calls = {}
+    global_reads = {}
+    written_globals = set()
+    candidates = set()
+    for name, function in program.functions.items():
+        calls[name] = set()
+        global_reads[name] = set()
+        impure = any(param[POINTER] for param in function[PARAMETERS])
+        for node in walk(function[BODY]):
+            instruction = node[INSTRUCTION]
+            if instruction == PRINT:
+                impure = True
+            elif instruction == FUNCTION_CALL:
+                calls[name].add(node[VALUE][NAME])
+            elif instruction == VAR_LOOKUP and node[GLOBAL]:
+                global_reads[name].add(node[SLOT])
+            elif instruction == VARIABLE_ASSIGNMENT and node.get(GLOBAL):
+                written_globals.add(node[SLOT])
+                impure = True
+        if not impure:
+            candidates.add(name)
+
+    # Globals that are never written after initialization are constants
+    pure = {name for name in candidates if not global_reads[name] & written_globals}
+
+    # Drop functions calling anything impure or undefined until nothing changes,
+    # so mutually recursive pure functions stay pure
+    changed = True
+    while changed:
+        changed = False
+        for name in list(pure):
+            if not calls[name] <= pure:
+                pure.remove(name)
+                changed = True
+    return pure
@@ -0,0 +1,196 @@
+# Module to resolve variable names in the parsed program to fixed frame slots
+# Returns new, frozen AST nodes annotated with slots, the parsed program in state is left untouched.
+
+from compiler import *
+
+# AST Dict Keys added by the resolver
+SLOT = 'slot' # Index of the variable in its frame
+GLOBAL = 'global' # The slot is in the global frame instead of the function's frame
+NSLOTS = 'nslots' # Frame size of a function
+CALLS = 'calls' # The statement or expression contains a function call
+TAIL = 'tail' # Self call in tail position, runs in the caller's frame
+
+
+class ResolvedProgram:
+    def __init__(self):
+        # {name: function node with NSLOTS}, only functions that have a body
+        self.functions = {}
+        # Global declarations in order, each with NAME and SLOT
+        self.global_variables = []
+        self.nglobals = 0
+
+
+def contains_call(*nodes) -> bool:
+    """ Checks resolved nodes, or lists of them, for function calls """
+    for node in nodes:
+        if type(node) in LIST_TYPES:
+            if contains_call(*node):
+                return True
+        elif node is not None and node.get(CALLS):
+            return True
+    return False
+
+
+class Resolver:
+    def __init__(self, state_: State):
+        self.state = state_
+        self.program = ResolvedProgram()
+
+        self.global_index = {}
+        # Scope chain of {name: slot}, empty when resolving global initializers
+        self.scopes: list[dict] = []
+        self.nslots = 0
+        # Name of the function being resolved
+        self.function = None
+
+    def resolve(self) -> ResolvedProgram:
+        for name in self.state.global_variables:
+            self.global_index[name] = len(self.global_index)
+        self.program.nglobals = len(self.global_index)
+
+        self.scopes = []
+        # Plain dicts, the tree walker reads them faster than node classes
+        self.program.global_variables = freeze([
+            self.resolve_declaration(gv | {INSTRUCTION: VARIABLE_DECLARATION, NAME: name})
+            for name, gv in self.state.global_variables.items()
+        ], as_dicts=True)
+        for name, function in self.state.functions.items():
+            if BODY in function:
+                self.program.functions[name] = freeze(self.resolve_function(name, function), as_dicts=True)
+        return self.program
+
+    def resolve_function(self, name: str, function: dict) -> dict:
+        parameters = named_parameters(function[PARAMETERS])
+        self.function = name
+        self.scopes = [{param[NAME]: slot for slot, param in enumerate(parameters)}]
+        self.nslots = len(parameters)
+        body = self.resolve_block(function[BODY])
+        if body and is_self_call(body[-1], name):
+            # Call that ends the function
+            body[-1] = body[-1] | {TAIL: True}
+        return function | {
+            PARAMETERS: parameters,
+            BODY: body,
+            NSLOTS: self.nslots
+        }
+
+    def lookup(self, name: str) -> dict:
+        """ Returns the {SLOT, GLOBAL} annotation for a variable name """
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return {SLOT: scope[name], GLOBAL: False}
+        if name in self.global_index:
+            return {SLOT: self.global_index[name], GLOBAL: True}
+        err = f"{name} assigned before declaration."
+        raise Exception(err)
+
+    # Statements
+
+    def resolve_block(self, statements) -> list[dict]:
+        self.scopes.append({})
+        block = [self.resolve_statement(s) for s in as_statements(statements)]
+        self.scopes.pop()
+        return block
+
+    def resolve_statement(self, statement: dict) -> dict:
+        # Entries of a for loop's update list may not carry an instruction
+        instruction = statement.get(INSTRUCTION, VARIABLE_ASSIGNMENT)
+        if instruction == VARIABLE_DECLARATION:
+            return self.resolve_declaration(statement)
+        elif instruction == VARIABLE_ASSIGNMENT:
+            return self.resolve_assignment(statement)
+        elif instruction == FOR_LOOP:
+            # Variables declared in the init block are scoped to the loop
+            self.scopes.append({})
+            init = [self.resolve_statement(s) for s in as_statements(statement[INIT])]
+            cond = self.resolve_expr(statement[COND])
+            body = self.resolve_block(statement[BODY])
+            update = [self.resolve_statement(s) for s in as_statements(statement[UPDATE])]
+            self.scopes.pop()
+            return statement | {
+                INIT: init,
+                COND: cond,
+                BODY: body,
+                UPDATE: update,
+                CALLS: contains_call(init, cond, body, update)
+            }
+        elif instruction == IF:
+            cond = self.resolve_expr(statement[COND])
+            body = self.resolve_block(statement[BODY])
+            return statement | {COND: cond, BODY: body, CALLS: contains_call(cond, body)}
+        elif instruction == PRINT:
+            arguments = [self.resolve_expr(arg) for arg in as_statements(statement[ARGUMENTS])]
+            return statement | {ARGUMENTS: arguments, CALLS: contains_call(arguments)}
+        elif instruction == RETURN:
+            value = self.resolve_expr(statement[VALUE])
+            return statement | {
+                VALUE: value,
+                CALLS: contains_call(value),
+                TAIL: is_self_call(value, self.function)
+            }
+        else:
+            # Expression statement
+            return self.resolve_expr(statement)
+
+    def resolve_declaration(self, statement: dict) -> dict:
+        if is_array_declaration(statement):
+            value = [self.resolve_expr(ast) for ast in as_statements(statement[VALUE])]
+        else:
+            value = self.resolve_expr(statement[VALUE])
+        size = self.resolve_expr(statement.get(SIZE))
+        resolved = statement | {VALUE: value, SIZE: size, CALLS: contains_call(value, size)}
+
+        if not self.scopes:
+            return resolved | {SLOT: self.global_index[statement[NAME]], GLOBAL: True}
+
+        # The value is evaluated before the name enters scope
+        self.scopes[-1][statement[NAME]] = self.nslots
+        self.nslots += 1
+        return resolved | {SLOT: self.nslots - 1, GLOBAL: False}
+
+    def resolve_assignment(self, statement: dict) -> dict:
+        statement = statement | {INSTRUCTION: VARIABLE_ASSIGNMENT}
+        if statement[VALUE] is None:
+            # Bare name in a variable list, nothing to evaluate
+            return statement | {CALLS: False}
+        value = self.resolve_expr(statement[VALUE])
+        index = self.resolve_expr(statement.get(SIZE)) if statement[POINTER] else None
+        return statement | self.lookup(statement[NAME]) | {
+            VALUE: value,
+            SIZE: index,
+            CALLS: contains_call(value, index)
+        }
+
+    # Expressions
+
+    def resolve_expr(self, ast: dict | None) -> dict | None:
+        if ast is None or INSTRUCTION not in ast:
+            # Nothing to resolve in leaf nodes
+            return ast
+
+        instruction = ast[INSTRUCTION]
+        if instruction == VAR_LOOKUP:
+            index = self.resolve_expr(ast[VALUE][INDEX])
+            return ast | self.lookup(ast[VALUE][NAME]) | {
+                VALUE: ast[VALUE] | {INDEX: index},
+                CALLS: contains_call(index)
+            }
+        elif instruction == FUNCTION_CALL:
+            return ast | {
+                VALUE: ast[VALUE] | {
+                    ARGUMENTS: [self.resolve_expr(arg) for arg in ast[VALUE][ARGUMENTS]]
+                },
+                CALLS: True
+            }
+        elif instruction == VARIABLE_ASSIGNMENT:
+            # i++ used as an expression
+            return self.resolve_assignment(ast)
+        elif instruction in binary_opcodes:
+            left = self.resolve_expr(ast[VALUE][L])
+            right = self.resolve_expr(ast[VALUE][R])
+            return ast | {VALUE: {L: left, R: right}, CALLS: contains_call(left, right)}
+        return ast | {CALLS: False}
+
+
+def resolve_program(state_: State) -> ResolvedProgram:
+    return Resolver(state_).resolve()
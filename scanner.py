@@ -0,0 +1,396 @@
+# Module for a hand-written scanner producing the same tokens as the PLY rules in lexer.py
+# PLY tries its master regex at every position and runs a rule function for each match,
+# spaces and comments included. The scanner makes one pass over the input, choosing what
+# to match from the class of the current character, and skips comments and string
+# literals as whole spans when they only hold plain text.
+# Matching follows the order of the PLY rules, quirks included: << is two LT tokens, +=
+# is PLUS then ASSIGN, the newline ending a // comment is not counted, and #include is
+# only recognized at the start of the input.
+# Input can also be streamed from a file, an mmap or any reader in chunks. Chunks are
+# scanned up to their last newline, which no token but a block comment reaches across,
+# so only the unfinished line is carried over to the next chunk.
+
+import os
+import re
+import io
+import mmap
+import codecs
+import decimal
+
+from ply.lex import LexToken
+
+import lexer as rules
+from state import ParseError
+
+# Patterns shared with the PLY rules, compiled with the flag PLY uses
+id_pattern = re.compile(rules.t_ID.__doc__, re.VERBOSE)
+number_pattern = re.compile(rules.t_NUMBER.__doc__, re.VERBOSE)
+format_pattern = re.compile(rules.t_FORMAT.__doc__, re.VERBOSE)
+include_pattern = re.compile(rules.t_INCLUDE.__doc__, re.VERBOSE)
+# Text that include_pattern could still match once more of the input is read
+include_prefix = re.compile(r'''\s*(\#\s*(i(n(c(l(u(d(e\s*(<[^<>]*|"[^"]*)?)?)?)?)?)?)?)?)?''')
+spaces_pattern = re.compile(r'[ ]+')
+newlines_pattern = re.compile(r'\n+')
+
+# Comment text the rules only drop: no / that could open a nested comment or a // comment
+# hiding the end, and no character the rules reject
+plain_comment = re.compile(r"""[a-zA-Z0-9_ \n;,(){}\[\]=<>!&|+\-*^~"']*""")
+# String literal text made of words, numbers, spaces, operators, \n, %d and %f
+plain_string = re.compile(r"""(?:[a-zA-Z0-9_ ;,(){}\[\]=<>!&|+\-*^~]|\\n|%[df])*""")
+# Splits plain string text into the tokens the rules would match
+string_piece = re.compile(r"""[a-zA-Z_][a-zA-Z_0-9]*|==|<=|>=|!=|&&|\|\||\+\+|--|\\n|%[df]|[ ]+|[^0-9]|"""
+                          + rules.t_NUMBER.__doc__)
+
+# Character classes, the dispatch table of the scanner
+char_classes = {c: 'letter' for c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_"} \
+    | {c: 'digit' for c in "0123456789."} \
+    | {c: 'operator' for c in "=<>!&|+-^~"} \
+    | {c: 'punctuation' for c in ";,()[]{}"} \
+    | {
+        ' ': 'space',
+        '\n': 'newline',
+        '/': 'slash',
+        '*': 'star',
+        '%': 'percent',
+        '\\': 'backslash',
+        '"': 'double_quote',
+        "'": 'single_quote',
+    }
+
+punctuation = {';': 'SEMICOLON', ',': 'COMMA'} | rules.brackets
+# Operators matched as two characters, the rest are one
+double_operators = {op: rules.operators[op] for op in ['==', '<=', '>=', '!=', '&&', '||', '++', '--']}
+single_operators = {op: rules.operators[op] for op in "=<>!&|+-^~"}
+keywords = rules.return_types | rules.reserved | rules.reserved_functions
+# Tokens a - following is a NEGATIVE after
+negative_after = set(rules.operators.values()) | set(rules.left_brackets.values())
+pointer_after = set(rules.return_types.values())
+
+# Characters read at a time when streaming
+CHUNK_SIZE = 256 * 1024
+
+
+class Token(LexToken):
+    """ LexToken built in one call """
+    def __init__(self, type_: str, value_, lineno_: int, lexpos_: int):
+        self.type = type_
+        self.value = value_
+        self.lineno = lineno_
+        self.lexpos = lexpos_
+
+
+def illegal_character(c: str, lineno: int):
+    # Same report and exit as lexer.t_error
+    err = f"Illegal character '{c} at line {lineno}'"
+    print(err)
+    raise ParseError(err)
+
+def plain_comment_end(data: str, pos: int, end: int) -> int:
+    """ Where the block comment running at pos stops, at its */ or at end, when it is
+    plain text up to there. -1 when it has to be scanned token by token.
+    """
+    close = data.find('*/', pos, end)
+    stop = end if close < 0 else close
+    return stop if plain_comment.fullmatch(data, pos, stop) else -1
+
+def read_chunks(source, chunk_size: int = CHUNK_SIZE):
+    """ Yields the text of source in chunks. source is a str, or anything with
+    read(size) returning str or bytes, such as a file or an mmap. Bytes are decoded as
+    UTF-8 with newlines translated, like a file opened in text mode.
+    """
+    if isinstance(source, str):
+        yield source
+        return
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+    while (chunk := source.read(chunk_size)):
+        yield chunk if isinstance(chunk, str) else decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+def read_file(fpath: str, chunk_size: int = CHUNK_SIZE):
+    """ read_chunks over an mmap of fpath """
+    with open(fpath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            released = 0
+            for chunk in read_chunks(data, chunk_size):
+                yield chunk
+                # Pages already read are let go, so the mapping does not stay resident
+                done = data.tell() // mmap.PAGESIZE * mmap.PAGESIZE
+                if done > released and hasattr(mmap, 'MADV_DONTNEED'):
+                    data.madvise(mmap.MADV_DONTNEED, released, done - released)
+                    released = done
+
+def to_number(value: str) -> int | float:
+    if value.isdigit():
+        return int(value)
+    if '.' in value:
+        return float(decimal.Decimal(value))
+    return int(decimal.Decimal(value))
+
+
+class Scanner:
+    """ Replaces the PLY lexer built from lexer.py: input() the source, or
+    input_stream() a reader, then call token() until it returns None.
+    Like the PLY lexers, each scanner keeps the state of the rules
+    (see lexer.init_state), written back after every chunk.
+    """
+    def __init__(self):
+        self.lineno = 1
+        self.lexpos = 0
+        self.read_string = 0
+        self.read_comment = 0
+        self.prev_token = None
+        self.tokens = iter(())
+
+    def input(self, data: str):
+        self.lexpos = 0
+        self.tokens = self.scan([data])
+
+    def input_stream(self, source, chunk_size: int = CHUNK_SIZE):
+        """ Tokenizes source lazily, see read_chunks. A str source is taken as a
+        path, read through an mmap.
+        """
+        chunks = read_file(source, chunk_size) if isinstance(source, str) else read_chunks(source, chunk_size)
+        self.lexpos = 0
+        self.tokens = self.scan(chunks)
+
+    def token(self) -> Token | None:
+        return next(self.tokens, None)
+
+    def __iter__(self):
+        return self.tokens
+
+    def scan(self, chunks):
+        """ Yields the tokens of the text in chunks """
+        chunks = iter(chunks)
+        base = 0
+        # Pieces of the unfinished line
+        line = []
+        # Whether the start of the input, the only place the rules match #include, is still to come
+        start = True
+        while True:
+            chunk = next(chunks, None)
+            if chunk is not None:
+                line.append(chunk)
+                if not start and '\n' not in chunk:
+                    continue
+            data = "".join(line)
+            line = []
+            # SPACE comes before INCLUDE in the rules
+            if start and data[:1] != ' ':
+                if (m := include_pattern.match(data)):
+                    data = data[m.end():]
+                    base = m.end()
+                elif chunk is not None and include_prefix.fullmatch(data):
+                    # Could still become an #include line
+                    line = [data]
+                    continue
+            start = False
+            if chunk is None:
+                yield from self.scan_text(data, base, len(data))
+                return
+            # Scanned up to the last newline, the unfinished line waits for the next chunk
+            cut = data.rfind('\n') + 1
+            if cut < len(data):
+                line = [data[cut:]]
+            if cut:
+                yield from self.scan_text(data, base, cut)
+                base += cut
+
+    def scan_text(self, data: str, base: int, end: int):
+        """ Yields the tokens of data up to end. data starts base characters into the
+        input, and end is its length or just past a newline.
+        """
+        lineno = self.lineno
+        read_string = self.read_string
+        read_comment = self.read_comment
+        prev = self.prev_token
+
+        pos = 0
+        if read_comment and (stop := plain_comment_end(data, pos, end)) >= 0:
+            # Comment still open from the previous chunk
+            lineno += data.count('\n', pos, stop)
+            pos = stop
+            if data.startswith('*/', stop):
+                pos += 2
+                read_comment = 0
+
+        while pos < end:
+            c = data[pos]
+            kind = char_classes.get(c)
+            start = pos
+
+            if kind == 'space':
+                pos = spaces_pattern.match(data, pos).end()
+                if read_comment or not read_string:
+                    continue
+                typ = 'STRING'
+                value = data[start:pos]
+            elif kind == 'letter':
+                value = id_pattern.match(data, pos).group()
+                pos += len(value)
+                if read_comment:
+                    continue
+                if read_string:
+                    typ = 'STRING'
+                elif prev == 'SINGLE_QUOTE':
+                    if len(value) != 1:
+                        err = f"ERROR: {value} following single quote"
+                        print(err)
+                        raise ParseError(err)
+                    typ = 'CHAR'
+                else:
+                    typ = keywords.get(value, 'ID')
+            elif kind == 'newline':
+                pos = newlines_pattern.match(data, pos).end()
+                lineno += pos - start
+                continue
+            elif kind == 'punctuation':
+                pos += 1
+                if read_comment:
+                    continue
+                typ = 'STRING' if read_string else punctuation[c]
+                value = c
+            elif kind == 'operator':
+                value = data[pos:pos + 2]
+                typ = double_operators.get(value)
+                if typ is None:
+                    value = c
+                    typ = single_operators[c]
+                pos += len(value)
+                if read_comment:
+                    continue
+                if read_string:
+                    typ = 'STRING'
+                elif value == '-':
+                    typ = 'NEGATIVE' if prev in negative_after else 'MINUS'
+                elif value == '&' and prev in rules.types:
+                    typ = 'ADDRESS'
+            elif kind == 'digit':
+                m = number_pattern.match(data, pos)
+                if m is None:
+                    # . without digits after it
+                    illegal_character(c, lineno)
+                value = m.group()
+                pos = m.end()
+                if read_comment:
+                    continue
+                if read_string:
+                    typ = 'STRING'
+                elif prev == 'SINGLE_QUOTE':
+                    typ = 'CHAR'
+                else:
+                    typ = 'FLOAT' if '.' in value else 'INT'
+                    value = to_number(value)
+            elif kind == 'slash':
+                following = data[pos + 1:pos + 2]
+                if following == '/' and (newline := data.find('\n', pos + 2)) >= 0:
+                    # Line comment, skipped in any state
+                    pos = newline + 1
+                    continue
+                if following == '*':
+                    pos += 2
+                    if read_comment:
+                        continue
+                    read_comment = 1
+                    if (stop := plain_comment_end(data, pos, end)) >= 0:
+                        # Skipped as one span
+                        lineno += data.count('\n', pos, stop)
+                        pos = stop
+                        if data.startswith('*/', stop):
+                            pos += 2
+                            read_comment = 0
+                    continue
+                pos += 1
+                if read_comment:
+                    continue
+                typ = 'STRING' if read_string else 'DIVIDE'
+                value = c
+            elif kind == 'star':
+                if data[pos + 1:pos + 2] == '/':
+                    pos += 2
+                    read_comment = 0
+                    continue
+                pos += 1
+                if read_comment:
+                    continue
+                if read_string:
+                    typ = 'STRING'
+                else:
+                    typ = 'POINTER' if prev in pointer_after else 'MULTIPLY'
+                value = c
+            elif kind == 'double_quote':
+                pos += 1
+                if read_comment:
+                    continue
+                read_string = 0 if read_string else 1
+                prev = 'DOUBLE_QUOTE'
+                yield Token('DOUBLE_QUOTE', c, lineno, base + start)
+                if read_string:
+                    close = data.find('"', pos, end)
+                    if close >= 0 and plain_string.fullmatch(data, pos, close):
+                        # Tokenized as one span, the closing quote is left for the loop
+                        for m in string_piece.finditer(data, pos, close):
+                            value = m.group()
+                            prev = rules.string_formatter.get(value, 'STRING')
+                            yield Token(prev, value, lineno, base + m.start())
+                        pos = close
+                continue
+            elif kind == 'single_quote':
+                pos += 1
+                if read_comment:
+                    continue
+                typ = 'SINGLE_QUOTE'
+                value = c
+            elif kind == 'percent':
+                m = format_pattern.match(data, pos)
+                if m is None:
+                    pos += 1
+                    if read_comment:
+                        continue
+                    typ = 'STRING' if read_string else 'MODULO'
+                    value = c
+                else:
+                    value = m.group()
+                    pos = m.end()
+                    if read_comment:
+                        continue
+                    if value not in rules.string_formatter:
+                        err = f"String formatter {value} not supported."
+                        print(err)
+                        raise ParseError(err)
+                    typ = rules.string_formatter[value]
+            elif kind == 'backslash':
+                if data[pos + 1:pos + 2] != 'n':
+                    illegal_character(c, lineno)
+                pos += 2
+                if read_comment:
+                    continue
+                typ = 'STRING' if read_string else 'NEWLINE_LITERAL'
+                value = '\\n'
+            else:
+                # Digits outside ASCII still match the NUMBER rule
+                m = number_pattern.match(data, pos)
+                if m is None:
+                    illegal_character(c, lineno)
+                value = m.group()
+                pos = m.end()
+                if read_comment:
+                    continue
+                if read_string:
+                    typ = 'STRING'
+                elif prev == 'SINGLE_QUOTE':
+                    typ = 'CHAR'
+                else:
+                    typ = 'FLOAT' if '.' in value else 'INT'
+                    value = to_number(value)
+
+            prev = typ
+            yield Token(typ, value, lineno, base + start)
+
+        self.lineno = lineno
+        self.lexpos = base + pos
+        self.read_string = read_string
+        self.read_comment = read_comment
+        self.prev_token = prev
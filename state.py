@@ -1,60 +1,59 @@
 # Module to define the current state of the parser/interpreter
 
-from collections import deque
+from memory import *
 
-class Statement:
-    def __init__(self, body_,):
-        self.body = body_
+class Frame:
+    """ Local variables of one function call, addressed by slot index """
+    def __init__(self, function_, slots_: list):
+        self.function = function_
+        # Preallocated so declarations never grow the frame
+        self.slots = slots_
 
-class Variable:
-    def __init__(self, type_, name_, value_: dict):
-        self.type = type_
-        self.name = name_
-        self.value = value_
-        self.address = self.allocate_mem()
+        # Where execution continues once a call made from this frame returns
+        self.resume = None # Tree walker: suspended generator running the function body
+        self.pc = 0 # VM: next instruction
+        self.dest = 0 # VM: slot receiving the return value
+        # Self calls in tail position that reused this frame, see compiler.push_tail_call
+        self.tail_calls = None
+        # Tree walker: (cache key, trace position) when the call's result is memoized
+        self.memo = None
 
-    def __eq__(self, value: "Variable"):
-        return self.name == value.name
+class StackOverflow(Exception):
+    """ C calls nested deeper than the interpreter's stack size """
+    pass
+
+class ParseError(SystemExit):
+    """ The program could not be lexed or parsed. The report has been printed already.
+    Left uncaught it exits with status 1, like the exit(1) calls it replaces, and unlike
+    exit() it leaves sys.stdin open for the next program of a batch.
+    """
+    def __init__(self, message_: str):
+        super().__init__(1)
+        self.message = message_
 
-    def __hash__(self):
-        return hash(self.address)
-    
     def __str__(self):
-        return f"({self.type}, {self.name}, {self.value}, {self.address})"
-    
-    def allocate_mem(self):
-        pass
-    
-class Literal:
-    def __init__(self, type_, value_, negative_):
-        self.type = type_
-        self.value = value_
-        self.negative = negative_
+        return self.message
 
-class Function:
-    def __init__(self, type_, parameters_, body_):
-        self.type = type_
-        self.parameters = parameters_
-        self.body = body_
+    def __reduce__(self):
+        # Raised in parse workers and sent back to the parent, see parallel.py
+        return type(self), (self.message,)
 
 class State:
-    def __init__(self, memsize_: int):
+    def __init__(self):
         # Stores the name and return type of current function being parsed
         self.current_function = None
         self.local_variables = {}
 
-        # Memory
-        self.memory_size = memsize_
-        self.memory = [0 for i in range(memsize_)]
-        
-        # Keeps track of order in which function calls were made
-        self.call_stack = deque()
-
         # Stores the initial program instructions in the main function
         self.main_call = []
 
         self.functions = {}
         self.global_variables = {}
+        # Whether the parser prints the global statements it parsed
+        self.verbose = False
+        # Whether p_program records the global statements it parsed, parallel.py
+        # parses parts of a program and records them once they are put back together
+        self.record_globals = True
 
     def variable_lookup(self, name: str) -> dict:
         """ Returns the type and value of variable
@@ -70,4 +69,4 @@ class State:
         elif name in self.global_variables:
             return self.global_variables[name]
 
-state = State(memsize_=1_000_000)
\ No newline at end of file
+state = State()
\ No newline at end of file
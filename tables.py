@@ -0,0 +1,124 @@
+# Module to build the PLY lexer and parser from tables cached on disk
+# PLY generates the lexer's master regex and the LALR tables from the rules in lexer.py
+# and parser.py. The generated tables are written once per version of those files and
+# read back on later runs, and the built lexer and parser are reused within a process.
+
+import os
+import hashlib
+import threading
+import importlib.util
+
+import ply
+import ply.lex as lex
+import ply.yacc as yacc
+
+import lexer as lexer_rules
+import parser as parser_rules
+
+# Bump when the way tables are built changes so stale cache entries are not reused
+TABLES_VERSION = 1
+TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ply")
+
+def grammar_hash() -> str:
+    """ Hash of the token and grammar definitions the tables are generated from """
+    digest = hashlib.sha256(f"{TABLES_VERSION}\n{ply.__version__}\n".encode())
+    for module in (lexer_rules, parser_rules):
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+GRAMMAR_HASH = grammar_hash()
+LEXTAB = f"lextab_{GRAMMAR_HASH}"
+PARSETAB = f"parsetab_{GRAMMAR_HASH}"
+
+# Built once per process
+cached_lexer: lex.Lexer = None
+cached_parser: yacc.LRParser = None
+# Held while building, so threads asking at the same time build once
+build_lock = threading.Lock()
+
+def pending(name: str) -> str | None:
+    """ Name a table is generated under before publish() moves it into place,
+    so other processes never read a partly written table. None when TABLE_DIR
+    cannot be created, the tables are then built in memory and not written.
+    """
+    try:
+        os.makedirs(TABLE_DIR, exist_ok=True)
+    except OSError:
+        # The cache is an optimization, a read-only checkout still runs
+        return None
+    return f"{name}_{os.getpid()}"
+
+def publish(filename: str, path: str):
+    try:
+        os.replace(os.path.join(TABLE_DIR, filename), path)
+    except OSError:
+        # The cache is an optimization, the tables were still built
+        pass
+
+def load_module(name: str, path: str):
+    """ Imports a generated lextab module, None if there is none """
+    if not os.path.exists(path):
+        return None
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_lexer(debug: bool = False) -> lex.Lexer:
+    """ Returns a new lexer, built from the cached tables. Each lexer has its own
+    state, so any number of them can be used at once.
+    """
+    global cached_lexer
+    with build_lock:
+        if cached_lexer is None:
+            path = os.path.join(TABLE_DIR, f"{LEXTAB}.py")
+            lextab = load_module(LEXTAB, path) or pending(LEXTAB)
+            if lextab is None:
+                # Built from the rules, without reading or writing a lextab
+                built = lex.lex(module=lexer_rules, debug=debug)
+            else:
+                built = lex.lex(
+                    module=lexer_rules,
+                    debug=debug,
+                    optimize=True,
+                    lextab=lextab,
+                    outputdir=TABLE_DIR
+                )
+            lexer_rules.init_state(built)
+            if type(lextab) == str:
+                publish(f"{lextab}.py", path)
+            cached_lexer = built
+    return cached_lexer.clone()
+
+def make_parser(debug: bool = False) -> yacc.LRParser:
+    """ Returns the parser, built from the cached tables """
+    global cached_parser
+    with build_lock:
+        if cached_parser is None:
+            # Pickled rather than a parsetab module, which is slower to load when it has to be compiled
+            path = os.path.join(TABLE_DIR, f"{PARSETAB}.pickle")
+            cached = os.path.exists(path)
+            name = None if cached else pending(PARSETAB)
+            if not cached and name is None:
+                # Generated in memory. PARSETAB is not an importable module, so no stale
+                # parsetab is read, and nothing is written.
+                cached_parser = yacc.yacc(
+                    module=parser_rules,
+                    debug=debug,
+                    tabmodule=PARSETAB,
+                    write_tables=False
+                )
+            else:
+                picklefile = path if cached else os.path.join(TABLE_DIR, f"{name}.pickle")
+                cached_parser = yacc.yacc(
+                    module=parser_rules,
+                    debug=debug,
+                    optimize=True,
+                    write_tables=False,
+                    picklefile=picklefile,
+                    outputdir=TABLE_DIR
+                )
+                if not cached:
+                    publish(os.path.basename(picklefile), path)
+    return cached_parser
@@ -0,0 +1,22 @@
+# Shared fixtures for the tests. The interpreter's modules sit at the top of the repository.
+
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interpreter import *
+
+@pytest.fixture
+def run_source(capsys):
+    """ Runs C source on an engine and returns what it printed """
+    def run(source: str, engine: str = TREE) -> str:
+        state.functions.clear()
+        state.global_variables.clear()
+        interpreter = Interpreter("<test>", engine=engine, ast_cache=0, source=source)
+        interpreter.tokenize()
+        interpreter.generate_ast()
+        interpreter.interpret()
+        return capsys.readouterr().out
+    return run
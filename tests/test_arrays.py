@@ -0,0 +1,46 @@
+import pytest
+
+from interpreter import *
+
+# / is true division, so int arrays are given floats that C would truncate
+FLOAT_INTO_INT_ARRAY = """
+int g[2] = {7 / 2};
+
+int half(int n) {
+    return n / 2;
+}
+
+int main() {
+    int n = 11;
+    int a[3] = {0};
+    a[0] = n / 2;
+    a[1] = half(n);
+    a[2] = -n / 2;
+    g[1] = half(5);
+    printf("%d %d %d %d %d\\n", a[0], a[1], a[2], g[0], g[1]);
+    return 0;
+}
+"""
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_float_stored_in_int_array_is_truncated(run_source, engine):
+    output = run_source(FLOAT_INTO_INT_ARRAY, engine)
+    assert 'print("%d %d %d %d %d\\n", 5, 5, -5, 3, 2)' in output
+
+def test_float_array_keeps_fractions(run_source):
+    output = run_source("""
+int main() {
+    float b[2] = {0.5};
+    b[1] = 3 / 4;
+    printf("%f %f\\n", b[0], b[1]);
+    return 0;
+}
+""")
+    assert 'print("%f %f\\n", 0.5, 0.75)' in output
+
+def test_store_element_raises_other_errors():
+    elements = new_array('int', [1, 2], 2)
+    with pytest.raises(TypeError):
+        store_element(elements, 1, "a")
+    with pytest.raises(IndexError):
+        store_element(elements, 5, 1.5)
@@ -0,0 +1,20 @@
+import interpreter
+from interpreter import *
+
+SOURCE = "int main() {\n    printf(\"%d\\n\", 6 * 7);\n    return 0;\n}\n"
+
+def parse(capsys) -> str:
+    state.functions.clear()
+    state.global_variables.clear()
+    program = Interpreter("<test>", source=SOURCE)
+    program.tokenize()
+    program.generate_ast(verbose=True)
+    return capsys.readouterr().out
+
+def test_entries_of_other_compiler_sources_are_not_reused(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(interpreter, "AST_CACHE_DIR", str(tmp_path))
+    assert "Loaded parsed program from cache" not in parse(capsys)
+    assert "Loaded parsed program from cache" in parse(capsys)
+    # As if nodes.py, optimizer.py or compiler.py had been edited
+    monkeypatch.setattr(interpreter, "AST_HASH", "0" * 16)
+    assert "Loaded parsed program from cache" not in parse(capsys)
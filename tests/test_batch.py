@@ -0,0 +1,28 @@
+import pytest
+
+from batch import *
+
+ARGUMENTS_PROGRAM = "int main(int a, float b) {\n    printf(\"%d %f\\n\", a, b);\n    return a * 2;\n}\n"
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_job_arguments_are_passed_to_main(engine):
+    result = Batch(ast_cache_=0).run({'id': 1, 'source': ARGUMENTS_PROGRAM, 'engine': engine, 'arguments': [21, 1.5]})
+    assert (result['status'], result['error']) == (0, None)
+    assert 'print("%d %f\\n", 21, 1.5)' in result['output']
+    assert "return(42)" in result['output']
+
+@pytest.mark.parametrize("arguments, error", [
+    ([1, 2, 3], "main() takes 2 parameters but 3 arguments were given"),
+    (["x"], "Argument 'x' to main() is not an int or a float"),
+    (7, "Job 1 has arguments that are not a list"),
+])
+def test_invalid_job_arguments_are_reported(arguments, error):
+    result = Batch(ast_cache_=0).run({'id': 1, 'source': ARGUMENTS_PROGRAM, 'arguments': arguments})
+    assert (result['status'], result['error']) == (1, f"Exception: {error}")
+
+def test_socket_path_holding_a_file_is_not_removed(tmp_path):
+    path = tmp_path / "jobs.txt"
+    path.write_text("not a socket")
+    with pytest.raises(Exception, match="is not a socket"):
+        serve_socket(str(path), None)
+    assert path.read_text() == "not a socket"
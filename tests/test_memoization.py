@@ -0,0 +1,33 @@
+import sys
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from interpreter import *
+from workloads import EXAMPLES, ThreadOutput
+
+@pytest.mark.parametrize("name", ["pure.c", "tail.c"])
+def test_forks_record_their_own_traces_in_threads(name, capsys):
+    state.functions.clear()
+    state.global_variables.clear()
+    interpreter = Interpreter(f"{EXAMPLES}/{name}", ast_cache=0)
+    interpreter.tokenize()
+    interpreter.generate_ast()
+    capsys.readouterr()
+    interpreter.interpret()
+    reference = capsys.readouterr().out
+
+    stdout = sys.stdout
+    interpreter.memoize = 16
+    forks = [interpreter.fork() for _ in range(8)]
+    output = ThreadOutput()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with contextlib.redirect_stdout(output), ThreadPoolExecutor(len(forks)) as pool:
+            results = list(pool.map(output.capture, [f.interpret for f in forks]))
+    finally:
+        sys.setswitchinterval(interval)
+    assert results == [reference] * len(forks)
+    assert sys.stdout is stdout
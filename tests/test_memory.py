@@ -0,0 +1,72 @@
+import pytest
+
+from interpreter import *
+
+def test_each_interpreter_has_its_own_memory():
+    a = Interpreter("<a>", ast_cache=0, source="int main() { return 0; }", memory_size=4096)
+    b = Interpreter("<b>", ast_cache=0, source="int main() { return 0; }", memory_size=8192)
+    assert a.memory is not b.memory
+    assert (len(a.memory), len(b.memory)) == (4096, 8192)
+    assert a.fork().memory is not a.memory
+
+HEAP_PROGRAM = """
+int main() {
+    int a = malloc(16);
+    int b = malloc(600);
+    free(a);
+    return b;
+}
+"""
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_runs_start_from_empty_memory(engine, capsys):
+    state.functions.clear()
+    state.global_variables.clear()
+    interpreter = Interpreter("<heap>", engine=engine, ast_cache=0, source=HEAP_PROGRAM)
+    interpreter.tokenize()
+    interpreter.generate_ast()
+    results = [interpreter.interpret() for _ in range(3)]
+    assert len(set(results)) == 1
+    assert interpreter.memory.stats()['blocks'] == 1
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_builtins_truncate_float_sizes(run_source, engine):
+    output = run_source("""
+int main() {
+    int n = 10;
+    int a = malloc(n / 4);
+    int b = calloc(n / 2, 4);
+    b = realloc(b, n * 1.5);
+    free(a);
+    free(b);
+    return b;
+}
+""", engine)
+    # Blocks are cut from the top of the heap, realloc() moves b to a smaller size class
+    a = Memory(MEMORY_SIZE).heap - size_class(2)
+    b = a - size_class(20)
+    assert f"realloc({b}, 15.0)" in output
+    assert f"return({b - size_class(15)})" in output
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_double_free_is_a_segmentation_fault(run_source, engine):
+    with pytest.raises(SegmentationFault):
+        run_source("""
+int main() {
+    int a = malloc(4);
+    free(a);
+    free(a);
+    return 0;
+}
+""", engine)
+
+def test_main_reports_memory_errors(tmp_path, capsys):
+    program = tmp_path / "double_free.c"
+    program.write_text("int main() {\n    int a = malloc(4);\n    free(a);\n    free(a);\n    return 0;\n}\n")
+    state.functions.clear()
+    state.global_variables.clear()
+    with pytest.raises(SystemExit) as e:
+        main(str(program))
+    assert e.value.code == 1
+    address = Memory(MEMORY_SIZE).heap - size_class(4)
+    assert capsys.readouterr().out.endswith(f"free(): invalid pointer {address}\n")
@@ -0,0 +1,21 @@
+import pytest
+
+from interpreter import *
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_for_loop_with_several_init_statements(run_source, engine):
+    output = run_source("""
+int main() {
+    int t = 0;
+    int i;
+    int j;
+    for (i = 0, j = 10; i < 3; i++) {
+        t = t + i * j;
+    }
+    for (int k = 0; k < 2; k++) {
+        t = t + k;
+    }
+    return t;
+}
+""", engine)
+    assert output.endswith("return(31)\n")
@@ -0,0 +1,41 @@
+import os, sys
+import glob
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from workloads import EXAMPLES, FRAGMENTS, synthesize, lex_tokens, token_stream
+from interpreter import *
+
+@pytest.mark.parametrize("fpath", sorted(glob.glob(os.path.join(EXAMPLES, "*.c"))), ids=os.path.basename)
+def test_scanner_lexes_examples_like_ply(fpath):
+    with open(fpath) as f:
+        source = f.read()
+    assert token_stream(Scanner, source) == token_stream(make_lexer, source)
+
+def test_scanner_lexes_synthesized_source_like_ply():
+    source = synthesize(10)
+    assert token_stream(Scanner, source) == token_stream(make_lexer, source)
+
+def test_scanner_lexes_random_sources_like_ply():
+    rng = random.Random(0)
+    for _ in range(5000):
+        source = "".join(rng.choices(FRAGMENTS, k=rng.randint(1, 200)))
+        assert token_stream(Scanner, source) == token_stream(make_lexer, source), source
+
+@pytest.mark.parametrize("new_lexer", [make_lexer, Scanner], ids=[PLY_LEXER, SCANNER])
+def test_lexers_in_parallel_threads(new_lexer):
+    # Lexes 32 different sources at once, with thread switches forced often
+    threads = 32
+    sources = [f"/* source {i} */\n" + synthesize(20 + i).replace("{\n", "{ // open\n") for i in range(threads)]
+    expected = [lex_tokens(new_lexer, source, []) for source in sources]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for _ in range(5):
+                streams = pool.map(lambda source: lex_tokens(new_lexer, source, []), sources)
+                assert list(streams) == expected
+    finally:
+        sys.setswitchinterval(interval)
@@ -0,0 +1,34 @@
+import pytest
+
+from interpreter import *
+
+DEEP_PROGRAM = """
+int down(int n) {
+    if (n < 1) {
+        return 0;
+    }
+    int r = down(n - 1);
+    return r + 1;
+}
+int main() {
+    return down(DEPTH);
+}
+"""
+
+def run(engine: str, depth: int, capsys):
+    state.functions.clear()
+    state.global_variables.clear()
+    interpreter = Interpreter("<deep>", engine=engine, stack_size=50, ast_cache=0,
+                              source=DEEP_PROGRAM.replace("DEPTH", str(depth)))
+    interpreter.tokenize()
+    interpreter.generate_ast()
+    capsys.readouterr()
+    return interpreter.interpret()
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_stack_size_limits_every_engine(engine, capsys):
+    # main() takes the first of the 50 frames
+    assert run(engine, 48, capsys) == 48
+    with pytest.raises(StackOverflow, match="more than 50 nested calls when calling down"):
+        run(engine, 49, capsys)
+    assert capsys.readouterr().out.endswith("down(1)\ndown(0)\n")
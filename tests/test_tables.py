@@ -0,0 +1,19 @@
+import os
+
+import tables
+
+def test_tables_build_in_memory_when_the_cache_cannot_be_created(tmp_path, monkeypatch):
+    # A file where the cache directory should be, as in a checkout with a stray file
+    blocker = tmp_path / "cache"
+    blocker.write_text("")
+    monkeypatch.setattr(tables, "TABLE_DIR", str(blocker / "ply"))
+    monkeypatch.setattr(tables, "cached_lexer", None)
+    monkeypatch.setattr(tables, "cached_parser", None)
+
+    lexer = tables.make_lexer()
+    lexer.input("int main() { return 0; }")
+    assert [t.type for t in iter(lexer.token, None)][:2] == ['TYPE_INT', 'ID']
+    lexer = tables.make_lexer()
+    lexer.input("int main() { return 0; }")
+    assert tables.make_parser().parse(lexer=lexer) is not None
+    assert os.listdir(tmp_path) == ["cache"]
@@ -0,0 +1,41 @@
+import pytest
+
+import transpiler
+from interpreter import *
+
+PROGRAM = """
+int square(int n) {
+    return n * n;
+}
+
+int main() {
+    return square(7);
+}
+"""
+
+@pytest.mark.parametrize("corruption", [
+    lambda source: source[:len(source) // 2],
+    lambda source: source[:source.index(transpiler.END_OF_MODULE)],
+    lambda source: "def f_main(:\n" + transpiler.END_OF_MODULE,
+])
+def test_corrupt_cached_module_is_generated_again(run_source, tmp_path, monkeypatch, corruption):
+    monkeypatch.setattr(transpiler, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(transpiler, "code_cache", {})
+    expected = run_source(PROGRAM, PYTHON)
+    [cached] = tmp_path.iterdir()
+    cached.write_text(corruption(cached.read_text()))
+
+    transpiler.code_cache.clear()
+    assert run_source(PROGRAM, PYTHON) == expected
+    assert cached.read_text().endswith(transpiler.END_OF_MODULE)
+    assert "return(49)" in expected
+
+def test_modules_of_other_code_generation_sources_are_not_reused(run_source, tmp_path, monkeypatch):
+    monkeypatch.setattr(transpiler, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(transpiler, "code_cache", {})
+    expected = run_source(PROGRAM, PYTHON)
+    # As if transpiler.py, nodes.py, optimizer.py or compiler.py had been edited
+    monkeypatch.setattr(transpiler, "TRANSPILER_HASH", "0" * 16)
+    transpiler.code_cache.clear()
+    assert run_source(PROGRAM, PYTHON) == expected
+    assert len(list(tmp_path.iterdir())) == 2
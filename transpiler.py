@@ -0,0 +1,368 @@
+# Module to translate the parsed program in state into Python source and run it with exec
+# Generated modules are cached by a hash of the C source so repeat runs skip codegen.
+
+import os
+import hashlib
+
+from compiler import *
+from tables import GRAMMAR_HASH
+import nodes as ast_nodes
+import optimizer as ast_optimizer
+import compiler as ast_compiler
+
+def transpiler_hash() -> str:
+    """ Hash of the grammar and of the modules generated code is built with """
+    digest = hashlib.sha256(f"{GRAMMAR_HASH}\n".encode())
+    for path in (__file__, ast_nodes.__file__, ast_optimizer.__file__, ast_compiler.__file__):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+# Changes to the code generation reach the cache key, so stale modules are not reused
+TRANSPILER_HASH = transpiler_hash()
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "transpiled")
+# Last line of every generated module, a cached module without it was cut short
+END_OF_MODULE = "# End of generated module\n"
+
+# Compiled code objects of generated modules, by source hash
+code_cache = {}
+
+python_operators = {
+    ADD: '+',
+    SUBTRACT: '-',
+    MULTIPLY: '*',
+    DIVIDE: '/',
+}
+
+
+# Runtime helpers available to generated modules
+
+def trace_call(name: str, *args) -> tuple:
+    """ Prints the function call the way the tree walker does and passes the arguments on """
+    print(f"{name}(" + ", ".join(format_value(arg) for arg in args) + ")")
+    return args
+
+def undefined(name: str):
+    err = f"{name} called but never defined."
+    raise Exception(err)
+
+
+class PythonProgram:
+    def __init__(self, code_, memory_: Memory, stack_size_: int):
+        self.code = code_
+        # Memory the program's builtins allocate from
+        self.memory = memory_
+        # Most C calls nested at once, and how many are now
+        self.stack_size = stack_size_
+        self.depth = 0
+        self.namespace = {}
+
+    def initialize_globals(self):
+        # A fresh namespace per run so globals never leak between runs
+        self.namespace = {
+            '_fmt': format_value,
+            '_call': trace_call,
+            '_array': new_array,
+            '_store': store_element,
+            '_builtin': self.builtin,
+            '_invoke': self.invoke,
+            '_undefined': undefined,
+        }
+        # The frame running the global initializers and then main(), as on the tree walker's stack
+        self.depth = 1
+        exec(self.code, self.namespace)
+        self.namespace['_init_globals']()
+
+    def run_main(self, args: list):
+        return self.namespace['f_main'](*args)
+
+    def builtin(self, name: str, *args):
+        return call_builtin(self.memory, name, args)
+
+    def invoke(self, function, name: str, args: tuple):
+        """ Calls the generated function of the C function name, one level deeper """
+        if self.depth >= self.stack_size:
+            err = f"Stack overflow: more than {self.stack_size} nested calls when calling {name}()"
+            raise StackOverflow(err)
+        self.depth += 1
+        try:
+            return function(*args)
+        finally:
+            self.depth -= 1
+
+
+class Transpiler:
+    def __init__(self, state_: State):
+        self.state = state_
+        self.lines = []
+        self.indent = 0
+
+        # Scope chain of {C name: Python name} for the function being generated
+        self.scopes: list[dict] = []
+        # Python names already used in the function, C block scopes can shadow each other
+        self.names = set()
+        # Globals assigned in the function, which need a global statement
+        self.assigned_globals = set()
+
+    def generate(self) -> str:
+        self.emit("# Generated by transpiler.py")
+        self.generate_globals()
+        for name, function in self.state.functions.items():
+            if BODY in function:
+                self.generate_function(name, function)
+        return "\n".join(self.lines) + "\n" + END_OF_MODULE
+
+    def emit(self, line: str):
+        self.lines.append("    " * self.indent + line)
+
+    def generate_globals(self):
+        self.begin([])
+        self.scopes = []
+        self.emit("")
+        self.emit("def _init_globals():")
+        self.indent += 1
+        start = len(self.lines)
+        for name in self.state.global_variables:
+            self.emit(f"g_{name} = None")
+        for name, gv in self.state.global_variables.items():
+            if gv[VALUE] is None and not is_array_declaration(gv):
+                # Variable declared but no value assigned
+                continue
+            self.generate_declaration(gv | {NAME: name})
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.declare_globals(start, list(self.state.global_variables))
+        self.indent -= 1
+
+    def generate_function(self, name: str, function: dict):
+        parameters = named_parameters(function[PARAMETERS])
+        self.begin(parameters)
+        args = ", ".join(self.scopes[0][param[NAME]] for param in parameters)
+        self.emit("")
+        self.emit(f"def f_{name}({args}):")
+        self.indent += 1
+        start = len(self.lines)
+        self.generate_block(function[BODY])
+        self.declare_globals(start, sorted(self.assigned_globals))
+        self.indent -= 1
+
+    def begin(self, parameters: list[dict]):
+        self.scopes = [{}]
+        self.names = set()
+        self.assigned_globals = set()
+        for param in parameters:
+            self.declare(param[NAME])
+
+    def declare(self, name: str) -> str:
+        """ Picks a Python name for a C variable, renaming variables that shadow another """
+        python_name = f"v_{name}"
+        suffix = 0
+        while python_name in self.names:
+            suffix += 1
+            python_name = f"v_{name}_{suffix}"
+        self.names.add(python_name)
+        self.scopes[-1][name] = python_name
+        return python_name
+
+    def declare_globals(self, start: int, names: list[str]):
+        if names:
+            line = "    " * self.indent + "global " + ", ".join(f"g_{name}" for name in names)
+            self.lines.insert(start, line)
+
+    def resolve(self, name: str, assign: bool = False) -> str:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        if name in self.state.global_variables:
+            if assign:
+                self.assigned_globals.add(name)
+            return f"g_{name}"
+        err = f"{name} assigned before declaration."
+        raise Exception(err)
+
+    # Statements
+
+    def generate_block(self, statements: list[dict]):
+        self.scopes.append({})
+        start = len(self.lines)
+        for statement in as_statements(statements):
+            self.generate_statement(statement)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.scopes.pop()
+
+    def generate_statement(self, statement: dict):
+        # Entries of a for loop's update list may not carry an instruction
+        instruction = statement.get(INSTRUCTION, VARIABLE_ASSIGNMENT)
+        if instruction == VARIABLE_DECLARATION:
+            self.generate_declaration(statement)
+        elif instruction == VARIABLE_ASSIGNMENT:
+            self.generate_assignment(statement)
+        elif instruction == FOR_LOOP:
+            self.generate_for_loop(statement)
+        elif instruction == IF:
+            self.emit(f"if {self.condition(statement[COND])}:")
+            self.indent += 1
+            self.generate_block(statement[BODY])
+            self.indent -= 1
+        elif instruction == PRINT:
+            arguments = "".join(f" + ', ' + _fmt({self.expr(arg)})"
+                                for arg in as_statements(statement[ARGUMENTS]))
+            self.emit(f"print({print_prefix(statement)!r}{arguments} + ')')")
+        elif instruction == RETURN:
+            if statement[VALUE] is None:
+                self.emit("print('return(None)')")
+                self.emit("return None")
+            else:
+                self.emit(f"_r = {self.expr(statement[VALUE])}")
+                self.emit("print('return(' + _fmt(_r) + ')')")
+                self.emit("return _r")
+        elif instruction == FUNCTION_CALL or instruction in python_operators or instruction in comparisons:
+            # Expression statement, result is discarded
+            self.emit(self.expr(statement))
+        else:
+            err = f"\t{instruction} not ready"
+            raise Exception(err)
+
+    def generate_declaration(self, statement: dict):
+        if is_array_declaration(statement):
+            values = ", ".join(self.expr(ast) for ast in as_statements(statement[VALUE]))
+            size = self.expr(statement[SIZE]) if statement[SIZE] is not None \
+                else str(len(as_statements(statement[VALUE])))
+            value = f"_array({statement[TYPE]!r}, [{values}], {size})"
+        elif statement[VALUE] is not None:
+            value = self.expr(statement[VALUE])
+        else:
+            value = "None"
+
+        if not self.scopes:
+            self.emit(f"g_{statement[NAME]} = {value}")
+        else:
+            # The value is evaluated before the name enters scope
+            self.emit(f"{self.declare(statement[NAME])} = {value}")
+
+    def generate_assignment(self, statement: dict):
+        if statement[VALUE] is None:
+            # Bare name in a variable list, nothing to evaluate
+            return
+        value = self.expr(statement[VALUE])
+        if statement[POINTER]:
+            # When assigning arrays, SIZE holds the index. The value is evaluated
+            # before the index, same as the tree walker.
+            elements = self.resolve(statement[NAME])
+            self.emit(f"_v = {value}")
+            self.emit(f"_i = {self.expr(statement[SIZE])}")
+            self.emit("try:")
+            self.emit(f"    {elements}[_i] = _v")
+            self.emit("except TypeError:")
+            self.emit(f"    _store({elements}, _i, _v)")
+        else:
+            self.emit(f"{self.resolve(statement[NAME], assign=True)} = {value}")
+
+    def generate_for_loop(self, statement: dict):
+        # Variables declared in the init block are scoped to the loop
+        self.scopes.append({})
+        for var in as_statements(statement[INIT]):
+            self.generate_statement(var)
+        self.emit(f"while {self.condition(statement[COND])}:")
+        self.indent += 1
+        self.generate_block(statement[BODY])
+        for update in as_statements(statement[UPDATE]):
+            self.generate_statement(update)
+        self.indent -= 1
+        self.scopes.pop()
+
+    # Expressions
+
+    def condition(self, cond: dict) -> str:
+        """ Like expr, but comparisons produce bools instead of 1 and 0 """
+        if cond.get(INSTRUCTION) in comparisons and not cond.get(NEGATIVE):
+            return f"{self.expr(cond[VALUE][L])} {cond[INSTRUCTION]} {self.expr(cond[VALUE][R])}"
+        return self.expr(cond)
+
+    def expr(self, ast: dict) -> str:
+        if INSTRUCTION not in ast:
+            # Leaf node, negation is applied at generation time
+            value = -ast[VALUE] if ast.get(NEGATIVE) else ast[VALUE]
+            return f"({value!r})" if type(value) != str and value < 0 else repr(value)
+
+        instruction = ast[INSTRUCTION]
+        if instruction == VAR_LOOKUP:
+            code = self.resolve(ast[VALUE][NAME])
+            if ast[VALUE][INDEX] is not None:
+                code += f"[{self.expr(ast[VALUE][INDEX])}]"
+        elif instruction == FUNCTION_CALL:
+            code = self.call(ast)
+        elif instruction in python_operators:
+            code = f"({self.expr(ast[VALUE][L])} {python_operators[instruction]} {self.expr(ast[VALUE][R])})"
+        elif instruction in comparisons:
+            code = f"(1 if {self.expr(ast[VALUE][L])} {instruction} {self.expr(ast[VALUE][R])} else 0)"
+        else:
+            err = f"{instruction} not processed yet"
+            raise Exception(err)
+
+        if ast.get(NEGATIVE):
+            code = f"(-{code})"
+        return code
+
+    def call(self, ast: dict) -> str:
+        name = ast[VALUE][NAME]
+        args = [self.expr(arg) for arg in ast[VALUE][ARGUMENTS]]
+        if is_builtin(self.state, name):
+            return f"_builtin({name!r}, *_call({name!r}{''.join(', ' + arg for arg in args)}))"
+        if name not in self.state.functions or BODY not in self.state.functions[name]:
+            return f"_undefined({name!r})"
+
+        nparams = len(named_parameters(self.state.functions[name][PARAMETERS]))
+        if nparams != len(args):
+            err = f"{name} takes {nparams} arguments but {len(args)} were given."
+            raise Exception(err)
+        return f"_invoke(f_{name}, {name!r}, _call({name!r}{''.join(', ' + arg for arg in args)}))"
+
+
+def transpile(state_: State, memory_: Memory, stack_size_: int, source: str, options: str = "") -> PythonProgram:
+    """ Returns the program for state, generating Python source only on a cache miss
+    Args:
+        state_ (State): Parsed program
+        memory_ (Memory): Memory the program's builtins allocate from
+        stack_size_ (int): Most C calls nested at once
+        source (str): C source the program was parsed from, or a hash of it, used as the cache key
+        options (str): Passes that changed state after parsing, also part of the key
+    """
+    key = hashlib.sha256(f"{TRANSPILER_HASH}\n{options}\n{source}".encode()).hexdigest()
+    if key in code_cache:
+        return PythonProgram(code_cache[key], memory_, stack_size_)
+
+    path = os.path.join(CACHE_DIR, f"{key}.py")
+    code_cache[key] = load_module(path)
+    if code_cache[key] is None:
+        python_source = Transpiler(state_).generate()
+        code_cache[key] = compile(python_source, path, 'exec')
+        save_module(path, python_source)
+    return PythonProgram(code_cache[key], memory_, stack_size_)
+
+def load_module(path: str):
+    """ Compiled code of the generated module cached at path, None when it is missing,
+    cut short or does not compile, so it is generated again
+    """
+    try:
+        with open(path, 'r') as f:
+            python_source = f.read()
+        if not python_source.endswith(END_OF_MODULE):
+            return None
+        return compile(python_source, path, 'exec')
+    except (OSError, ValueError, SyntaxError):
+        # Undecodable bytes and null bytes are ValueErrors
+        return None
+
+def save_module(path: str, python_source: str):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Moved into place so readers never see a partly written module
+        pending = f"{path}.{os.getpid()}"
+        with open(pending, 'w') as f:
+            f.write(python_source)
+        os.replace(pending, path)
+    except OSError:
+        # The cache is an optimization, codegen still succeeded
+        pass
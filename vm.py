@@ -0,0 +1,160 @@
+# Module to execute bytecode produced by compiler.py
+# C calls push a Frame on an explicit call stack instead of recursing in Python,
+# so recursion depth is bounded by stack_size rather than the host stack.
+
+from collections import deque
+
+from compiler import *
+
+class VirtualMachine:
+    def __init__(self, program_: Program, call_stack_: deque, stack_size_: int, memory_: Memory):
+        self.program = program_
+        self.globals = [None] * len(program_.global_index)
+        self.call_stack = call_stack_
+        self.stack_size = stack_size_
+        # Memory the program's builtins allocate from
+        self.memory = memory_
+
+    def initialize_globals(self):
+        self.execute(self.program.init, [])
+
+    def run_main(self, args: list):
+        main = self.program.function_table[self.program.function_index["main"]]
+        return self.execute(main, args)
+
+    def new_frame(self, index: int, args: list) -> Frame:
+        function = self.program.function_table[index]
+        if function is None:
+            err = f"{self.program.function_names[index]} called but never defined."
+            raise Exception(err)
+        # Print function call to output, before the stack is checked like the tree walker does
+        print(f"{function.name}(" + ", ".join(format_value(arg) for arg in args) + ")")
+        if len(self.call_stack) >= self.stack_size:
+            err = f"Stack overflow: more than {self.stack_size} nested calls when calling {function.name}()"
+            raise StackOverflow(err)
+        return Frame(function, args + function.template[len(args):])
+
+    def execute(self, function: Bytecode, args: list):
+        """ Runs function, and every call it makes, to completion """
+        stack = self.call_stack
+        base = len(stack)
+        frame = Frame(function, args + function.template[len(args):])
+        stack.append(frame)
+
+        code = function.code
+        f = frame.slots
+        globals_ = self.globals
+        pc = 0
+
+        while True:
+            op, a, b, c = code[pc]
+            pc += 1
+            if op == OP_ADD:
+                f[a] = f[b] + f[c]
+            elif op == OP_SUBTRACT:
+                f[a] = f[b] - f[c]
+            elif op == OP_MULTIPLY:
+                f[a] = f[b] * f[c]
+            elif op == MOVE:
+                f[a] = f[b]
+            elif op == JUMP_IF_LT:
+                if f[a] < f[b]:
+                    pc = c
+            elif op == JUMP_IF_GT:
+                if f[a] > f[b]:
+                    pc = c
+            elif op == JUMP_IF_LEQ:
+                if f[a] <= f[b]:
+                    pc = c
+            elif op == JUMP_IF_GEQ:
+                if f[a] >= f[b]:
+                    pc = c
+            elif op == JUMP_IF_EQ:
+                if f[a] == f[b]:
+                    pc = c
+            elif op == JUMP_IF_NE:
+                if f[a] != f[b]:
+                    pc = c
+            elif op == LOAD_ELEM:
+                f[a] = f[b][f[c]]
+            elif op == STORE_ELEM:
+                try:
+                    f[a][f[b]] = f[c]
+                except TypeError:
+                    store_element(f[a], f[b], f[c])
+            elif op == OP_DIVIDE:
+                if f[c] == 0:
+                    raise ZeroDivisionError
+                f[a] = f[b] / f[c]
+            elif op == OP_LT:
+                f[a] = 1 if f[b] < f[c] else 0
+            elif op == OP_GT:
+                f[a] = 1 if f[b] > f[c] else 0
+            elif op == OP_LEQ:
+                f[a] = 1 if f[b] <= f[c] else 0
+            elif op == OP_GEQ:
+                f[a] = 1 if f[b] >= f[c] else 0
+            elif op == OP_EQ:
+                f[a] = 1 if f[b] == f[c] else 0
+            elif op == OP_NE:
+                f[a] = 1 if f[b] != f[c] else 0
+            elif op == JUMP:
+                pc = a
+            elif op == JUMP_IF_TRUE:
+                if f[a]:
+                    pc = b
+            elif op == JUMP_IF_FALSE:
+                if not f[a]:
+                    pc = b
+            elif op == LOAD_GLOBAL:
+                f[a] = globals_[b]
+            elif op == STORE_GLOBAL:
+                globals_[a] = f[b]
+            elif op == CALL:
+                # Suspend the caller and continue in the callee's frame
+                frame.pc = pc
+                frame.dest = a
+                frame = self.new_frame(b, [f[s] for s in c])
+                stack.append(frame)
+                code = frame.function.code
+                f = frame.slots
+                pc = 0
+            elif op == PRINTF:
+                print(self.program.print_table[a] + "".join(", " + format_value(f[s]) for s in b) + ")")
+            elif op == RETURN_VALUE or op == RETURN_NONE:
+                if op == RETURN_VALUE:
+                    value = f[a]
+                    print(f"return({format_value(value)})")
+                else:
+                    value = None
+                    if a:
+                        print("return(None)")
+                if frame.tail_calls:
+                    value = finish_tail_calls(frame, value)
+                stack.pop()
+                if len(stack) == base:
+                    return value
+                # Resume the caller
+                frame = stack[-1]
+                code = frame.function.code
+                f = frame.slots
+                pc = frame.pc
+                f[frame.dest] = value
+            elif op == TAIL_CALL:
+                # Self call in tail position, restart in the same frame
+                args = [f[s] for s in c]
+                print(f"{frame.function.name}(" + ", ".join(format_value(arg) for arg in args) + ")")
+                f[:len(args)] = args
+                push_tail_call(frame, a)
+                pc = 0
+            elif op == OP_NEGATE:
+                f[a] = -f[b]
+            elif op == MAKE_ARRAY:
+                f[a] = new_array(c[0], [f[s] for s in c[1]], f[b])
+            elif op == CALL_BUILTIN:
+                args = [f[s] for s in c]
+                print(f"{b}(" + ", ".join(format_value(arg) for arg in args) + ")")
+                f[a] = call_builtin(self.memory, b, args)
+            else:
+                err = f"Unknown opcode {op}"
+                raise Exception(err)
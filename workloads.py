@@ -0,0 +1,74 @@
+# Module of C sources and output helpers shared by benchmark.py and the tests
+
+import os
+import io
+import threading
+import contextlib
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples")
+
+class ThreadOutput(io.TextIOBase):
+    """ Stands in for sys.stdout, giving every thread its own buffer """
+    def __init__(self):
+        self.local = threading.local()
+
+    def write(self, text: str) -> int:
+        return self.local.buffer.write(text)
+
+    def capture(self, run) -> str:
+        """ Calls run in the current thread, returns what it printed """
+        self.local.buffer = io.StringIO()
+        run()
+        return self.local.buffer.getvalue()
+
+def synthesize(nfunctions: int) -> str:
+    """ C source for a large translation unit made of similar functions """
+    source = "int total = 0;\n"
+    for i in range(nfunctions):
+        source += f"""
+int f{i}(int a, int b) {{
+    int c = a * 2 + b - {i};
+    int values[4] = {{1, 2, 3, 4}};
+    for (int j = 0; j < b; j++) {{
+        c = c + j * values[2];
+    }}
+    if (c > 10) {{
+        return c - 1;
+    }}
+    printf("%d\\n", c);
+    return c;
+}}
+"""
+    return source + "\nint main() {\n    total = f0(1, 2);\n    return 0;\n}\n"
+
+# Pieces of C, valid or not, that random sources for the scanner are made of
+FRAGMENTS = [
+    "int", "char", "return", "printf", "x", "abc_1", "1", "1.5", "1e5", "1e+5", ".5", "5.",
+    " ", "  ", "\n", "\t", "/*", "*/", "//", "\"", "'", "%d", "%f", "%s", "% d", "%.2f", "%*d", "%",
+    "-", "--", "+", "++", "*", "/", "=", "==", "<", "<<", "<=", ">", ">>=", "!", "!=",
+    "&", "&&", "|", "||", "^", "~", ";", ",", "(", ")", "{", "}", "[", "]", "\\n", "\\", ".", "#",
+    "#include <stdio.h>\n"
+]
+
+def lex_tokens(new_lexer, source: str, tokens: list) -> list[tuple]:
+    """ Appends every token a new lexer produces for source to tokens """
+    lexer_ = new_lexer()
+    lexer_.input(source)
+    while (token := lexer_.token()):
+        tokens.append((token.type, token.value, type(token.value), token.lineno, token.lexpos))
+    return tokens
+
+def token_stream(new_lexer, source: str) -> tuple[list[tuple], str]:
+    """ Every token a new lexer produces for source and what it printed. Lexing
+    errors end the stream with ('exit',) or the name of the exception.
+    """
+    tokens = []
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            lex_tokens(new_lexer, source, tokens)
+        except SystemExit:
+            tokens.append(('exit',))
+        except Exception as e:
+            tokens.append((type(e).__name__,))
+    return tokens, output.getvalue()